@@ -3,6 +3,7 @@
 import React, { useState, useRef, useEffect } from "react";
 import { FaMicrophone, FaStop, FaTrash, FaPlay, FaTimes } from "react-icons/fa";
 import "./styles.css";
+import { openRecordingStream } from "./recording_stream";
 
 const API_BASE_URL = process.env.REACT_APP_API_URL;
 
@@ -21,6 +22,7 @@ export default function AudioRecorder() {
   const streamRef = useRef(null);
   const audioChunksRef = useRef([]);
   const manuallyStoppedRef = useRef(false);
+  const sessionIdRef = useRef(null); // server-side session holding this user's transcript
   useEffect(() => {
     navigator.mediaDevices
       .enumerateDevices()
@@ -52,11 +54,20 @@ export default function AudioRecorder() {
       const recorder = new MediaRecorder(stream, { mimeType });
       mediaRecorderRef.current = recorder;
       audioChunksRef.current = [];
+      const filename = mimeType.includes("ogg") ? "recording.ogg" : "recording.webm";
+
+      // upload (and transcribe) while recording over /record/stream; POST /record below is the fallback
+      const recordingStream = await openRecordingStream(API_BASE_URL, stream, {
+        filename,
+        sessionId: sessionIdRef.current,
+        onPartial: setTranscription,
+      });
 
       // actually getting the recording
       recorder.ondataavailable = (event) => {
         if (event.data && event.data.size > 0) {
           audioChunksRef.current.push(event.data);
+          recordingStream.send(event.data);
         }
       };
 
@@ -65,6 +76,7 @@ export default function AudioRecorder() {
         const blob = new Blob(audioChunksRef.current, { type: mimeType });
       
         if (!manuallyStoppedRef.current) {
+          recordingStream.close();
           console.warn("Recorder stopped automatically. Skipping upload.");
           setErrorMessage("Recording ended unexpectedly. Try again.");
           setIsRecording(false);
@@ -72,6 +84,7 @@ export default function AudioRecorder() {
         }
       
         if (blob.size < 1000) {
+          recordingStream.close();
           console.warn("Audio blob too small.");
           setErrorMessage("Recording was too short. Try again.");
           setIsRecording(false);
@@ -84,20 +97,29 @@ export default function AudioRecorder() {
       
         setIsConverting(true);
         try {
-          const formData = new FormData();
-          formData.append("file", blob, mimeType.includes("ogg") ? "recording.ogg" : "recording.webm");
-      
-          const response = await fetch(`${API_BASE_URL}/record`, {
-            method: "POST",
-            body: formData,
+          let result = await recordingStream.finish().catch((streamError) => {
+            console.warn("Streaming upload failed, sending the recording instead:", streamError);
+            return null;
           });
-      
-          if (!response.ok) {
-            throw new Error(`HTTP error: status ${response.status}`);
+
+          if (!result) {
+            const formData = new FormData();
+            formData.append("file", blob, filename);
+
+            const response = await fetch(`${API_BASE_URL}/record`, {
+              method: "POST",
+              headers: sessionIdRef.current ? { "X-Session-ID": sessionIdRef.current } : {},
+              body: formData,
+            });
+
+            if (!response.ok) {
+              throw new Error(`HTTP error: status ${response.status}`);
+            }
+
+            result = await response.json();
           }
-      
-          const result = await response.json();
           console.log("Transcription received:", result.transcription);
+          sessionIdRef.current = result.session_id;
           setTranscription(result.transcription);
         } catch (uploadError) {
           console.error("Error uploading audio:", uploadError);
@@ -109,7 +131,7 @@ export default function AudioRecorder() {
       };
       
 
-      recorder.start();
+      recorder.start(1000); // hand over a chunk every second so it can be streamed
     } catch (error) {
       console.error("Error accessing microphone:", error); //put this in to log if the microphone input is working or missing. previous versions woudl have issues with audio from the wrong source not reaching the browser, but not tripping an error, so resulted in empty blobs and invalid transcripts
       setErrorMessage("Error accessing microphone: " + error.message);
@@ -149,6 +171,7 @@ export default function AudioRecorder() {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          ...(sessionIdRef.current ? { "X-Session-ID": sessionIdRef.current } : {}),
         },
         body: JSON.stringify({ transcription }),
       });
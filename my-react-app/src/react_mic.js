@@ -1,10 +1,14 @@
 import React, { useState, useRef } from "react";
 import { FaMicrophone, FaStop } from "react-icons/fa";
 import "./styles.css"; // Your CSS file
+import { openRecordingStream } from "./recording_stream";
+
+const API_BASE_URL = process.env.REACT_APP_API_URL;
 
 export default function AudioRecorder() {
   const [isRecording, setIsRecording] = useState(false);
   const [audioUrl, setAudioUrl] = useState(null);
+  const [transcription, setTranscription] = useState("");
   const mediaRecorderRef = useRef(null);
   const audioChunksRef = useRef([]);
 
@@ -25,11 +29,19 @@ export default function AudioRecorder() {
       const mediaRecorder = new MediaRecorder(stream, options);
       mediaRecorderRef.current = mediaRecorder;
       audioChunksRef.current = [];
+      setTranscription("");
+
+      // Stream the recording to the server for transcription while it records
+      const recordingStream = await openRecordingStream(API_BASE_URL, stream, {
+        filename: mimeType.includes("ogg") ? "recording.ogg" : "recording.webm",
+        onPartial: setTranscription,
+      });
 
       // Listen for data as it becomes available
       mediaRecorder.addEventListener("dataavailable", event => {
         if (event.data && event.data.size > 0) {
           audioChunksRef.current.push(event.data);
+          recordingStream.send(event.data);
         }
       });
 
@@ -38,10 +50,14 @@ export default function AudioRecorder() {
         const audioBlob = new Blob(audioChunksRef.current, { type: mimeType });
         const url = URL.createObjectURL(audioBlob);
         setAudioUrl(url);
+        recordingStream
+          .finish()
+          .then(result => setTranscription(result.transcription))
+          .catch(error => console.error("Could not transcribe audio:", error));
       });
 
-      // Start the recording session
-      mediaRecorder.start();
+      // Start the recording session, handing over a chunk every second
+      mediaRecorder.start(1000);
       setIsRecording(true);
     } catch (error) {
       console.error("Could not record audio:", error);
@@ -81,6 +97,12 @@ export default function AudioRecorder() {
             <audio src={audioUrl} controls />
           </div>
         )}
+
+        {transcription && (
+          <div className="transcript-display">
+            <p>{transcription}</p>
+          </div>
+        )}
       </main>
     </div>
   );
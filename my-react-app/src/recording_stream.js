@@ -0,0 +1,201 @@
+// Streams a recording to the /record/stream WebSocket while it is being recorded, so the upload
+// is done (and mostly transcribed) by the time the user presses stop.
+// The microphone is captured as raw 16-bit mono PCM (format=pcm16), which the server cuts at
+// pauses and transcribes segment by segment: onPartial gets the transcript so far as each
+// segment comes back. Where an AudioWorklet is not available, the MediaRecorder chunks passed to
+// send() are streamed instead and only the final transcript arrives.
+// finish() resolves with the server's final message ({ transcription, session_id }); it rejects if
+// the socket does not open within CONNECT_TIMEOUT_MS or the transcript takes longer than
+// RESULT_TIMEOUT_MS, so the caller can fall back to POST /record.
+
+const TARGET_SAMPLE_RATE = 16000;
+const CHUNK_SAMPLES = 1600; // 0.1 s at 16 kHz
+const CONNECT_TIMEOUT_MS = 5000;
+const RESULT_TIMEOUT_MS = 60000;
+
+// Runs on the audio thread: averages groups of `factor` samples down to about 16 kHz and posts
+// them as Int16 PCM every CHUNK_SAMPLES samples, and what is left when asked to flush.
+const CAPTURE_WORKLET = `
+class PcmCapture extends AudioWorkletProcessor {
+  constructor(options) {
+    super();
+    this.factor = options.processorOptions.factor;
+    this.sum = 0;
+    this.count = 0;
+    this.samples = [];
+    this.port.onmessage = () => this.post(true);
+  }
+
+  post(flushed) {
+    const pcm = new Int16Array(this.samples.length);
+    this.samples.forEach((value, i) => {
+      pcm[i] = Math.max(-1, Math.min(1, value)) * 0x7fff;
+    });
+    this.samples = [];
+    this.port.postMessage({ pcm: pcm.buffer, flushed }, [pcm.buffer]);
+  }
+
+  process(inputs) {
+    const channel = inputs[0][0];
+    if (channel) {
+      for (const value of channel) {
+        this.sum += value;
+        this.count += 1;
+        if (this.count === this.factor) {
+          this.samples.push(this.sum / this.factor);
+          this.sum = 0;
+          this.count = 0;
+        }
+      }
+      if (this.samples.length >= ${CHUNK_SAMPLES}) {
+        this.post(false);
+      }
+    }
+    return true;
+  }
+}
+registerProcessor("pcm-capture", PcmCapture);
+`;
+
+async function openPcmCapture(mediaStream) {
+  if (typeof AudioWorkletNode === "undefined") {
+    throw new Error("AudioWorklet is not supported");
+  }
+  const context = new AudioContext();
+  const factor = Math.max(1, Math.floor(context.sampleRate / TARGET_SAMPLE_RATE));
+  const url = URL.createObjectURL(new Blob([CAPTURE_WORKLET], { type: "application/javascript" }));
+  try {
+    await context.audioWorklet.addModule(url);
+  } catch (error) {
+    context.close();
+    throw error;
+  } finally {
+    URL.revokeObjectURL(url);
+  }
+  const source = context.createMediaStreamSource(mediaStream);
+  const node = new AudioWorkletNode(context, "pcm-capture", { processorOptions: { factor } });
+  let onFlushed = null;
+  let stopped = false;
+
+  return {
+    sampleRate: Math.round(context.sampleRate / factor),
+    start: (onChunk) => {
+      node.port.onmessage = (event) => {
+        onChunk(event.data.pcm);
+        if (event.data.flushed && onFlushed) {
+          onFlushed();
+        }
+      };
+      source.connect(node);
+    },
+    // resolves once the samples still on the audio thread have been handed to onChunk
+    flush: () =>
+      withTimeout(
+        new Promise((resolve) => {
+          onFlushed = resolve;
+          node.port.postMessage("flush");
+        }),
+        1000,
+        "The audio capture did not flush"
+      ).catch(() => {}),
+    stop: () => {
+      if (!stopped) {
+        stopped = true;
+        source.disconnect();
+        node.disconnect();
+        context.close();
+      }
+    },
+  };
+}
+
+function withTimeout(promise, ms, message) {
+  let timer;
+  const timeout = new Promise((_, reject) => {
+    timer = setTimeout(() => reject(new Error(message)), ms);
+  });
+  return Promise.race([promise, timeout]).finally(() => clearTimeout(timer));
+}
+
+export async function openRecordingStream(apiBaseUrl, mediaStream, { filename, sessionId, onPartial }) {
+  let capture = null;
+  try {
+    capture = await openPcmCapture(mediaStream);
+  } catch (error) {
+    console.warn("Raw audio capture unavailable, streaming the compressed recording instead:", error);
+  }
+
+  const params = new URLSearchParams(
+    capture ? { filename: "recording.wav", format: "pcm16", sample_rate: capture.sampleRate } : { filename }
+  );
+  if (sessionId) {
+    params.set("session_id", sessionId);
+  }
+  const socket = new WebSocket(`${apiBaseUrl.replace(/^http/, "ws")}/record/stream?${params}`);
+  const partials = [];
+
+  // chunks recorded before the connection is up wait for it, in order
+  const opened = withTimeout(
+    new Promise((resolve, reject) => {
+      socket.onopen = resolve;
+      socket.onerror = () => reject(new Error("Could not open the recording stream"));
+    }),
+    CONNECT_TIMEOUT_MS,
+    "The recording stream did not open in time"
+  );
+
+  const result = new Promise((resolve, reject) => {
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (message.type === "partial") {
+        partials[message.segment] = message.text;
+        if (onPartial) {
+          onPartial(partials.filter(Boolean).join(" "));
+        }
+      } else if (message.type === "final") {
+        resolve(message);
+      } else if (message.type === "error") {
+        reject(new Error(message.detail));
+      }
+    };
+    socket.onclose = () => reject(new Error("Recording stream closed before the transcript arrived"));
+  });
+  // keep an unused failure from being reported as unhandled
+  opened.catch(() => {});
+  result.catch(() => {});
+
+  const sendNow = (chunk) => opened.then(() => socket.send(chunk)).catch(() => {});
+  if (capture) {
+    capture.start(sendNow);
+  }
+
+  const close = () => {
+    if (capture) {
+      capture.stop();
+    }
+    socket.close();
+  };
+
+  return {
+    // MediaRecorder chunks; ignored while raw PCM is streamed
+    send: (chunk) => (capture ? Promise.resolve() : sendNow(chunk)),
+    finish: async () => {
+      if (capture) {
+        await capture.flush();
+      }
+      try {
+        await opened;
+        socket.send("end");
+        return await withTimeout(result, RESULT_TIMEOUT_MS, "The transcript did not arrive in time");
+      } catch (error) {
+        close();
+        throw error;
+      } finally {
+        if (capture) {
+          capture.stop();
+        }
+      }
+    },
+    close,
+  };
+}
@@ -0,0 +1,113 @@
+import io
+import os
+from math import gcd
+
+import numpy as np
+
+from config import audio_preprocess
+
+# Both are optional: without scipy uploads are sent as received, without pydub only WAV is decoded
+try:
+    from scipy.io import wavfile
+    from scipy.signal import resample_poly
+except ImportError:
+    wavfile = resample_poly = None
+
+try:
+    from pydub import AudioSegment
+except ImportError:
+    AudioSegment = None
+
+TRIM_FRAME = 0.03  # seconds
+
+
+def decode(audio, filename):
+    """
+    Returns (sample_rate, samples as float32 in [-1, 1], channels last) or None if the upload
+    cannot be decoded here (not a WAV file and no pydub/ffmpeg).
+    """
+    if filename.lower().endswith(".wav") or audio[:4] == b"RIFF":
+        try:
+            rate, samples = wavfile.read(io.BytesIO(audio))
+        except ValueError:
+            return None
+        if samples.dtype == np.uint8:
+            return rate, (samples.astype(np.float32) - 128) / 128
+        if samples.dtype.kind == "i":
+            return rate, samples.astype(np.float32) / -np.iinfo(samples.dtype).min
+        return rate, samples.astype(np.float32)
+    if AudioSegment is None:
+        return None
+    try:
+        segment = AudioSegment.from_file(io.BytesIO(audio), format=os.path.splitext(filename)[1].lstrip(".") or None)
+    except Exception:
+        return None
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32) / (1 << (8 * segment.sample_width - 1))
+    return segment.frame_rate, samples.reshape(-1, segment.channels)
+
+
+def to_mono(samples):
+    return samples.mean(axis=1) if samples.ndim > 1 else samples
+
+
+def resample(samples, rate, target):
+    if rate == target:
+        return samples
+    g = gcd(rate, target)
+    return resample_poly(samples, target // g, rate // g).astype(np.float32)
+
+
+def trim_silence(samples, rate, dbfs=-45, padding=0.2):
+    """
+    Cuts leading and trailing audio whose RMS (per 30 ms frame) stays below dbfs, keeping padding
+    seconds on both sides. All-silent audio is returned unchanged.
+    """
+    frame = max(1, int(rate * TRIM_FRAME))
+    count = len(samples) // frame
+    if not count:
+        return samples
+    rms = np.sqrt(np.mean(samples[:count * frame].reshape(count, frame) ** 2, axis=1))
+    loud = np.flatnonzero(rms >= 10 ** (dbfs / 20))
+    if not len(loud):
+        return samples
+    pad = int(rate * padding)
+    return samples[max(0, loud[0] * frame - pad):min(len(samples), (loud[-1] + 1) * frame + pad)]
+
+
+def encode(samples, rate, fmt="flac"):
+    """
+    Returns (bytes, extension). FLAC and Ogg Opus go through pydub/ffmpeg; WAV otherwise.
+    """
+    pcm = (np.clip(samples, -1, 1) * 32767).astype("<i2")
+    if fmt in ("flac", "ogg") and AudioSegment is not None:
+        segment = AudioSegment(pcm.tobytes(), frame_rate=rate, sample_width=2, channels=1)
+        buffer = io.BytesIO()
+        try:
+            segment.export(buffer, format=fmt, codec="libopus" if fmt == "ogg" else None)
+            return buffer.getvalue(), fmt
+        except Exception:
+            pass
+    buffer = io.BytesIO()
+    wavfile.write(buffer, rate, pcm)
+    return buffer.getvalue(), "wav"
+
+
+def preprocess_audio(audio, filename):
+    """
+    Normalizes an upload for transcription per config.audio_preprocess and returns
+    (audio, filename). The upload is returned as is when it cannot be decoded or would not shrink,
+    and when scipy is not installed.
+    """
+    if not audio_preprocess["enabled"] or wavfile is None:
+        return audio, filename
+    decoded = decode(audio, filename)
+    if decoded is None:
+        return audio, filename
+    rate, samples = decoded
+    target = audio_preprocess["sample_rate"]
+    samples = resample(to_mono(samples), rate, target)
+    samples = trim_silence(samples, target, audio_preprocess["trim_dbfs"], audio_preprocess["trim_padding"])
+    encoded, extension = encode(samples, target, audio_preprocess["format"])
+    if len(encoded) >= len(audio):
+        return audio, filename
+    return encoded, f"{os.path.splitext(filename)[0]}.{extension}"
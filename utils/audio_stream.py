@@ -0,0 +1,139 @@
+import asyncio
+import io
+import tempfile
+import wave
+
+import numpy as np
+
+from config import audio_stream
+
+FRAME_SECONDS = 0.03
+
+
+def pcm_to_wav(samples, sample_rate):
+    """
+    16-bit mono samples as the bytes of a WAV file.
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+class SilenceSegmenter:
+    """
+    Cuts a stream of raw 16-bit mono PCM into segments at pauses. feed() returns the segments
+    completed by a chunk (arrays of samples), flush() the rest. Segments without any sound are
+    dropped, since whisper tends to invent text for silence.
+    """
+
+    def __init__(self, sample_rate, silence_dbfs=-40, min_silence=0.6, min_segment=3, max_segment=30):
+        self.sample_rate = sample_rate
+        self.frame = max(1, int(sample_rate * FRAME_SECONDS))
+        self.threshold = 32768 * 10 ** (silence_dbfs / 20)
+        self.min_silence = int(np.ceil(min_silence / FRAME_SECONDS))
+        self.min_segment = int(min_segment / FRAME_SECONDS)
+        self.max_segment = int(max_segment / FRAME_SECONDS)
+        self.carry = b""  # odd byte or partial frame left from the last chunk
+        self.frames = []  # frames of the current segment
+        self.voiced = False
+        self.silent_run = 0
+
+    def feed(self, data):
+        data = self.carry + data
+        usable = len(data) - len(data) % (2 * self.frame)
+        self.carry = data[usable:]
+        frames = np.frombuffer(data[:usable], dtype="<i2").reshape(-1, self.frame)
+        rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+
+        segments = []
+        for frame, silent in zip(frames, rms < self.threshold):
+            self.frames.append(frame)
+            self.silent_run = self.silent_run + 1 if silent else 0
+            self.voiced = self.voiced or not silent
+            pause = self.silent_run >= self.min_silence and len(self.frames) >= self.min_segment
+            if pause or len(self.frames) >= self.max_segment:
+                segments.extend(self._cut())
+        return segments
+
+    def flush(self):
+        if self.carry:
+            tail = np.frombuffer(self.carry[:len(self.carry) - len(self.carry) % 2], dtype="<i2")
+            self.carry = b""
+            if len(tail):
+                self.frames.append(tail)
+                self.voiced = self.voiced or np.sqrt(np.mean(tail.astype(np.float64) ** 2)) >= self.threshold
+        return self._cut() if self.frames else []
+
+    def _cut(self):
+        segment = np.concatenate(self.frames) if self.voiced else None
+        self.frames, self.voiced, self.silent_run = [], False, 0
+        return [] if segment is None else [segment]
+
+
+class StreamingTranscription:
+    """
+    One streamed dictation. Container formats (webm/ogg from MediaRecorder) cannot be decoded
+    chunk by chunk, so they are spooled (to disk past config.audio_stream["spool_memory"]) and
+    the spool file is streamed to the transcription backend once the upload ends. Raw PCM
+    (fmt="pcm16", sample_rate given) is segmented at pauses and every segment is transcribed as
+    soon as it is complete; on_partial(index, text) is awaited for each in completion order.
+    """
+
+    def __init__(self, service, filename="audio.webm", fmt=None, sample_rate=16000, on_partial=None):
+        self.service = service
+        self.filename = filename
+        self.on_partial = on_partial
+        self.received = 0
+        self.spool = tempfile.SpooledTemporaryFile(max_size=audio_stream["spool_memory"])
+        self.segmenter = None
+        if fmt == "pcm16":
+            self.segmenter = SilenceSegmenter(sample_rate, audio_stream["silence_dbfs"], audio_stream["min_silence"],
+                                              audio_stream["min_segment"], audio_stream["max_segment"])
+        self.tasks = []
+
+    async def add(self, chunk):
+        """
+        Takes the next chunk of the upload. Raises ValueError past config.audio_stream["max_bytes"].
+        """
+        self.received += len(chunk)
+        if self.received > audio_stream["max_bytes"]:
+            raise ValueError(f"Recording is larger than {audio_stream['max_bytes']} bytes")
+        if self.segmenter is None:
+            self.spool.write(chunk)
+            return
+        for segment in self.segmenter.feed(chunk):
+            self._start(segment)
+
+    async def finish(self):
+        """
+        Transcribes what is left and returns the text of the whole recording.
+        """
+        if self.segmenter is None:
+            self.spool.seek(0)
+            if self.spool.read(1):
+                self.tasks.append(asyncio.create_task(self.service.transcribe(self.spool, self.filename)))
+        else:
+            for segment in self.segmenter.flush():
+                self._start(segment)
+        texts = await asyncio.gather(*self.tasks)
+        return " ".join(text.strip() for text in texts if text.strip())
+
+    def close(self):
+        for task in self.tasks:
+            task.cancel()
+        self.spool.close()
+
+    def _start(self, segment):
+        index = len(self.tasks)
+        wav = pcm_to_wav(segment, self.segmenter.sample_rate)
+        self.tasks.append(asyncio.create_task(self._transcribe(index, wav, f"segment_{index}.wav")))
+
+    async def _transcribe(self, index, audio, filename):
+        text = await self.service.transcribe(audio, filename)
+        if self.on_partial is not None:
+            await self.on_partial(index, text)
+        return text
@@ -0,0 +1,87 @@
+"""
+Upload size and preprocessing time of audio_preprocess.preprocess_audio on sample recordings:
+synthetic dictations in the formats the recorders produce (stereo 48 kHz and 44.1 kHz WAV with
+silence before and after, mono 16 kHz WAV) plus any files given. The upload time is estimated
+at --mbps; with --transcribe both versions also go through the transcription backend.
+
+Usage: python bench_audio.py [FILE ...] [--mbps N] [--repeat N] [--transcribe] [--backend local|openai]
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import time
+
+import numpy as np
+from scipy.io import wavfile
+
+from audio_preprocess import preprocess_audio
+from transcription import build_transcriber
+
+
+def dictation(rate, channels, seconds, lead=2.0, tail=3.0, seed=0):
+    """
+    Speech-like WAV bytes: bursts of harmonics with a syllable envelope over low noise, with
+    lead and tail seconds of near silence.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(rate * seconds)) / rate
+    pitch = 140 + 20 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = np.clip(np.sin(2 * np.pi * 3 * t), 0, None) * (rng.random(len(t)) > 0.001)
+    speech = 0.3 * voice * envelope
+    signal = np.concatenate([np.zeros(int(rate * lead)), speech, np.zeros(int(rate * tail))])
+    signal = signal + rng.normal(0, 0.002, len(signal))
+    pcm = (np.clip(signal, -1, 1) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    wavfile.write(buffer, rate, np.repeat(pcm[:, None], channels, axis=1) if channels > 1 else pcm)
+    return buffer.getvalue()
+
+
+def samples(paths):
+    yield "browser 48kHz stereo 20s", "browser.wav", dictation(48000, 2, 20)
+    yield "audio_capture 44.1kHz stereo 5s", "capture.wav", dictation(44100, 2, 5, lead=0.5, tail=0.5)
+    yield "mono 16kHz 20s", "mono.wav", dictation(16000, 1, 20, lead=0.2, tail=0.2)
+    for path in paths:
+        with open(path, "rb") as f:
+            yield os.path.basename(path), os.path.basename(path), f.read()
+
+
+async def transcribe_latency(transcriber, audio, filename):
+    start = time.perf_counter()
+    await transcriber.transcribe(audio, filename)
+    return time.perf_counter() - start
+
+
+def run(paths, mbps, repeat, transcribe, backend):
+    transcriber = build_transcriber(backend) if transcribe else None
+    for label, filename, audio in samples(paths):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            processed, processed_name = preprocess_audio(audio, filename)
+            timings.append(time.perf_counter() - start)
+        upload = len(audio) * 8 / (mbps * 1e6)
+        processed_upload = len(processed) * 8 / (mbps * 1e6)
+        print(f"{label}")
+        print(f"  size      {len(audio) / 1024:9.1f}KB -> {len(processed) / 1024:8.1f}KB {processed_name:<14}"
+              f" ({1 - len(processed) / len(audio):.0%} smaller)")
+        print(f"  latency   preprocess {statistics.median(timings) * 1000:7.1f}ms | upload at {mbps}Mbps "
+              f"{upload * 1000:7.0f}ms -> {processed_upload * 1000:6.0f}ms")
+        if transcriber is not None:
+            before = asyncio.run(transcribe_latency(transcriber, audio, filename))
+            after = asyncio.run(transcribe_latency(transcriber, processed, processed_name))
+            print(f"  transcribe {before * 1000:7.0f}ms -> {after * 1000:7.0f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--mbps", type=float, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--transcribe", action="store_true")
+    parser.add_argument("--backend", default=None)
+    args = parser.parse_args()
+    run(args.files, args.mbps, args.repeat, args.transcribe, args.backend)
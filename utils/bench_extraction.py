@@ -0,0 +1,82 @@
+"""
+Latency and agreement of the local rule-based extractor on the fixture corpus
+(extraction_fixtures.json): how many transcripts it answers with enough confidence to skip
+the RAG chain, how often those answers agree with the expected ones, and how fast it is.
+With --rag the remaining transcripts also go through extract_scan_fields for comparison.
+
+Usage: python bench_extraction.py [--fixtures PATH] [--repeat N] [--rag] [--backend local|openai]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import time
+
+from config import local_extraction
+from local_extractor import get_local_extractor
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "extraction_fixtures.json")
+
+
+def fields(answer):
+    return [part.strip() for part in answer.split(",")]
+
+
+def agreement(pairs):
+    """
+    Share of (answer, expected) pairs agreeing on all five fields, and on modality and priority only.
+    """
+    if not pairs:
+        return 0.0, 0.0
+    exact = sum(fields(a) == fields(e) for a, e in pairs)
+    scheduling = sum(fields(a)[2] == fields(e)[2] and fields(a)[4] == fields(e)[4] for a, e in pairs)
+    return exact / len(pairs), scheduling / len(pairs)
+
+
+def run(fixtures, repeat, with_rag, backend):
+    extractor = get_local_extractor()
+    latencies, local, deferred = [], [], []
+    for case in fixtures:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            answer, confidence = extractor.extract(case["transcript"])
+            latencies.append(time.perf_counter() - start)
+        if answer is not None and confidence >= local_extraction["min_confidence"]:
+            local.append((answer, case["expected"]))
+        else:
+            deferred.append(case)
+
+    exact, scheduling = agreement(local)
+    latencies.sort()
+    print(f"{len(fixtures)} transcripts, {len(local)} answered locally ({len(local) / len(fixtures):.0%}), "
+          f"{len(deferred)} deferred to RAG")
+    print(f"  local latency   median {statistics.median(latencies) * 1e6:7.1f}us | "
+          f"p95 {latencies[int(0.95 * (len(latencies) - 1))] * 1e6:7.1f}us")
+    print(f"  local agreement exact {exact:.0%} | modality and priority {scheduling:.0%}")
+
+    if with_rag and deferred:
+        from stateful_scheduling import extract_scan_fields
+
+        rag_latencies, rag_pairs = [], []
+        for case in deferred:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                answer = extract_scan_fields("scheduler-vectorised", case["transcript"], backend)
+            rag_latencies.append(time.perf_counter() - start)
+            rag_pairs.append((answer, case["expected"]))
+        exact, scheduling = agreement(rag_pairs)
+        print(f"  RAG latency     median {statistics.median(rag_latencies) * 1000:7.1f}ms on the deferred transcripts")
+        print(f"  RAG agreement   exact {exact:.0%} | modality and priority {scheduling:.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--rag", action="store_true")
+    parser.add_argument("--backend", default=None)
+    args = parser.parse_args()
+    with open(args.fixtures) as f:
+        run(json.load(f), args.repeat, args.rag, args.backend)
@@ -0,0 +1,56 @@
+"""
+Compares a cold solve of a synthetic backlog with a warm SchedulingSession re-solve
+after one urgent scan is added (only the scans it can reach are re-solved). Both use the
+"optimize" solver profile of POST /backlog/scans, with the given time limit.
+
+Usage: python bench_incremental.py [backlog sizes...] [--time-limit SECONDS]
+"""
+import argparse
+import time
+
+from optimizer import load_scan_requests, build_scan_model, solve_model
+from scheduling_session import SchedulingSession
+from solver_profile import SolverProfile
+from workload import generate_scan_requests
+
+
+def urgent_scan(backlog_size):
+    return (
+        "scan_id,scan_type,duration,priority,patient_id,check_in_date,check_in_time\n"
+        f"URGENT,MRI,30,1,{backlog_size},2025-03-26,09:00\n"
+    )
+
+
+def run(backlog_size, time_limit):
+    backlog = generate_scan_requests(backlog_size)
+    profile = SolverProfile.from_config("optimize", time_limit=time_limit)
+    session = SchedulingSession(profile=profile)
+    start = time.perf_counter()
+    session.add_scans(backlog)
+    initial = time.perf_counter() - start
+
+    # Cold: rebuild and solve the whole backlog plus the urgent scan from scratch.
+    combined = backlog + urgent_scan(backlog_size).split("\n", 1)[1]
+    start = time.perf_counter()
+    scans_data, reference_datetime = load_scan_requests(combined)
+    model, _, _ = build_scan_model(scans_data, [], reference_datetime)
+    cold_ok = solve_model(model, profile) is not None
+    cold = time.perf_counter() - start
+
+    # Warm: the session re-solves the scans the urgent one can reach, hinted with their last slot.
+    start = time.perf_counter()
+    warm_ok = session.add_scans(urgent_scan(backlog_size)) is not None
+    warm = time.perf_counter() - start
+
+    print(f"{backlog_size:>6} scans | initial {initial:8.3f}s | cold {cold:8.3f}s ({'ok' if cold_ok else 'no solution'})"
+          f" | warm {warm:8.3f}s ({'ok' if warm_ok else 'no solution'}, {session.solve_info.get('free_scans')} re-solved)"
+          f" | speed-up {cold / warm:5.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("sizes", nargs="*", type=int, default=[100, 500, 2000])
+    parser.add_argument("--time-limit", type=float, default=30.0)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.time_limit)
@@ -0,0 +1,51 @@
+"""
+Compares the single-model engine (optimizer.solve_scans) with the per-modality engine
+(modality_engine.solve_by_modality) on synthetic backlogs with repeat patients, so that the
+modality engine also has cross-modality patient conflicts to repair. The process pool is
+started before the first timed solve.
+
+Usage: python bench_modality.py [backlog sizes...] [--profile NAME] [--time-limit SECONDS]
+                              [--repeat-patients R]
+"""
+import argparse
+import time
+
+from modality_engine import solve_by_modality
+from optimizer import load_scan_requests, solve_scans
+from solver_profile import SolverProfile
+from workload import generate_scan_requests
+
+
+def measure(label, engine, scans_data, reference_datetime, profile):
+    solve_info = {}
+    start = time.perf_counter()
+    schedule = engine(scans_data, [], reference_datetime, profile, solve_info)
+    elapsed = time.perf_counter() - start
+    if schedule is None:
+        print(f"  {label:<9} {elapsed:8.3f}s no solution")
+        return
+    print(f"  {label:<9} {elapsed:8.3f}s {solve_info['status']:<8} objective {solve_info['objective']:.0f}"
+          f" gap {solve_info['gap']:.4f}")
+
+
+def run(size, profile, repeat_patients):
+    csv = generate_scan_requests(size, span_days=max(1, size // 50), repeat_patients=repeat_patients)
+    scans_data, reference_datetime = load_scan_requests(csv)
+    print(f"{size} scans")
+    measure("single", solve_scans, scans_data, reference_datetime, profile)
+    measure("modality", solve_by_modality, scans_data, reference_datetime, profile)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("sizes", nargs="*", type=int, default=[100, 500, 2000])
+    parser.add_argument("--profile", default="default", help="solver profile in config.solver_profiles")
+    parser.add_argument("--time-limit", type=float, default=30.0)
+    parser.add_argument("--repeat-patients", type=float, default=0.1)
+    args = parser.parse_args()
+    profile = SolverProfile.from_config(args.profile, time_limit=args.time_limit)
+    # Spawned workers import the solver on start-up; keep that out of the first measurement.
+    warm_up, warm_up_reference = load_scan_requests(generate_scan_requests(30, seed=1))
+    solve_by_modality(warm_up, [], warm_up_reference, profile)
+    for size in args.sizes:
+        run(size, profile, args.repeat_patients)
@@ -0,0 +1,144 @@
+"""
+End-to-end benchmark of optimize_scan_scheduling on synthetic workloads (workload.py with the
+mix in config.benchmark_workload): for each size, a stream of scan requests is scheduled
+around a generated existing schedule, and the model build time, solver time, objective, gap,
+post-processing time and validation counts are reported and written as JSON. With --baseline
+an earlier JSON file is compared and the run fails when a size slows down by more than
+--tolerance or its objective falls by more than --objective-tolerance (relative).
+
+Usage: python bench_optimizer.py [--sizes N ...] [--existing-ratio R] [--time-limit SECONDS]
+                                 [--workers N] [--seed N] [--output PATH] [--baseline PATH]
+                                 [--tolerance R] [--objective-tolerance R]
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from config import benchmark_workload, machines
+from optimizer import optimize_scan_scheduling
+from schedule_store import open_schedule_repository
+from solver_profile import SolverProfile
+from workload import generate_existing_schedule, generate_scan_requests
+
+START = "2025-03-25 00:00"
+
+
+def span_days(n):
+    """
+    Days the requests are spread over so that they fill the machines to the configured utilization.
+    """
+    mix, durations = benchmark_workload["modality_mix"], benchmark_workload["durations"]
+    mean_duration = sum(w * sum(durations[t]) / 2 for t, w in mix.items()) / sum(mix.values())
+    capacity = sum(len(m_list) for m_list in machines.values()) * 1440 * benchmark_workload["utilization"]
+    return max(1, math.ceil(n * mean_duration / capacity))
+
+
+def run_size(n, existing, profile, seed):
+    requests = generate_scan_requests(
+        n, start=START, span_days=span_days(n), seed=seed,
+        priority_mix=benchmark_workload["priority_mix"], modality_mix=benchmark_workload["modality_mix"],
+        hourly_rates=benchmark_workload["hourly_rates"], durations=benchmark_workload["durations"],
+        repeat_patients=benchmark_workload["repeat_patients"],
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        schedule_path = os.path.join(tmp, "schedule.csv")
+        open_schedule_repository(schedule_path).sync(generate_existing_schedule(
+            existing, start=START, seed=seed, utilization=benchmark_workload["utilization"],
+            durations=benchmark_workload["durations"]))
+        solve_info = {}
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            schedule = optimize_scan_scheduling(requests, schedule_path, profile=profile, solve_info=solve_info)
+        total = time.perf_counter() - start
+
+    result = {
+        "scans": n,
+        "existing": existing,
+        "status": solve_info.get("status"),
+        "objective": solve_info.get("objective"),
+        "bound": solve_info.get("bound"),
+        "gap": solve_info.get("gap"),
+        "build_time": solve_info.get("build_time"),
+        "solve_time": solve_info.get("wall_time"),
+        "total_time": total,
+        "scheduled": None if schedule is None else len(schedule),
+    }
+    result.update(solve_info.get("timings", {}))
+    result["validation"] = solve_info.get("validation")
+    return result
+
+
+def print_result(r):
+    def seconds(key):
+        return "      -" if r.get(key) is None else f"{r[key]:7.2f}"
+
+    gap = "     -" if r["gap"] is None else f"{r['gap']:6.2%}"
+    print(f"{r['scans']:>6} scans {r['existing']:>6} booked | {r['status'] or 'NO SOLUTION':<11} gap {gap}"
+          f" | build {seconds('build_time')}s solve {seconds('solve_time')}s post {seconds('post_process')}s"
+          f" total {seconds('total_time')}s")
+
+
+def compare(results, baseline_path, tolerance, objective_tolerance):
+    """
+    Returns the sizes whose total time grew by more than tolerance, or whose objective fell by
+    more than objective_tolerance, against the results in baseline_path.
+    """
+    with open(baseline_path) as f:
+        baseline = {r["scans"]: r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        before = baseline.get(r["scans"])
+        if before is None:
+            continue
+        if r["total_time"] > before["total_time"] * (1 + tolerance):
+            regressions.append(f"{r['scans']} scans: {before['total_time']:.2f}s -> {r['total_time']:.2f}s")
+        if before["objective"] is not None and (
+                r["objective"] is None
+                or r["objective"] < before["objective"] - objective_tolerance * abs(before["objective"])):
+            regressions.append(f"{r['scans']} scans: objective {before['objective']} -> {r['objective']}")
+    return regressions
+
+
+def run(args):
+    profile = SolverProfile.from_config(time_limit=args.time_limit, num_workers=args.workers)
+    results = []
+    for n in args.sizes:
+        results.append(run_size(n, int(n * args.existing_ratio), profile, args.seed))
+        print_result(results[-1])
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "settings": {"time_limit": args.time_limit, "workers": args.workers, "seed": args.seed,
+                         "existing_ratio": args.existing_ratio, "workload": benchmark_workload},
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance, args.objective_tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", nargs="*", type=int, default=[10, 100, 1000, 10000, 50000])
+    parser.add_argument("--existing-ratio", type=float, default=0.5)
+    parser.add_argument("--time-limit", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--objective-tolerance", type=float, default=0.01)
+    run(parser.parse_args())
@@ -0,0 +1,58 @@
+"""
+Per-request latency of search_with_rag with the chain built on every request (as before)
+against the chain cached per process. Runs offline on the local backend by default.
+Local rule-based extraction is turned off and the extraction cache emptied before every request,
+so each request goes through the chain.
+
+Usage: python bench_rag.py [--requests N] [--backend local|openai] [--index NAME]
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import time
+
+import stateful_scheduling
+from config import local_extraction
+from stateful_scheduling import build_chain, extraction_cache, search_with_rag
+
+TRANSCRIPT = "Patient presents with sudden weakness on one side and slurred speech, suspected acute stroke."
+
+
+def measure(label, requests, index_name, backend):
+    latencies = []
+    for _ in range(requests):
+        extraction_cache.clear()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            search_with_rag(index_name, TRANSCRIPT, backend)
+        latencies.append(time.perf_counter() - start)
+    print(f"  {label:<9} first {latencies[0] * 1000:8.1f}ms | median {statistics.median(latencies) * 1000:8.1f}ms"
+          f" | total {sum(latencies):7.3f}s for {requests} requests")
+
+
+def run(requests, index_name, backend):
+    print(f"{backend} backend, {requests} requests")
+    # The local rules answer TRANSCRIPT on their own; the chain is what is measured here.
+    local_enabled = local_extraction["enabled"]
+    local_extraction["enabled"] = False
+    try:
+        # Uncached: swap in a lookup that builds a new chain every time, like the old search_with_rag.
+        cached = stateful_scheduling.get_chain
+        stateful_scheduling.get_chain = build_chain
+        try:
+            measure("uncached", requests, index_name, backend)
+        finally:
+            stateful_scheduling.get_chain = cached
+        measure("cached", requests, index_name, backend)
+    finally:
+        local_extraction["enabled"] = local_enabled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--backend", default="local")
+    parser.add_argument("--index", default="scheduler-vectorised")
+    args = parser.parse_args()
+    run(args.requests, args.index, args.backend)
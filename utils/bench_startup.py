@@ -0,0 +1,70 @@
+"""
+Cold import time of the API (flask_app), measured with python -X importtime in fresh
+interpreters, and the import time of each subsystem it now loads on first use (or in the warmup
+after startup). Exits with status 1 when the median import time of flask_app exceeds
+config.service["startup_budget"], so it can gate deployments.
+
+Usage: python bench_startup.py [--runs N] [--budget SECONDS] [--top N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from config import service
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SUBSYSTEMS = ["stateful_scheduling", "main", "intake", "transcription", "audio_stream"]
+
+
+def importtime(statement):
+    """
+    Runs statement in a new interpreter with -X importtime. Returns {module: (self, cumulative)}
+    in seconds for the modules it imported, or None if the statement failed.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=HERE,
+                            capture_output=True, text=True)
+    if result.returncode:
+        return None
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        own, cumulative, module = line[len("import time:"):].split("|")
+        times[module.strip()] = (int(own) / 1e6, int(cumulative) / 1e6)
+    return times
+
+
+def run(runs, budget, top):
+    samples = [importtime("import flask_app") for _ in range(runs)]
+    if samples[0] is None:
+        sys.exit("flask_app failed to import")
+    startup = statistics.median(sample["flask_app"][1] for sample in samples)
+    print(f"import flask_app   median {startup * 1000:7.0f}ms over {runs} runs (budget {budget * 1000:.0f}ms)")
+    slowest = sorted(samples[-1].items(), key=lambda item: item[1][0], reverse=True)[:top]
+    for module, (own, _) in slowest:
+        print(f"  {module:<40} {own * 1000:7.1f}ms")
+
+    print("deferred until first use:")
+    loaded = set(samples[-1])
+    for name in SUBSYSTEMS:
+        times = importtime(f"import flask_app, {name}")
+        if times is None:
+            print(f"  {name:<20} not importable here (missing dependencies)")
+            continue
+        extra = sum(own for module, (own, _) in times.items() if module not in loaded)
+        print(f"  {name:<20} {extra * 1000:7.0f}ms")
+
+    if startup > budget:
+        print(f"REGRESSION: flask_app imports in {startup:.2f}s, over the {budget:.2f}s budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=service["startup_budget"])
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+    run(args.runs, args.budget, args.top)
@@ -3,3 +3,175 @@ machines = {
     "MRI": ["MRI-1", "MRI-2", "MRI-3"],
     "X-Ray": ["XRay-1", "XRay-2"]
 }
+
+# Backlogs of at least min_scans new scans are solved in window_minutes slices by check-in time,
+# each slice limited to window_time_limit seconds
+rolling_horizon = {
+    "window_minutes": 1440,
+    "window_time_limit": 10,
+    "min_scans": 500
+}
+
+# Engine of optimize_scan_scheduling when none is passed (see optimizer.select_engine): "auto" solves one
+# model and switches to the rolling horizon from rolling_horizon["min_scans"] scans, "single", "rolling" or
+# "modality" (one model per modality, solved in parallel processes by modality_engine.solve_by_modality).
+# The OPTIMIZER_ENGINE environment variable overrides name.
+optimizer_engine = {
+    "name": "auto"
+}
+
+# Latest start of a scan after its check-in, in minutes, per priority (Priority 0 has none)
+deadline_map = {1: 1440, 2: 10080, 3: 43200, 4: 86400, 5: 345600}
+
+# Fixed maintenance windows, reserved as intervals in the CP-SAT model: every machine is down for
+# duration minutes from each daily start time ("HH:MM"); "machines" maps a machine to its own times.
+# validation reports scans ending more than max_interval minutes after their machine's last maintenance.
+maintenance = {
+    "daily": ["03:00"],
+    "duration": 60,
+    "machines": {},
+    "max_interval": 1440
+}
+
+# Priority 0 bump pass (maintenance.bump_priority_zero): with reassign, a scan in the way of a
+# Priority 0 scan moves to an idle machine of its modality instead of being pushed back
+priority_zero_bump = {
+    "reassign": False
+}
+
+# Limits of the batch intake endpoint (intake.py, POST /optimize/batch); max_duration in minutes
+intake = {
+    "max_scans": 5000,
+    "max_duration": 480
+}
+
+# Excel agenda (excel_export.create_machine_agenda_excel): one sheet per day with a row per
+# slot_minutes time slot; appointments not aligned to the slots are rounded out to whole slots
+excel_agenda = {
+    "slot_minutes": 5
+}
+
+# Synthetic workload of bench_optimizer.py (workload.generate_scan_requests): share of requests per
+# priority and modality, relative check-in rate per hour of day (0-23), duration range in minutes
+# per modality, share of requests from a patient who already has one, and the target machine
+# utilization the request span is sized for
+benchmark_workload = {
+    "priority_mix": {0: 0.02, 1: 0.1, 2: 0.2, 3: 0.28, 4: 0.2, 5: 0.2},
+    "modality_mix": {"CT": 0.45, "MRI": 0.3, "X-Ray": 0.25},
+    "hourly_rates": [1, 1, 1, 1, 1, 1, 2, 4, 8, 10, 10, 9, 8, 9, 10, 10, 9, 7, 5, 3, 2, 2, 1, 1],
+    "durations": {"CT": (15, 45), "MRI": (30, 60), "X-Ray": (10, 20)},
+    "repeat_patients": 0.1,
+    "utilization": 0.5
+}
+
+# CP-SAT settings per endpoint (see solver_profile.SolverProfile); time_limit is in seconds
+solver_profiles = {
+    "default": {"time_limit": 30, "num_workers": 8},
+    "optimize": {"time_limit": 10, "num_workers": 8, "relative_gap": 0.01},
+}
+
+# Background optimization jobs (jobs.JobManager): improving solutions are sent as "solution" events
+# (objective, bound, wall time) at most once every solution_interval seconds; the schedule is only
+# in the final "done" event
+optimize_jobs = {
+    "solution_interval": 0.5
+}
+
+# RAG extraction (stateful_scheduling): "openai" for OpenAI + Pinecone, "local" for a fake chat model
+# over an in-memory store (offline tests and benchmarks); the RAG_BACKEND environment variable
+# overrides backend. Chains and the pooled HTTP client (max_connections, timeout in seconds) are
+# built once per process.
+rag = {
+    "backend": "openai",
+    "model": "gpt-4o-mini",
+    "max_connections": 20,
+    "timeout": 30
+}
+
+# Speech-to-text for /record (transcription.TranscriptionService): "openai" for whisper-1 through one
+# shared async client, "local" for a stand-in that returns local_text after local_latency seconds
+# (offline tests and load checks); the TRANSCRIPTION_BACKEND environment variable overrides backend.
+# At most max_concurrent uploads are transcribed at once, each for at most timeout seconds.
+transcription = {
+    "backend": "openai",
+    "model": "whisper-1",
+    "max_concurrent": 8,
+    "timeout": 60,
+    "max_retries": 2,
+    "local_text": "Patient with suspected stroke, MRI of the head, priority one.",
+    "local_latency": 0.5
+}
+
+# Audio preprocessing before transcription (audio_preprocess.preprocess_audio): downmix to mono,
+# resample to sample_rate, trim leading and trailing audio below trim_dbfs (keeping trim_padding
+# seconds) and re-encode as "flac", "ogg" (Opus) or "wav". FLAC/Opus need pydub with ffmpeg and
+# fall back to WAV; without them only WAV uploads can be decoded. Without scipy nothing is
+# preprocessed. The original upload is sent whenever the result would not be smaller.
+audio_preprocess = {
+    "enabled": True,
+    "sample_rate": 16000,
+    "format": "flac",
+    "trim_dbfs": -45,
+    "trim_padding": 0.2
+}
+
+# Streaming dictation over the /record/stream WebSocket (audio_stream): uploads are spooled to a
+# temporary file past spool_memory bytes and refused past max_bytes. Raw 16-bit mono PCM streams are
+# cut at pauses (below silence_dbfs for min_silence seconds, once the segment is min_segment seconds
+# long, and always at max_segment) and each segment is transcribed while the upload continues.
+audio_stream = {
+    "spool_memory": 1048576,
+    "max_bytes": 52428800,
+    "silence_dbfs": -40,
+    "min_silence": 0.6,
+    "min_segment": 3,
+    "max_segment": 30
+}
+
+# Rule-based extraction tried before the RAG chain (local_extractor.LocalExtractor, rules file
+# relative to utils/); answers below min_confidence go to the chain
+local_extraction = {
+    "enabled": True,
+    "rules": "extraction_rules.json",
+    "min_confidence": 0.8
+}
+
+# Cache of extracted answers per normalized transcript (extraction_cache.ExtractionCache). With a
+# similarity_threshold (cosine similarity of the RAG embeddings, e.g. 0.95) near-identical dictations
+# are served from the cache too, at the cost of one embedding call per miss.
+rag_cache = {
+    "max_entries": 1000,
+    "ttl_seconds": 86400,
+    "similarity_threshold": None
+}
+
+# API worker startup (flask_app): with warmup the RAG, solver and audio modules are imported in a
+# background thread once the server is up instead of before it answers. startup_budget is the
+# import time of flask_app in seconds that bench_startup.py treats as a regression.
+service = {
+    "warmup": True,
+    "startup_budget": 1.5
+}
+
+# Saved schedule (schedule_store.open_schedule_repository): a CSV file, or SQLite for .db/.sqlite
+# paths (the SCHEDULE_STORE environment variable overrides path). An optimization whose schedule
+# was changed by another one while it solved is re-run up to max_retries times.
+schedule_store = {
+    "path": "current_schedule_multiple_machines.csv",
+    "max_retries": 3
+}
+
+# Incremental re-solves of the backlog (scheduling_session.SchedulingSession, POST /backlog/scans): scans
+# whose last slot is more than free_margin minutes outside every new scan's check-in-to-deadline
+# window of their modality keep that slot, and only the rest are re-solved
+scheduling_session = {
+    "free_margin": 60
+}
+
+# Per-session transcript store used by the API; "memory" or "sqlite:///path/to/sessions.db"
+# (the SESSION_STORE environment variable overrides url). Use SQLite with several workers.
+session_store = {
+    "url": "memory",
+    "ttl_seconds": 3600,
+    "max_sessions": 10000
+}
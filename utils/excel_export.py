@@ -1,51 +1,80 @@
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment
 from openpyxl.utils import get_column_letter
-from datetime import datetime
+from openpyxl.worksheet.cell_range import CellRange
+import numpy as np
 
+from config import excel_agenda
+from schedule_types import as_schedule, format_minutes
 
-def create_machine_agenda_excel(schedule, output_excel_file="machine_agenda.xlsx"):
+
+def create_machine_agenda_excel(schedule, output_excel_file="machine_agenda.xlsx", slot_minutes=None):
     """
     Creates an Excel file that represents the daily planner with machine schedules in a structured format.
+    Each day gets its own sheet with a row per time slot (config.excel_agenda["slot_minutes"] unless
+    given) and a column per machine; each appointment is one merged cell over its slots.
+    The workbook is streamed (openpyxl write-only mode), so rows are not kept in memory.
     """
-    # Initialize a new workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Daily Planner"
-
-    # Define time slots (1-minute intervals across 24 hours)
-    time_slots = [datetime.strptime(f"{h:02}:{m:02}", "%H:%M") for h in range(24) for m in range(60)]
-    time_strs = [t.strftime("%H:%M") for t in time_slots]
-
-    # Get unique machine names in sorted order
-    machines_order = sorted(set(entry["machine"] for entry in schedule))
+    slot_minutes = slot_minutes or excel_agenda["slot_minutes"]
+    slots = -(-1440 // slot_minutes)
+    time_strs = [f"{m // 60:02}:{m % 60:02}" for m in range(0, slots * slot_minutes, slot_minutes)]
 
-    # Write column headers
-    ws["A1"] = "Time"
-    for col_idx, machine in enumerate(machines_order, start=2):
-        ws.cell(row=1, column=col_idx, value=machine)
+    # Stable column per machine across the sheets, and entries in (machine, start) order
+    sched = as_schedule(schedule).sorted()
+    entries = sched.entries
+    used = np.unique(entries["machine"])
+    machines_order = [sched.machines[i] for i in used]
+    columns = np.searchsorted(used, entries["machine"])
 
-    # Fill time slots in first column
-    for row_idx, time_str in enumerate(time_strs, start=2):
-        ws.cell(row=row_idx, column=1, value=time_str)
+    # Slot span of every entry within the day it starts on (rows stop at midnight)
+    days = entries["start"] // 1440
+    first = (entries["start"] - days * 1440) // slot_minutes
+    last = np.minimum(-(-(entries["end"] - days * 1440) // slot_minutes), slots)
+    last = np.maximum(last, first + 1)
 
-    # Populate the machine schedule
-    for entry in schedule:
-        machine = entry["machine"]
-        start_time = datetime.strptime(entry["start_time"], "%Y-%m-%d %H:%M")
-        end_time = datetime.strptime(entry["end_time"], "%Y-%m-%d %H:%M")
+    wb = openpyxl.Workbook(write_only=True)
+    alignment = Alignment(vertical="center", wrap_text=True)
+    order = np.argsort(days, kind="stable")
+    day_values, day_starts = np.unique(days[order], return_index=True)
+    for day, rows in zip(day_values.tolist(), np.split(order, day_starts[1:])):
+        ws = wb.create_sheet(title=format_minutes([day * 1440])[0].split()[0])
+        blocks = []  # [column, first slot, end slot, label] per merged cell
+        last_block = [None] * len(machines_order)
+        for i in rows.tolist():
+            col, start, end = int(columns[i]), int(first[i]), int(last[i])
+            label = f"{sched.patient_id[i]} ({sched.scan_type[i]})"
+            block = last_block[col]
+            if block is not None and start < block[2]:
+                # Rounded out to slots, this entry shares a cell with the previous one on the machine
+                block[2] = max(block[2], end)
+                block[3] = f"{block[3]}; {label}"
+                continue
+            last_block[col] = [col, start, end, label]
+            blocks.append(last_block[col])
 
-        start_idx = time_strs.index(start_time.strftime("%H:%M")) + 2
-        end_idx = time_strs.index(end_time.strftime("%H:%M")) + 2
-        col_idx = machines_order.index(machine) + 2
+        grid = [[None] * len(machines_order) for _ in range(slots)]
+        for col, start, _, label in blocks:
+            cell = WriteOnlyCell(ws, value=label)
+            cell.alignment = alignment
+            grid[start][col] = cell
 
-        cell_value = f"{entry['patient_id']} ({entry['scan_type']})"
+        ws.column_dimensions["A"].width = 10
+        for col in range(2, len(machines_order) + 2):
+            ws.column_dimensions[get_column_letter(col)].width = 20
+        ws.freeze_panes = "B2"
+        for col, start, end, _ in blocks:
+            if end - start > 1:
+                # The ranges never overlap, so skip MultiCellRange.add's containment scan
+                ws.merged_cells.ranges.add(CellRange(min_col=col + 2, min_row=start + 2, max_col=col + 2,
+                                                     max_row=end + 1))
 
-        for row in range(start_idx, end_idx):
-            ws.cell(row=row, column=col_idx, value=cell_value)
+        ws.append(["Time"] + machines_order)
+        for time_str, values in zip(time_strs, grid):
+            ws.append([time_str] + values)
 
-    # Adjust column widths
-    for col in range(1, len(machines_order) + 2):
-        ws.column_dimensions[get_column_letter(col)].width = 20
+    if not wb.worksheets:
+        wb.create_sheet(title="Daily Planner").append(["Time"])
 
     # Save Excel file
     wb.save(output_excel_file)
@@ -0,0 +1,103 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_transcript(text):
+    """
+    Lower-cases the transcript and drops punctuation and repeated whitespace, so dictations that
+    only differ in those map to the same key.
+    """
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+class ExtractionCache:
+    """
+    Caches the extracted "location,desc,index,time,mach" answer per (index, normalized transcript):
+    an LRU of at most max_entries answers that expire ttl_seconds after they were stored.
+    With an embed function (text -> vector) and a similarity_threshold, a transcript whose
+    embedding has at least that cosine similarity with a cached one is a near hit.
+    """
+
+    def __init__(self, max_entries=1000, ttl_seconds=86400, similarity_threshold=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.entries = OrderedDict()  # (index_name, key) -> (stored, answer, unit vector or None)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def _expire(self, now):
+        for cache_key in [k for k, (stored, _, _) in self.entries.items() if now - stored > self.ttl_seconds]:
+            del self.entries[cache_key]
+
+    def get(self, index_name, text, embed=None):
+        """
+        Returns the cached answer for the transcript, or None. embed is only called when there is
+        no exact hit and near hits are enabled; pass the same function to put.
+        """
+        cache_key = (index_name, normalize_transcript(text))
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(cache_key)
+            if entry is not None and now - entry[0] <= self.ttl_seconds:
+                self.entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self.entries[cache_key]
+            if embed is None or self.similarity_threshold is None:
+                self.misses += 1
+                return None
+            self._expire(now)
+            candidates = [(k, e) for k, e in self.entries.items() if k[0] == index_name and e[2] is not None]
+
+        if candidates:
+            vector = self._unit(embed(cache_key[1]))
+            similarity = np.stack([e[2] for _, e in candidates]) @ vector
+            best = int(np.argmax(similarity))
+            if similarity[best] >= self.similarity_threshold:
+                with self.lock:
+                    self.near_hits += 1
+                    if candidates[best][0] in self.entries:
+                        self.entries.move_to_end(candidates[best][0])
+                return candidates[best][1][1]
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, index_name, text, answer, embed=None):
+        cache_key = (index_name, normalize_transcript(text))
+        vector = None
+        if embed is not None and self.similarity_threshold is not None:
+            vector = self._unit(embed(cache_key[1]))
+        with self.lock:
+            self.entries.pop(cache_key, None)
+            self.entries[cache_key] = (time.time(), answer, vector)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.near_hits) / lookups if lookups else 0.0,
+            }
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
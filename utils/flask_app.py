@@ -4,19 +4,31 @@ import csv
 import io
 import subprocess
 import logging
+import json
+import asyncio
+import importlib
+import uuid
 from io import BytesIO
+from typing import Optional
 
 import uvicorn
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Header, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-# Import your processing functions
-from stateful_scheduling import search_with_rag as rag
-from realtime_whisper import audio_processing as ts
-from main import do_optimization as opt
+# Import your processing functions. RAG (langchain), the solver stack (ortools, pandas,
+# matplotlib, openpyxl) and audio (scipy) are imported where they are first used, or by the
+# warmup after startup, so a cold worker can answer before loading them.
+from solver_profile import SolverProfile
+from jobs import get_job_manager, run_optimization_job, run_batch_job
+from session_store import open_session_store
+from config import service
 
-g_ts = None
+WARMUP_MODULES = ["stateful_scheduling", "main", "intake", "transcription", "audio_stream"]
+
+sessions = open_session_store()
 index = 'scheduler-vectorised'
 
 app = FastAPI()
@@ -46,71 +58,155 @@ class ScheduleEntry(BaseModel):
     machine: str
 
 
+def get_transcript(session_id):
+    """
+    Returns the transcript recorded in this session (X-Session-ID header), or raises a 400.
+    """
+    transcript = sessions.get(session_id).get("transcript") if session_id else None
+    if not transcript:
+        raise HTTPException(status_code=400, detail="No recorded transcript found")
+    return transcript
+
+
 @app.get("/")
 
 
 
 @app.post("/record")
-async def record_and_transcribe(file: UploadFile = File(...)):
+async def record_and_transcribe(file: UploadFile = File(...), x_session_id: Optional[str] = Header(None)):
+    """
+    Transcribes the uploaded recording without blocking the event loop (see
+    transcription.TranscriptionService) and stores the text under the caller's session.
+    """
     print("Received file:", file.filename)
     audio_data = await file.read()
     if not audio_data:
         raise HTTPException(status_code=400, detail="No audio data received")
 
+    from transcription import get_transcription_service
+
     try:
-        #using buffer here to avoid having to save to database
-        dat = BytesIO(audio_data)
-        dat.seek(0)
-        #generating transcript using method in realtime_whisper.py
-        transcript = ts(dat, file.filename)
-        # If transcript is a dict or object, extract the text (adjust based on your ts output)
-        transcript_text = transcript.get("text") if isinstance(transcript, dict) else transcript.text
-        global g_ts
-        g_ts = transcript_text  # store transcription text globally for later endpoints
-        return {"transcription": transcript_text}
+        transcript_text = await get_transcription_service().transcribe(audio_data, file.filename or "audio.webm")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Transcription timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcription failed: {e}")
 
+    # store the transcription under the caller's session for later endpoints
+    session_id = x_session_id or uuid.uuid4().hex
+    sessions.update(session_id, transcript=transcript_text)
+    return {"transcription": transcript_text, "session_id": session_id}
+
+
+@app.websocket("/record/stream")
+async def record_stream(websocket: WebSocket, filename: str = "audio.webm", format: Optional[str] = None,
+                        sample_rate: int = 16000, session_id: Optional[str] = None):
+    """
+    Streaming variant of /record. The client sends the recording as binary messages while it
+    records, then the text message "end". With format=pcm16 (raw 16-bit mono PCM at sample_rate)
+    the audio is split at pauses and {"type": "partial", "segment", "text"} is sent as each segment
+    is transcribed; other formats are transcribed once the upload ends. The last message is
+    {"type": "final", "transcription", "session_id"} (or {"type": "error", "detail"}).
+    """
+    from audio_stream import StreamingTranscription
+    from transcription import get_transcription_service
+
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+
+    async def send_partial(segment, text):
+        async with send_lock:
+            await websocket.send_json({"type": "partial", "segment": segment, "text": text})
+
+    stream = StreamingTranscription(get_transcription_service(), filename, format, sample_rate, send_partial)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                await stream.add(message["bytes"])
+            elif message.get("text") == "end":
+                break
+        transcript_text = await stream.finish()
+    except WebSocketDisconnect:
+        return
+    except asyncio.TimeoutError:
+        await websocket.send_json({"type": "error", "detail": "Transcription timed out"})
+        await websocket.close()
+        return
+    except Exception as e:
+        await websocket.send_json({"type": "error", "detail": f"Transcription failed: {e}"})
+        await websocket.close()
+        return
+    finally:
+        stream.close()
+
+    session_id = session_id or uuid.uuid4().hex
+    sessions.update(session_id, transcript=transcript_text)
+    async with send_lock:
+        await websocket.send_json({"type": "final", "transcription": transcript_text, "session_id": session_id})
+    await websocket.close()
+
+
+@app.on_event("startup")
+async def start_warmup():
+    if service["warmup"]:
+        asyncio.get_running_loop().run_in_executor(None, warmup)
+
+
+def warmup():
+    """
+    Imports the heavy subsystems in a worker thread so the first request does not pay for them.
+    """
+    for name in WARMUP_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logging.warning(f"Warmup could not import {name}: {e}")
+
+
+@app.on_event("shutdown")
+async def close_transcription_service():
+    transcription = sys.modules.get("transcription")
+    if transcription is not None and transcription.get_transcription_service.cache_info().currsize:
+        await transcription.get_transcription_service().aclose()
+
 @app.post("/process")
-def process_transcription():
+def process_transcription(x_session_id: Optional[str] = Header(None)):
     """
     placeholder for purely testing the RAG system. kept for debugging but not available to the user directly. 
     """
-    global g_ts
-    if not g_ts:
-        raise HTTPException(status_code=400, detail="No recorded transcript found")
-    result = rag(index, g_ts)
+    from stateful_scheduling import search_with_rag as rag
+
+    result = rag(index, get_transcript(x_session_id))
     return {"result": result}
 
-@app.post("/optimize")
-def optimize_workflow():
+@app.get("/process/cache")
+def extraction_cache_stats():
     """
-    Optimize the workflow based on the recorded transcription.
-    Uses the stored transcript rather than a hardcoded fake.
+    Hit/miss counts of the transcript extraction cache in this API process
+    (background jobs keep their own cache per worker).
     """
-    global g_ts
-    if not g_ts:
-        raise HTTPException(status_code=400, detail="No recorded transcript found")
+    from stateful_scheduling import extraction_cache
 
-    transcription = g_ts
-    logging.info(f"Received transcription for optimization: {transcription}")
-    
-    # Process the transcription using RAG (returns CSV string)
-    processed_csv = rag(index, transcription)
-    if not processed_csv:
-        raise HTTPException(status_code=400, detail="Processing failed")
+    return extraction_cache.stats()
 
-    logging.info(f"Processed CSV Output:\n{processed_csv}")
+def format_patient_id(patient_id):
+    """
+    Patient ids are whole numbers; anything else (maintenance entries, ids saved before intake
+    checked them) is returned as text so one bad row cannot fail every later response.
+    """
+    try:
+        return int(patient_id)
+    except (TypeError, ValueError):
+        return str(patient_id)
 
-    # Convert CSV string to list of dictionaries.
- # try:
- #     csv_reader = csv.DictReader(io.StringIO(processed_csv))
- #     processed_output = list(csv_reader)
- # except Exception as e:
- #     raise HTTPException(status_code=500, detail=f"Error converting CSV: {e}")
 
- # # Optimize the workflow using the opt() function
-    optimized_csv = opt(processed_csv)
+def format_schedule(optimized_csv):
+    """
+    Converts the optimizer output (CSV string or list of entries) to the /optimize response format.
+    """
     if isinstance(optimized_csv, str):
         try:
             csv_reader = csv.DictReader(io.StringIO(optimized_csv))
@@ -128,7 +224,7 @@ def optimize_workflow():
                 "scan_type": entry["scan_type"],
                 "duration": int(entry["duration"]),
                 "priority": int(entry["priority"]),
-                "patient_id": int(entry["patient_id"]),
+                "patient_id": format_patient_id(entry["patient_id"]),
                 "start_time": entry.get("start_time", ""),
                 "machine": entry.get("machine", entry["scan_type"]),
             }
@@ -137,8 +233,183 @@ def optimize_workflow():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error formatting schedule: {e}")
 
+    return formatted_schedule
+
+
+@app.post("/optimize")
+def optimize_workflow(time_limit: Optional[float] = None, num_workers: Optional[int] = None,
+                      relative_gap: Optional[float] = None, random_seed: Optional[int] = None,
+                      log_search: bool = False, x_session_id: Optional[str] = Header(None)):
+    """
+    Optimize the workflow based on the recorded transcription.
+    Uses the stored transcript rather than a hardcoded fake.
+    The query parameters override the "optimize" solver profile in config.py (log_search sends
+    the CP-SAT search log to the "cp_sat" logger); the response reports the solver status,
+    objective, bound and gap of the returned schedule.
+    """
+    from stateful_scheduling import search_with_rag as rag
+    from main import do_optimization as opt
+
+    transcription = get_transcript(x_session_id)
+    logging.info(f"Received transcription for optimization: {transcription}")
+    
+    # Process the transcription using RAG (returns CSV string)
+    processed_csv = rag(index, transcription)
+    if not processed_csv:
+        raise HTTPException(status_code=400, detail="Processing failed")
+
+    logging.info(f"Processed CSV Output:\n{processed_csv}")
+    sessions.update(x_session_id, scan_request=processed_csv)
+
+    # Convert CSV string to list of dictionaries.
+ # try:
+ #     csv_reader = csv.DictReader(io.StringIO(processed_csv))
+ #     processed_output = list(csv_reader)
+ # except Exception as e:
+ #     raise HTTPException(status_code=500, detail=f"Error converting CSV: {e}")
+
+ # # Optimize the workflow using the opt() function
+    profile = SolverProfile.from_config(
+        "optimize", time_limit=time_limit, num_workers=num_workers, relative_gap=relative_gap,
+        random_seed=random_seed, log_callback=logging.getLogger("cp_sat").info if log_search else None,
+    )
+    solve_info = {}
+    optimized_csv = opt(processed_csv, profile=profile, solve_info=solve_info)
+    if optimized_csv is None:
+        raise HTTPException(status_code=422, detail=f"No schedule found (solver status {solve_info.get('status')})")
+    formatted_schedule = format_schedule(optimized_csv)
+
     logging.info(f"Optimized schedule: {formatted_schedule}")
-    return {"schedule": formatted_schedule}
+    return {"schedule": formatted_schedule, "solver": solve_info}
+
+@app.post("/optimize/jobs")
+def submit_optimization_job(time_limit: Optional[float] = None, num_workers: Optional[int] = None,
+                            relative_gap: Optional[float] = None, random_seed: Optional[int] = None,
+                            x_session_id: Optional[str] = Header(None)):
+    """
+    Queues the /optimize pipeline for the recorded transcription in the background job pool
+    and returns its job id straight away. Follow it with GET /optimize/jobs/{job_id} (polling)
+    or GET /optimize/jobs/{job_id}/events (server-sent events).
+    """
+    transcription = get_transcript(x_session_id)
+    profile_settings = {"time_limit": time_limit, "num_workers": num_workers,
+                        "relative_gap": relative_gap, "random_seed": random_seed}
+    job_id = get_job_manager().submit(run_optimization_job, transcription, index, profile_settings)
+    return {"job_id": job_id}
+
+
+async def read_batch_request(request):
+    """
+    Reads and validates the scan requests in the body of a batch request (see /optimize/batch).
+    Returns the valid scans as CSV and the intake report; raises a 400 if the body cannot be
+    read and a 422 if no row is valid.
+    """
+    from intake import read_scan_batch, validate_scan_batch
+
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        upload = (await request.form()).get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail='Expected the batch as a "file" upload')
+        payload, fmt = await upload.read(), "json" if upload.filename.endswith(".json") else "csv"
+    else:
+        payload, fmt = await request.body(), "json" if "json" in content_type else "csv"
+
+    try:
+        scans_csv, report = validate_scan_batch(read_scan_batch(payload, fmt))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not report["accepted"]:
+        raise HTTPException(status_code=422, detail={"error": "No valid scan requests", "intake": report})
+    return scans_csv, report
+
+
+@app.post("/optimize/batch")
+async def optimize_batch(request: Request, time_limit: Optional[float] = None, num_workers: Optional[int] = None,
+                         relative_gap: Optional[float] = None, random_seed: Optional[int] = None,
+                         background: bool = False):
+    """
+    Schedules many scan requests in one optimization. The body is a scan request CSV (text/csv,
+    or a multipart "file" upload) or JSON (a list of scans or {"scans": [...]}) with the columns
+    scan_id, scan_type, duration, priority, patient_id, check_in_date and check_in_time.
+    Invalid rows are rejected and reported under "intake" while the rest are scheduled.
+    With background=true the batch is queued in the job pool like /optimize/jobs.
+    """
+    from main import do_optimization as opt
+
+    scans_csv, report = await read_batch_request(request)
+    profile_settings = {"time_limit": time_limit, "num_workers": num_workers,
+                        "relative_gap": relative_gap, "random_seed": random_seed}
+    if background:
+        job_id = get_job_manager().submit(run_batch_job, scans_csv, profile_settings)
+        return {"job_id": job_id, "intake": report}
+
+    profile = SolverProfile.from_config("optimize", **profile_settings)
+    solve_info = {}
+    optimized_csv = await run_in_threadpool(opt, scans_csv, profile=profile, solve_info=solve_info)
+    if optimized_csv is None:
+        raise HTTPException(status_code=422, detail={"error": f"No schedule found (solver status {solve_info.get('status')})",
+                                                     "intake": report})
+    return {"schedule": format_schedule(optimized_csv), "solver": solve_info, "intake": report}
+
+
+@app.post("/backlog/scans")
+async def add_backlog_scans(request: Request):
+    """
+    Adds scan requests (a body as for /optimize/batch) to this worker's pending backlog
+    (scheduling_session.SchedulingSession) and re-solves it incrementally: only the backlog
+    scans the new ones can reach are moved, the rest keep their slots. Returns the whole
+    backlog schedule, the solver statistics and the intake report.
+    """
+    from scheduling_session import get_scheduling_session
+
+    scans_csv, report = await read_batch_request(request)
+    session = get_scheduling_session()
+    schedule = await run_in_threadpool(session.add_scans, scans_csv)
+    if schedule is None:
+        raise HTTPException(status_code=422, detail={"error": f"No schedule found (solver status {session.solve_info.get('status')})",
+                                                     "intake": report})
+    return {"schedule": format_schedule(schedule), "solver": session.solve_info, "intake": report}
+
+
+def get_job_or_404(job_id, since=0):
+    job = get_job_manager().get(job_id, since)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job
+
+
+@app.get("/optimize/jobs/{job_id}")
+def get_optimization_job(job_id: str, since: int = 0):
+    """
+    Returns the job status, its events from index since on and, once done, the formatted schedule.
+    """
+    job = get_job_or_404(job_id, since)
+    if job["result"] is not None:
+        job["result"] = {"schedule": format_schedule(job["result"]["schedule"]), "solver": job["result"]["solver"]}
+    return json.loads(json.dumps(job, default=str))
+
+
+@app.get("/optimize/jobs/{job_id}/events")
+async def stream_optimization_job(job_id: str):
+    """
+    Streams the job's events (stages, intermediate solutions, done/failed) as server-sent events.
+    """
+    get_job_or_404(job_id)
+
+    async def event_stream():
+        sent = 0
+        while True:
+            job = get_job_or_404(job_id, sent)
+            for event in job["events"]:
+                yield f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+            sent = job["event_count"]
+            if job["status"] in ("done", "failed"):
+                break
+            await asyncio.sleep(0.25)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 10000))  # Default to 10000 if PORT is not set
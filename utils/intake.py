@@ -0,0 +1,84 @@
+import io
+import json
+
+import pandas as pd
+
+from config import intake, machines
+
+SCAN_REQUEST_COLUMNS = ["scan_id", "scan_type", "duration", "priority", "patient_id", "check_in_date", "check_in_time"]
+
+
+def read_scan_batch(payload, fmt="csv"):
+    """
+    Reads a batch of scan requests: CSV text with the SCAN_REQUEST_COLUMNS header, or JSON
+    (a list of scan objects or {"scans": [...]}). Returns a DataFrame of strings.
+    Raises ValueError if the payload cannot be read, lacks a column or is too large.
+    """
+    if isinstance(payload, bytes):
+        payload = payload.decode("utf-8-sig")
+    try:
+        if fmt == "json":
+            records = json.loads(payload)
+            if isinstance(records, dict):
+                records = records.get("scans")
+            if not isinstance(records, list):
+                raise ValueError('expected a list of scans or {"scans": [...]}')
+            batch = pd.DataFrame.from_records(records)
+        else:
+            batch = pd.read_csv(io.StringIO(payload), dtype=str, skipinitialspace=True)
+    except (json.JSONDecodeError, pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise ValueError(f"Cannot read the batch: {e}")
+
+    missing = [column for column in SCAN_REQUEST_COLUMNS if column not in batch.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    if len(batch) > intake["max_scans"]:
+        raise ValueError(f"Batch of {len(batch)} scans is larger than the limit of {intake['max_scans']}")
+    return batch[SCAN_REQUEST_COLUMNS].fillna("").astype(str).apply(lambda column: column.str.strip())
+
+
+def validate_scan_batch(batch):
+    """
+    Checks every row of a batch at once and drops duplicate scan ids (the last row wins).
+    Returns the valid scans as a scan request CSV string (check-ins normalized to
+    "%Y-%m-%d" / "%H:%M") and a report {"received", "accepted", "duplicates", "rejected"}, where
+    rejected lists {"row", "scan_id", "errors"} for each invalid row (row numbers start at 1).
+    """
+    patient_id = pd.to_numeric(batch["patient_id"], errors="coerce")
+    duration = pd.to_numeric(batch["duration"], errors="coerce")
+    priority = pd.to_numeric(batch["priority"], errors="coerce")
+    check_in = pd.to_datetime(batch["check_in_date"] + " " + batch["check_in_time"], format="%Y-%m-%d %H:%M",
+                              errors="coerce")
+    checks = {
+        "missing scan_id": batch["scan_id"] == "",
+        "patient_id must be a whole number": ~((patient_id % 1 == 0) & (patient_id >= 0)),
+        f"scan_type must be one of {', '.join(machines)}": ~batch["scan_type"].isin(list(machines)),
+        f"duration must be a whole number of minutes from 1 to {intake['max_duration']}":
+            ~((duration % 1 == 0) & duration.between(1, intake["max_duration"])),
+        "priority must be a whole number from 0 to 5": ~((priority % 1 == 0) & priority.between(0, 5)),
+        "check_in_date/check_in_time must be YYYY-MM-DD and HH:MM": check_in.isna(),
+    }
+    invalid = pd.concat(checks, axis=1)
+    bad_rows = invalid.any(axis=1)
+
+    rejected = [{
+        "row": int(row) + 1,
+        "scan_id": batch.at[row, "scan_id"],
+        "errors": [error for error, failed in flags.items() if failed],
+    } for row, flags in invalid[bad_rows].to_dict("index").items()]
+
+    scans = batch[~bad_rows].assign(
+        patient_id=patient_id[~bad_rows].astype(int),
+        duration=duration[~bad_rows].astype(int),
+        priority=priority[~bad_rows].astype(int),
+        check_in_date=check_in[~bad_rows].dt.strftime("%Y-%m-%d"),
+        check_in_time=check_in[~bad_rows].dt.strftime("%H:%M"),
+    )
+    deduplicated = scans.drop_duplicates("scan_id", keep="last")
+    report = {
+        "received": len(batch),
+        "accepted": len(deduplicated),
+        "duplicates": len(scans) - len(deduplicated),
+        "rejected": rejected,
+    }
+    return deduplicated.to_csv(index=False), report
@@ -0,0 +1,167 @@
+import functools
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from config import optimize_jobs
+from solver_profile import SolverProfile
+
+MAX_FINISHED_JOBS = 1000
+
+_events = None  # event queue inside a worker process
+
+
+def _init_worker(events):
+    global _events
+    _events = events
+
+
+def _emit(job_id, event, **data):
+    data["event"] = event
+    _events.put((job_id, data))
+
+
+class _SolutionEvents:
+    """
+    Sends a job's improving solutions as events, dropping those that arrive less than
+    config.optimize_jobs["solution_interval"] seconds after the last one sent.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.last_sent = None
+
+    def __call__(self, solution):
+        now = time.monotonic()
+        if self.last_sent is not None and now - self.last_sent < optimize_jobs["solution_interval"]:
+            return
+        self.last_sent = now
+        _emit(self.job_id, "solution", **solution)
+
+
+def _solve_and_emit(job_id, scans_csv, profile_settings):
+    from main import do_optimization
+
+    _emit(job_id, "stage", stage="solving", scans=scans_csv)
+    profile = SolverProfile.from_config("optimize", **profile_settings)
+    profile.progress_callback = _SolutionEvents(job_id)
+    solve_info = {}
+    schedule = do_optimization(scans_csv, profile=profile, solve_info=solve_info)
+    if schedule is None:
+        _emit(job_id, "failed", error=f"No schedule found (solver status {solve_info.get('status')})")
+    else:
+        _emit(job_id, "done", schedule=schedule, solver=solve_info)
+
+
+def run_optimization_job(job_id, transcription, index_name, profile_settings):
+    """
+    The /optimize pipeline (RAG extraction, solve, plotting and Excel export) run in a worker
+    process. Stages, the improving solutions (objective and bound) and the final result are sent as events.
+    """
+    from stateful_scheduling import search_with_rag
+
+    try:
+        _emit(job_id, "stage", stage="extracting")
+        processed_csv = search_with_rag(index_name, transcription)
+        _solve_and_emit(job_id, processed_csv, profile_settings)
+    except Exception as e:
+        _emit(job_id, "failed", error=str(e))
+
+
+def run_batch_job(job_id, scans_csv, profile_settings):
+    """
+    One optimization over a validated batch of scan requests (POST /optimize/batch?background=true).
+    """
+    try:
+        _solve_and_emit(job_id, scans_csv, profile_settings)
+    except Exception as e:
+        _emit(job_id, "failed", error=str(e))
+
+
+class JobManager:
+    """
+    Runs optimization jobs in a process pool and collects their events.
+    A worker sends (job_id, event) pairs through one queue, drained by a thread here, so the
+    events of a job arrive in order and its "done"/"failed" event is always the last one.
+    """
+
+    def __init__(self, max_workers=None):
+        context = multiprocessing.get_context("spawn")
+        self.events = context.Queue()
+        self.pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                        initializer=_init_worker, initargs=(self.events,))
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        threading.Thread(target=self._drain, daemon=True).start()
+
+    def submit(self, fn, *args):
+        """
+        Queues fn(job_id, *args) and returns the new job id immediately.
+        """
+        job_id = uuid.uuid4().hex
+        with self.lock:
+            self.jobs[job_id] = {"id": job_id, "status": "queued", "events": [], "result": None, "error": None}
+            while len(self.jobs) > MAX_FINISHED_JOBS:
+                oldest = next(iter(self.jobs))
+                if self.jobs[oldest]["status"] not in ("done", "failed"):
+                    break
+                self.jobs.popitem(last=False)
+        future = self.pool.submit(fn, job_id, *args)
+        future.add_done_callback(functools.partial(self._check_crash, job_id))
+        return job_id
+
+    def get(self, job_id, since=0):
+        """
+        Returns a snapshot of the job with its events from index since on, or None if unknown.
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job)
+            snapshot["events"] = job["events"][since:]
+            snapshot["event_count"] = len(job["events"])
+            return snapshot
+
+    def _record(self, job_id, event):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job["events"].append(event)
+            if event["event"] == "done":
+                job["status"] = "done"
+                job["result"] = {"schedule": event["schedule"], "solver": event["solver"]}
+            elif event["event"] == "failed":
+                job["status"] = "failed"
+                job["error"] = event["error"]
+            else:
+                job["status"] = "running"
+
+    def _drain(self):
+        while True:
+            job_id, event = self.events.get()
+            self._record(job_id, event)
+
+    def _check_crash(self, job_id, future):
+        # Errors inside the job are sent as events; this only catches a dead worker process.
+        if future.exception() is not None:
+            self._record(job_id, {"event": "failed", "error": str(future.exception())})
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """
+    Returns the process-wide JobManager, starting its pool on first use.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
@@ -0,0 +1,80 @@
+import json
+import os
+import re
+from functools import lru_cache
+
+from config import local_extraction
+from extraction_cache import normalize_transcript
+
+
+class LocalExtractor:
+    """
+    Keyword classifier producing the "location,desc,index,time,mach" answer of the RAG chain for
+    transcripts that clearly name an indication, or a modality and a priority. The rules
+    (extraction_rules.json) hold the indications with their keywords, default priority and
+    modality, the words naming each modality and priority, and the wait in hours per priority.
+    """
+
+    def __init__(self, rules):
+        self.hours = {int(p): hours for p, hours in rules["hours"].items()}
+        self.modalities = {m: self._pattern(words) for m, words in rules["modalities"].items()}
+        self.priorities = {int(p): self._pattern(words) for p, words in rules["priorities"].items()}
+        self.indications = [(indication, self._pattern(indication["keywords"])) for indication in rules["indications"]]
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _pattern(words):
+        # Whole words or phrases of the normalized transcript, longest first
+        phrases = sorted({normalize_transcript(w) for w in words}, key=len, reverse=True)
+        return re.compile(r"\b(?:" + "|".join(re.escape(p) for p in phrases) + r")\b")
+
+    def extract(self, text):
+        """
+        Returns (answer, confidence). answer is None when nothing matched. confidence is
+        1.0  for one best indication, with at most one modality and one priority named
+        0.9  for a modality and a priority named without a known indication
+        0.5  when indications tie or several modalities or priorities are named
+        """
+        text = normalize_transcript(text)
+        modalities = [m for m, pattern in self.modalities.items() if pattern.search(text)]
+        priorities = [p for p, pattern in self.priorities.items() if pattern.search(text)]
+        scores = [len(set(pattern.findall(text))) for _, pattern in self.indications]
+        best = max(scores, default=0)
+        matched = [indication for (indication, _), score in zip(self.indications, scores) if best and score == best]
+
+        if matched:
+            indication = matched[0]
+            location, description = indication["location"], indication["description"]
+            modality = modalities[0] if modalities else indication["modality"]
+            priority = priorities[0] if priorities else indication["priority"]
+            confidence = 1.0
+        elif modalities and priorities:
+            location, description = "Unspecified", "Unspecified"
+            modality, priority = modalities[0], priorities[0]
+            confidence = 0.9
+        else:
+            return None, 0.0
+        if len(matched) > 1 or len(modalities) > 1 or len(priorities) > 1:
+            confidence = 0.5
+        return f"{location},{description},P{priority},{self.hours[priority]},{modality}", confidence
+
+    def documents(self):
+        """
+        The indications as short guideline sentences (used as the corpus of the local RAG backend).
+        """
+        return [f"{i['description']} ({i['location'].lower()}; {', '.join(i['keywords'])}) is a "
+                f"P{i['priority']} condition; image within {self.hours[i['priority']]} hours on {i['modality']}."
+                for i, _ in self.indications]
+
+
+@lru_cache(maxsize=None)
+def get_local_extractor():
+    """
+    The extractor for config.local_extraction["rules"] (relative to this directory), loaded once.
+    """
+    return LocalExtractor.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                 local_extraction["rules"]))
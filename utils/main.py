@@ -2,22 +2,22 @@
 # BMG 5109: Medical Systems Innovation and Design
 
 from optimizer import optimize_scan_scheduling
-from visualizer import plot_schedule_by_day
+from visualizer import plot_schedule_in_background
 from utils import print_schedule, check_for_overlaps
 from excel_export import create_machine_agenda_excel
+from schedule_types import Schedule
 
-def do_optimization(scan_input):
+def do_optimization(scan_input, engine=None, profile=None, solve_info=None, schedule_path=None):
    # scans_csv_file = 'scans.csv'
-    schedule_csv_file = 'current_schedule_multiple_machines.csv'
-    print("old input")
-    print(scan_input)
-    new_schedule = optimize_scan_scheduling(scan_input, schedule_csv_file)
+    # schedule_path defaults to config.schedule_store["path"] ($SCHEDULE_STORE)
+    new_schedule = optimize_scan_scheduling(scan_input, schedule_path, engine, profile, solve_info)
     
     if new_schedule:
         print_schedule(new_schedule)
-        plot_schedule_by_day(new_schedule)
-        create_machine_agenda_excel(new_schedule)
-        check_for_overlaps(new_schedule)
+        schedule = Schedule.from_records(new_schedule)
+        plot_schedule_in_background(schedule)
+        create_machine_agenda_excel(schedule)
+        check_for_overlaps(schedule)
         return new_schedule
 
     else:
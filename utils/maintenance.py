@@ -1,87 +1,165 @@
-from datetime import datetime, timedelta
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import timedelta
 
-def bump_priority_zero(schedule):
+import numpy as np
+
+from config import machines, maintenance
+from schedule_types import EPOCH, ENTRY_DTYPE, Schedule, as_schedule
+from utils import time_to_minutes
+
+
+def bump_priority_zero(schedule, reassign=False, report=None):
     """
     For each machine, if a Priority 0 scan is scheduled, bump any subsequent appointment
     that starts before its end. This ensures Priority 0 scans can take effect immediately
     if possible, without interrupting an ongoing scan.
+    A bumped scan also skips the maintenance blocks of its machine (which never move) and the
+    other scans of its patient. With reassign=True it first tries to move to another machine of
+    its modality that is idle at its current time. report, if given, receives the number of
+    bumped and reassigned scans and the total and largest delay in minutes.
+    Works on a Schedule; a list of entry dicts is accepted and returned as such.
     """
-    # Group by machine
-    machine_sched = {}
-    for appt in schedule:
-        m = appt["machine"]
-        machine_sched.setdefault(m, []).append(appt)
+    records = not isinstance(schedule, Schedule)
+    sched = as_schedule(schedule)
+    if reassign:
+        sched = sched.with_machines([m for machine_list in machines.values() for m in machine_list])
+    sched = sched.sorted()
+    machine_index = {m: i for i, m in enumerate(sched.machines)}
+    starts = sched.entries["start"].tolist()
+    ends = sched.entries["end"].tolist()
+    machine = sched.entries["machine"].tolist()
+    priorities = sched.entries["priority"].tolist()
+    durations = sched.entries["duration"].tolist()
+    original_starts = list(starts)
+
+    # Maintenance blocks per machine (sorted by start) and the scans of each patient
+    is_maintenance = sched.is_maintenance().tolist()
+    blocks = defaultdict(list)
+    by_patient = defaultdict(list)
+    for i in range(len(sched)):
+        if is_maintenance[i]:
+            blocks[machine[i]].append((starts[i], ends[i]))
+        else:
+            by_patient[sched.patient_id[i]].append(i)
+    block_starts = {m: [b[0] for b in machine_blocks] for m, machine_blocks in blocks.items()}
 
-    for m, appts in machine_sched.items():
-        # Sort chronologically
-        appts.sort(key=lambda a: datetime.strptime(a["start_time"], "%Y-%m-%d %H:%M"))
-        i = 0
-        while i < len(appts):
-            appt = appts[i]
-            if int(appt["priority"]) == 0:
-                p0_end = datetime.strptime(appt["end_time"], "%Y-%m-%d %H:%M")
-                j = i + 1
-                while j < len(appts):
-                    next_appt = appts[j]
-                    next_start = datetime.strptime(next_appt["start_time"], "%Y-%m-%d %H:%M")
-                    next_duration = timedelta(minutes=int(next_appt["duration"]))
-                    if next_start < p0_end:
-                        # Bump the next appointment to start after Priority 0 ends
-                        new_start = p0_end
-                        new_end = new_start + next_duration
-                        next_appt["start_time"] = new_start.strftime("%Y-%m-%d %H:%M")
-                        next_appt["end_time"] = new_end.strftime("%Y-%m-%d %H:%M")
-                        p0_end = new_end
-                        j += 1
-                    else:
+    def conflicts(i, m, start):
+        # The earliest end of a maintenance block on m or another scan of the patient overlapping i at start
+        end = start + durations[i]
+        blocking = []
+        if m in blocks:
+            k = max(bisect_right(block_starts[m], start) - 1, 0)
+            while k < len(blocks[m]) and blocks[m][k][0] < end:
+                if blocks[m][k][1] > start:
+                    blocking.append(blocks[m][k][1])
+                k += 1
+        for j in by_patient[sched.patient_id[i]]:
+            if j != i and starts[j] < end and ends[j] > start:
+                blocking.append(ends[j])
+        return max(blocking) if blocking else None
+
+    def alternatives(i):
+        machine_list = machines.get(sched.scan_type[i], [])
+        if len(machine_list) > 1 and priorities[i] != 1:
+            machine_list = machine_list[:-1]  # the standby machine only takes Priority 1 scans
+        return [machine_index[m] for m in machine_list if machine_index[m] != machine[i]]
+
+    # Sweep all scans by start time. Per machine: end of the current bump chain (barrier), end of
+    # the scans placed so far and the next scan not reached yet (to tell whether it is idle).
+    barrier = defaultdict(lambda: float("-inf"))
+    busy_until = defaultdict(lambda: float("-inf"))
+    runs = {m: [run.start, run.stop] for m, run in sched.machine_runs()}
+    bumped, reassigned = 0, 0
+    for i in sorted(range(len(sched)), key=starts.__getitem__):
+        m = machine[i]
+        runs[m][0] += 1
+        if is_maintenance[i]:
+            continue
+        if starts[i] < barrier[m]:
+            target = None
+            if reassign:
+                for m2 in alternatives(i):
+                    run = runs.get(m2, [0, 0])
+                    next_start = starts[run[0]] if run[0] < run[1] else float("inf")
+                    if (busy_until[m2] <= starts[i] and next_start >= starts[i] + durations[i]
+                            and conflicts(i, m2, starts[i]) is None):
+                        target = m2
                         break
-                i = j
+            if target is not None:
+                machine[i] = m = target
+                reassigned += 1
             else:
-                i += 1
-        machine_sched[m] = appts
+                # Push it to the end of the chain, then past maintenance and its patient's other scans
+                start = barrier[m]
+                blocked_until = conflicts(i, m, start)
+                while blocked_until is not None:
+                    start = blocked_until
+                    blocked_until = conflicts(i, m, start)
+                starts[i], ends[i] = start, start + durations[i]
+                barrier[m] = ends[i]
+                bumped += 1
+        elif priorities[i] == 0:
+            barrier[m] = ends[i]
+        busy_until[m] = max(busy_until[m], ends[i])
 
-    # Recombine
-    merged = []
-    for m in machine_sched:
-        merged.extend(machine_sched[m])
-    merged.sort(key=lambda x: (x["machine"], datetime.strptime(x["start_time"], "%Y-%m-%d %H:%M")))
-    return merged
+    sched.entries["start"] = starts
+    sched.entries["end"] = ends
+    sched.entries["machine"] = machine
+    if report is not None:
+        delays = [starts[i] - original_starts[i] for i in range(len(sched))]
+        report.update({
+            "bumped": bumped,
+            "reassigned": reassigned,
+            "total_delay": sum(delays),
+            "max_delay": max(delays, default=0),
+        })
+    sched = sched.sorted()
+    return sched.to_records() if records else sched
 
 
-def insert_maintenance_blocks(schedule):
+def maintenance_windows(machine, lo, hi, reference):
     """
-    Inserts a 60-minute maintenance block after every 20 non-maintenance scans per machine.
-    Returns a new schedule with maintenance entries added.
+    Returns the [start, end) minute offsets from reference of the fixed maintenance windows of
+    machine (config.maintenance) that overlap [lo, hi), in order.
     """
-    machine_schedules = {}
-    for entry in schedule:
-        m = entry["machine"]
-        machine_schedules.setdefault(m, []).append(entry)
+    offset = reference.hour * 60 + reference.minute
+    times = sorted(time_to_minutes(t) for t in maintenance["machines"].get(machine, maintenance["daily"]))
+    duration = maintenance["duration"]
+    windows = []
+    for day in range((lo + offset) // 1440 - 1, (hi + offset) // 1440 + 1):
+        for minute in times:
+            start = day * 1440 + minute - offset
+            if start < hi and start + duration > lo:
+                windows.append((start, start + duration))
+    return windows
 
-    for m in machine_schedules:
-        machine_schedules[m].sort(key=lambda x: datetime.strptime(x["start_time"], "%Y-%m-%d %H:%M"))
 
-    final_schedule = []
-    for m, entries in machine_schedules.items():
-        count = 0
-        for entry in entries:
-            if entry["scan_type"] != "maintenance":
-                count += 1
-            final_schedule.append(entry)
-            if count > 0 and count % 20 == 0:
-                maint_start = datetime.strptime(entry["end_time"], "%Y-%m-%d %H:%M")
-                maint_end = maint_start + timedelta(minutes=60)
-                maint_entry = {
-                    "scan_id": f"maintenance_{m}_{count}",
-                    "patient_id": "Maintenance",
-                    "scan_type": "maintenance",
-                    "machine": m,
-                    "start_time": maint_start.strftime("%Y-%m-%d %H:%M"),
-                    "end_time": maint_end.strftime("%Y-%m-%d %H:%M"),
-                    "priority": 0,
-                    "duration": 60
-                }
-                final_schedule.append(maint_entry)
+def maintenance_schedule(start, end, booked=None):
+    """
+    Returns the maintenance entries of every machine between start and end (minutes since the
+    epoch) as a Schedule, ids made from machine and start so they stay stable between saves.
+    As in the model, a window overlapping an entry of booked on its machine is left out.
+    """
+    names = sorted(m for machine_list in machines.values() for m in machine_list)
+    windows = []
+    for i, m in enumerate(names):
+        machine_windows = maintenance_windows(m, start, end, EPOCH)
+        busy = booked.entries[booked.entries["machine"] == booked.machines.index(m)] \
+            if booked is not None and m in booked.machines else []
+        if len(busy) and machine_windows:
+            busy = busy[np.argsort(busy["start"], kind="stable")]
+            reach = np.maximum.accumulate(busy["end"])  # latest end among the entries starting so far
+            before = np.searchsorted(busy["start"], [w_end for _, w_end in machine_windows])
+            free = (before == 0) | (reach[before - 1] <= [w_start for w_start, _ in machine_windows])
+            machine_windows = [w for w, is_free in zip(machine_windows, free) if is_free]
+        windows += [(i, window) for window in machine_windows]
 
-    final_schedule.sort(key=lambda x: (x["machine"], datetime.strptime(x["start_time"], "%Y-%m-%d %H:%M")))
-    return final_schedule
+    entries = np.zeros(len(windows), dtype=ENTRY_DTYPE)
+    entries["start"] = [w_start for _, (w_start, _) in windows]
+    entries["end"] = [w_end for _, (_, w_end) in windows]
+    entries["machine"] = [i for i, _ in windows]
+    entries["duration"] = maintenance["duration"]
+    scan_ids = [f"maintenance_{names[i]}_{(EPOCH + timedelta(minutes=w_start)).strftime('%Y%m%d%H%M')}"
+                for i, (w_start, _) in windows]
+    return Schedule(entries, names, scan_ids, ["Maintenance"] * len(windows), ["maintenance"] * len(windows))
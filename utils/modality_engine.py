@@ -0,0 +1,123 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from config import machines
+from optimizer import solve_scans
+from solver_profile import combine_solve_info
+from utils import datetime_to_minutes
+
+_pool = None
+
+
+def get_pool(max_workers=None):
+    """
+    Returns the shared process pool, creating it on first use with one worker per modality by
+    default. Workers are spawned, not forked, as in jobs.JobManager: the API process runs threads
+    and CP-SAT keeps its own, which a forked child would inherit in an undefined state.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=max_workers or len(machines),
+                                    mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _solve_subproblem(args):
+    scans, locked, reference_datetime, profile, hints, blocked = args
+    solve_info = {}
+    schedule = solve_scans(scans, locked, reference_datetime, profile, solve_info, hints, blocked)
+    return schedule, solve_info
+
+
+def find_patient_conflicts(schedule, reference_datetime):
+    """
+    Returns (kept, moved) entry pairs where one patient is booked on two machines at once.
+    The more urgent scan (then the earlier one) is kept; the other has to move.
+    """
+    by_patient = {}
+    for entry in schedule:
+        start = datetime_to_minutes(entry["start_time"], reference_datetime)
+        by_patient.setdefault(entry["patient_id"], []).append((start, start + int(entry["duration"]), entry))
+
+    conflicts = []
+    for entries in by_patient.values():
+        entries.sort(key=lambda e: e[0])
+        for (start1, end1, a), (start2, end2, b) in zip(entries, entries[1:]):
+            if start2 < end1:
+                kept, moved = (a, b) if (int(a["priority"]), start1) <= (int(b["priority"]), start2) else (b, a)
+                conflicts.append((kept, moved))
+    return conflicts
+
+
+def solve_by_modality(new_scans_data, locked_schedule, reference_datetime, profile=None, solve_info=None,
+                      max_workers=None, max_repair_rounds=10):
+    """
+    Per-modality engine: a scan can only use machines of its own type, so the scans are split
+    into one model per modality and the models are solved concurrently in the process pool.
+
+    The only coupling between modalities is the patient: one patient cannot be in two machines
+    at the same time. After solving, every patient double-booking across modalities is repaired
+    by blocking the less urgent scan from the kept scan's time slot and re-solving only the
+    affected modalities (warm-started from their previous solution), until no conflicts remain.
+    Each model also gets the locked entries of its patients on other machines, so they are
+    kept off those too. If a modality has no solution or conflicts remain after
+    max_repair_rounds, the whole backlog falls back to the full model (optimizer.solve_scans).
+    The profile's callbacks stay in this process; subproblems are solved without them.
+    solve_info's wall_time is the time spent in the pool, not the sum over the subproblems.
+    """
+    started = time.perf_counter()
+    full_profile = profile
+    if profile is not None:
+        profile = profile.replace(log_callback=None, progress_callback=None)
+    subproblems = {}
+    for s in new_scans_data:
+        subproblems.setdefault(s["scan_type"], []).append(s)
+    locked_by_type = {}
+    for scan_type, scans in subproblems.items():
+        patients = set(str(s["patient_id"]) for s in scans)
+        locked_by_type[scan_type] = [
+            ls for ls in locked_schedule
+            if ls["machine"] in machines.get(scan_type, []) or str(ls["patient_id"]) in patients
+        ]
+
+    blocked, hints, results, infos = {}, {}, {}, {}
+    pending = list(subproblems)
+    pool = get_pool(max_workers)
+    for round_number in range(max_repair_rounds + 1):
+        jobs = [
+            (subproblems[t], locked_by_type.get(t, []), reference_datetime, profile, hints.get(t), blocked)
+            for t in pending
+        ]
+        for scan_type, (schedule, info) in zip(pending, pool.map(_solve_subproblem, jobs)):
+            if schedule is None:
+                print(f"Modality engine: no solution for {scan_type}, falling back to the full model")
+                return solve_scans(new_scans_data, locked_schedule, reference_datetime, full_profile, solve_info)
+            results[scan_type] = schedule
+            infos[scan_type] = info
+            hints[scan_type] = {
+                entry["scan_id"]: (entry["machine"], datetime_to_minutes(entry["start_time"], reference_datetime))
+                for entry in schedule
+            }
+
+        new_schedule = [entry for scan_type in subproblems for entry in results[scan_type]]
+        conflicts = find_patient_conflicts(new_schedule, reference_datetime)
+        if not conflicts:
+            if solve_info is not None:
+                solve_info.update(combine_solve_info(infos.values()))
+                solve_info["wall_time"] = time.perf_counter() - started
+                solve_info["build_time"] = max((info.get("build_time", 0) for info in infos.values()), default=0)
+            return new_schedule
+        if round_number == max_repair_rounds:
+            break
+
+        pending = []
+        for kept, moved in conflicts:
+            start = datetime_to_minutes(kept["start_time"], reference_datetime)
+            blocked.setdefault(moved["scan_id"], []).append((start, start + int(kept["duration"])))
+            if moved["scan_type"] not in pending:
+                pending.append(moved["scan_type"])
+
+    print(f"Modality engine: {len(conflicts)} patient conflicts left after {max_repair_rounds} repair rounds, "
+          "falling back to the full model")
+    return solve_scans(new_scans_data, locked_schedule, reference_datetime, full_profile, solve_info)
@@ -0,0 +1,293 @@
+import numpy as np
+from ortools.sat.python import cp_model
+
+from config import machines, deadline_map
+from maintenance import maintenance_windows
+from solver_profile import SolverProfile, relative_gap
+from utils import minutes_to_datetime, peak_intervals
+
+# Numeric fields of the scans given to ScheduleModelBuilder.add_scans (check_in in minutes from
+# the reference datetime); ids and scan types are passed alongside as sequences
+SCAN_DTYPE = np.dtype([("duration", "i4"), ("priority", "i1"), ("check_in", "i4")])
+
+
+def priority_weight(priority):
+    """
+    Objective value of booking a scan of this priority; every minute it starts later costs 1.
+    """
+    return 100000 if priority == 0 else (6 - priority) * 10000
+
+
+class ScheduleModelBuilder:
+    """
+    The CP-SAT scheduling model, built incrementally and kept in memory. The per-machine
+    structure is created once: one NoOverlap per machine holding its locked scans and
+    maintenance windows, and the machines each modality may use with and without the
+    standby machine (the last of several in config.machines, Priority 1 only). add_scans()
+    then adds scans from typed arrays, appending their intervals to those constraints, and
+    solve() runs CP-SAT without reading or writing the schedule.
+    """
+
+    def __init__(self, reference_datetime, locked=None, horizon=None, patient_busy=None):
+        """
+        locked maps machine -> (start minutes, durations) arrays of the fixed entries
+        (see optimizer.locked_intervals) and patient_busy maps str(patient_id) -> [(start, end), ...]
+        minutes of the same entries (see optimizer.patient_windows), which the patient's new
+        scans must not overlap. horizon bounds Priority 0 starts; by default it is one day after
+        the latest check-in of the first scans added.
+        """
+        self.reference_datetime = reference_datetime
+        self.horizon = horizon
+        self.model = cp_model.CpModel()
+        self.assignment, self.start_vars = {}, {}
+        self.scans = []  # scan records in the order added, for extract_solution
+        self.solution = {}  # scan_id -> (machine, start minutes) of the last solve, used as hints
+        self.objective_terms = []
+        self.patient_busy = patient_busy or {}
+        self.patient_scans, self.patient_intervals, self.patient_no_overlap = {}, {}, {}
+
+        self.eligible = {}
+        for scan_type, machine_list in machines.items():
+            regular = machine_list[:-1] if len(machine_list) > 1 else machine_list
+            self.eligible[scan_type] = (regular, machine_list)
+
+        self.locked = locked or {}
+        self.no_overlap = {}
+        for m in sum(machines.values(), []):
+            starts, durations = self.locked.get(m, (np.empty(0, dtype=int), np.empty(0, dtype=int)))
+            self.no_overlap[m] = self.model.AddNoOverlap([
+                self.model.NewFixedSizeIntervalVar(int(start), int(dur), f"locked_{m}_{i}")
+                for i, (start, dur) in enumerate(zip(starts, durations))
+            ])
+        self.maintenance_until = None
+
+    def _extend(self, constraint, intervals):
+        constraint.proto.no_overlap.intervals.extend(interval.Index() for interval in intervals)
+
+    def _add_maintenance(self, until):
+        """
+        Adds the maintenance windows (config.maintenance) up to minute until to the machines,
+        skipping windows already taken by a locked scan.
+        """
+        lo = self.maintenance_until
+        if until <= (lo or 0):
+            return
+        for m, constraint in self.no_overlap.items():
+            starts, durations = self.locked.get(m, (np.empty(0, dtype=int), np.empty(0, dtype=int)))
+            self._extend(constraint, [
+                self.model.NewFixedSizeIntervalVar(start, end - start, f"maintenance_{m}_{start}")
+                for start, end in maintenance_windows(m, 0 if lo is None else lo, until, self.reference_datetime)
+                if (lo is None or start >= lo) and not ((starts < end) & (starts + durations > start)).any()
+            ])
+        self.maintenance_until = until
+
+    def add_scans(self, scan_id, patient_id, scan_type, scans, blocked=None):
+        """
+        Adds scans to the model: ids, patient ids and scan types as sequences and their numeric
+        fields as a SCAN_DTYPE array. blocked optionally maps scan_id -> [(start, end), ...]
+        minute windows the scan must not overlap.
+        """
+        blocked = blocked or {}
+        model = self.model
+        durations, priorities, check_ins = (scans[f].tolist() for f in ("duration", "priority", "check_in"))
+        if self.horizon is None and check_ins:
+            self.horizon = max(check_ins) + 1440
+        horizon = self.horizon
+
+        latest_end = 0
+        added = []
+        for s_id, p_id, s_type, duration, priority, check_in in zip(scan_id, patient_id, scan_type,
+                                                                   durations, priorities, check_ins):
+            deadline = deadline_map.get(priority, horizon)
+            latest_end = max(latest_end, check_in + deadline + duration)
+            if priority in [4, 5]:
+                # Priority 4/5 scans may only start in peak hours (see utils.is_non_peak)
+                start_domain = cp_model.Domain.FromIntervals(
+                    peak_intervals(check_in, check_in + deadline, self.reference_datetime))
+            else:
+                start_domain = cp_model.Domain(check_in, check_in + deadline)
+
+            assignment, start_vars, intervals = {}, {}, {}
+            for m in self.eligible[s_type][priority == 1]:
+                st = model.NewIntVarFromDomain(start_domain, f"start_{s_id}_{m}")
+                assignment[m] = model.NewBoolVar(f"assign_{s_id}_{m}")
+                start_vars[m] = st
+                intervals[m] = model.NewOptionalIntervalVar(st, duration, st + duration, assignment[m],
+                                                            f"interval_{s_id}_{m}")
+
+                if priority == 0:
+                    # aux = start if assigned here, else 0 (earlier is better for Priority 0); bounded by
+                    # the scan's own latest start, which may lie past horizon for scans added later
+                    latest = check_in + deadline
+                    aux = model.NewIntVar(0, latest, f"aux_{s_id}_{m}")
+                    model.Add(aux <= st)
+                    model.Add(aux <= latest * assignment[m])
+                    model.Add(aux >= st - latest * (1 - assignment[m]))
+                    self.objective_terms.append(priority_weight(priority) * assignment[m] - aux)
+                else:
+                    self.objective_terms.append(priority_weight(priority) * assignment[m] - st)
+
+            if assignment:
+                model.Add(sum(assignment.values()) == 1)
+            if blocked.get(s_id):
+                # Only the interval on the machine the scan is assigned to is present
+                model.AddNoOverlap(list(intervals.values()) + [
+                    model.NewFixedSizeIntervalVar(start, end - start, f"block{i}_{s_id}")
+                    for i, (start, end) in enumerate(blocked[s_id])
+                ])
+            self.assignment[s_id], self.start_vars[s_id] = assignment, start_vars
+            self.scans.append({"scan_id": s_id, "patient_id": p_id, "scan_type": s_type,
+                               "priority": priority, "duration": duration, "latest_start": check_in + deadline})
+            added.append((p_id, intervals))
+
+        # One scan at a time per patient, around the patient's fixed entries
+        for p_id, intervals in added:
+            if p_id not in self.patient_intervals:
+                busy = self.patient_busy.get(str(p_id), [])
+                self.patient_scans[p_id] = len(busy)
+                self.patient_intervals[p_id] = [
+                    model.NewFixedSizeIntervalVar(start, end - start, f"busy_{p_id}_{i}")
+                    for i, (start, end) in enumerate(busy)
+                ]
+            self.patient_scans[p_id] += 1
+            self.patient_intervals[p_id].extend(intervals.values())
+        for p_id in dict.fromkeys(p_id for p_id, _ in added):
+            patient_intervals = self.patient_intervals[p_id]
+            if p_id in self.patient_no_overlap:
+                constraint = self.patient_no_overlap[p_id]
+                self._extend(constraint, patient_intervals[len(constraint.proto.no_overlap.intervals):])
+            elif self.patient_scans[p_id] > 1:
+                self.patient_no_overlap[p_id] = model.AddNoOverlap(patient_intervals)
+
+        # One scan at a time per machine, around locked scans and maintenance
+        self._add_maintenance(latest_end)
+        for _, intervals in added:
+            for m, interval in intervals.items():
+                self._extend(self.no_overlap[m], [interval])
+
+    def add_scan_records(self, scans_data, blocked=None):
+        """
+        add_scans for scan records as returned by optimizer.prepare_scans.
+        """
+        scans = np.array([(s["duration"], s["priority"], s["check_in_mins"]) for s in scans_data], dtype=SCAN_DTYPE)
+        self.add_scans([s["scan_id"] for s in scans_data], [s["patient_id"] for s in scans_data],
+                       [s["scan_type"] for s in scans_data], scans, blocked)
+
+    def build(self):
+        """
+        Sets the objective over every scan added so far and returns the model with its assignment
+        and start variables, keyed by scan id and machine.
+        """
+        self.model.Maximize(sum(self.objective_terms))
+        return self.model, self.assignment, self.start_vars
+
+    def hint_objective(self, hints):
+        """
+        Objective of the schedule in hints (scan_id -> (machine, start minutes)), counting the
+        scans it does not place as starting as late as they may.
+        """
+        total = 0
+        for s in self.scans:
+            hint = hints.get(s["scan_id"])
+            hinted = hint is not None and hint[0] in self.assignment[s["scan_id"]]
+            total += priority_weight(s["priority"]) - (hint[1] if hinted else s["latest_start"])
+        return total
+
+    def solve(self, profile=None, solve_info=None, hints=None, stop_at_hints=False):
+        """
+        Solves the model built so far. hints maps scan_id -> (machine, start minutes); by default
+        the previous solution of this builder is used. With stop_at_hints the search stops at the
+        first solution as good as the hints (see hint_objective): the scans without a hint only
+        have to be fitted in, not the hinted ones improved. Returns the schedule entries of every
+        scan added, or None if no solution was found.
+        """
+        model, assignment, start_vars = self.build()
+        model.ClearHints()
+        hints = self.solution if hints is None else hints
+        for s_id, (machine, start) in hints.items():
+            if machine in assignment.get(s_id, {}):
+                for m in assignment[s_id]:
+                    model.AddHint(assignment[s_id][m], m == machine)
+                model.AddHint(start_vars[s_id][machine], start)
+        callback = None
+        report = profile.progress_callback if profile is not None else None
+        if report is not None or stop_at_hints:
+            callback = SolutionProgress(report, self.hint_objective(hints) if stop_at_hints else None)
+        solver = solve_model(model, profile, solve_info, callback)
+        if solver is None:
+            return None
+        self.solution = {s_id: (m, solver.Value(start_vars[s_id][m]))
+                         for s_id, machine_vars in assignment.items()
+                         for m, assigned in machine_vars.items() if solver.Value(assigned)}
+        return extract_solution(solver, self.scans, assignment, start_vars, self.reference_datetime)
+
+
+class SolutionProgress(cp_model.CpSolverSolutionCallback):
+    """
+    Passes every improving solution found during the search to report() (if given), with its
+    objective, bound and wall time; the schedule itself is only extracted once the search ends.
+    With a target objective the search stops at the first solution reaching it.
+    """
+
+    def __init__(self, report, target=None):
+        super().__init__()
+        self.report = report
+        self.target = target
+
+    def on_solution_callback(self):
+        if self.target is not None and self.ObjectiveValue() >= self.target:
+            self.StopSearch()
+        if self.report is None:
+            return
+        self.report({
+            "objective": self.ObjectiveValue(),
+            "bound": self.BestObjectiveBound(),
+            "wall_time": self.WallTime(),
+        })
+
+
+def solve_model(model, profile=None, solve_info=None, callback=None):
+    """
+    Runs CP-SAT on a built model with the given SolverProfile (Step 10).
+    Returns the solver, or None if no solution was found. If solve_info is a dict it is filled
+    with the status, objective, best bound, relative gap and wall time, so a FEASIBLE
+    (time-limited) answer can be told apart from an OPTIMAL one.
+    """
+    solver = cp_model.CpSolver()
+    (profile or SolverProfile.from_config()).apply(solver)
+    status = solver.Solve(model, callback)
+    found = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    if solve_info is not None:
+        solve_info.update({
+            "status": solver.StatusName(status),
+            "objective": solver.ObjectiveValue() if found else None,
+            "bound": solver.BestObjectiveBound() if found else None,
+            "gap": relative_gap(solver.ObjectiveValue(), solver.BestObjectiveBound()) if found else None,
+            "wall_time": solver.WallTime(),
+        })
+    if not found:
+        return None
+    return solver
+
+
+def extract_solution(solver, new_scans_data, assignment, start_vars, reference_datetime):
+    """
+    Reads the chosen machine and start time of every new scan from the solver (Step 11).
+    """
+    new_schedule = []
+    for s in new_scans_data:
+        s_id = s["scan_id"]
+        for m in assignment[s_id]:
+            if solver.Value(assignment[s_id][m]):
+                st = solver.Value(start_vars[s_id][m])
+                new_schedule.append({
+                    "scan_id": s_id,
+                    "patient_id": s["patient_id"],
+                    "scan_type": s["scan_type"],
+                    "machine": m,
+                    "start_time": minutes_to_datetime(st, reference_datetime),
+                    "end_time": minutes_to_datetime(st + int(s["duration"]), reference_datetime),
+                    "priority": s["priority"],
+                    "duration": s["duration"]
+                })
+    return new_schedule
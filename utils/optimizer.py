@@ -1,198 +1,178 @@
-import os
+import numpy as np
 import pandas as pd
-from ortools.sat.python import cp_model
 from datetime import datetime, timedelta
-from maintenance import bump_priority_zero, insert_maintenance_blocks
-from config import machines
-from utils import minutes_to_datetime
+from maintenance import bump_priority_zero, maintenance_schedule
+from model_builder import ScheduleModelBuilder, SolutionProgress, solve_model, extract_solution
+from schedule_types import Schedule
+from config import rolling_horizon, optimizer_engine, priority_zero_bump, schedule_store
+from schedule_store import ScheduleConflict, open_schedule_repository
+from validation import validate_schedule
 import io
+import os
+import time
 
-def optimize_scan_scheduling(scans, schedule_csv_path):
-    model = cp_model.CpModel()
-    current_time = datetime.now()
-    #print((scans))
-    print("hello")
-    scans_df = pd.read_csv(io.StringIO(scans))
-    #print(type(scans_df))
+
+def load_scan_requests(scans):
+    """
+    Parses the scan request CSV string into scan records (Steps 1-2).
+    Returns the records sorted by priority and check-in, and the reference datetime.
+    Patient ids are kept as strings, as load_existing_schedule returns them.
+    """
+    scans_df = pd.read_csv(io.StringIO(scans), dtype={"patient_id": str})
     # --- Step 1: Load New Scan Requests ---
-  # scans_df = pd.read_csv(scans)
     scans_df = scans_df.dropna(subset=["check_in_date", "check_in_time"])
     scans_df["check_in_datetime"] = pd.to_datetime(
         scans_df["check_in_date"] + " " + scans_df["check_in_time"],
         format="%Y-%m-%d %H:%M"
     )
-    
-    # --- Step 2: Determine Reference and Offsets ---
-    reference_datetime = scans_df["check_in_datetime"].min()
-    scans_df["check_in_mins"] = ((scans_df["check_in_datetime"] - reference_datetime)
-                                  .dt.total_seconds() // 60).astype(int)
     scans_df["priority"] = scans_df["priority"].astype(int)
-    scans_data_all = scans_df.to_dict('records')
-    scans_data_all.sort(key=lambda s: (s["priority"], s["check_in_mins"]))
-
-    # --- Step 3: Load Existing Schedule ---
-    existing_schedule = []
-    locked_schedule = []
-    locked_ids = set()
-
-    if os.path.exists(schedule_csv_path):
-        existing_df = pd.read_csv(schedule_csv_path)
-        for _, row in existing_df.iterrows():
-            if row["scan_type"] == "maintenance":
-                continue
-            existing_schedule.append(row)
-            start_dt = datetime.strptime(row["start_time"], "%Y-%m-%d %H:%M")
-            if start_dt < (current_time + timedelta(hours=48)):
-                locked_schedule.append(row)
-                locked_ids.add(row["scan_id"])
-
-    # --- Step 4: Filter for New Scans ---
-    new_scans_data = [s for s in scans_data_all if s["scan_id"] not in locked_ids]
-
-    for s in new_scans_data:
-        s["priority"] = int(s["priority"])
+    return prepare_scans(scans_df.to_dict('records'))
 
-    standby_machines = {}
-    for scan_type, machine_list in machines.items():
-        if len(machine_list) > 1:
-            standby_machines[scan_type] = machine_list[-1]
-
-    # --- Step 5: Define Planning Horizon ---
-    horizon = (max([s["check_in_mins"] for s in new_scans_data]) if new_scans_data else 0) + 1440
-
-    # --- Step 6: Create Decision Variables ---
-    assignment, start_vars, intervals, aux = {}, {}, {}, {}
-    for s in new_scans_data:
-        s_id = s["scan_id"]
-        p_id = s["patient_id"]
-        priority = int(s["priority"])
-        duration = int(s["duration"])
-        check_in = s["check_in_datetime"]
-        check_in_mins = s["check_in_mins"]
-
-        assignment[s_id], start_vars[s_id], intervals[s_id] = {}, {}, {}
-        if priority == 0:
-            aux[s_id] = {}
-
-        deadline_map = {1: 1440, 2: 10080, 3: 43200, 4: 86400, 5: 345600}
-        deadline = deadline_map.get(priority, horizon)
-
-        for m in machines[s["scan_type"]]:
-            if m in standby_machines.get(s["scan_type"], []) and priority != 1:
-                continue
-
-            st = model.NewIntVar(check_in_mins, check_in_mins + deadline, f"start_{s_id}_{m}")
-            assignment[s_id][m] = model.NewBoolVar(f"assign_{s_id}_{m}")
-            start_vars[s_id][m] = st
-
-            if priority in [4, 5]:
-                minute_of_day = model.NewIntVar(0, 1439, f"mod1440_{s_id}_{m}")
-                peak_indicator = model.NewBoolVar(f"peak_{s_id}_{m}")
-
-                model.AddModuloEquality(minute_of_day, st, 1440)
-                model.AddBoolOr([
-                    model.NewBoolVar(f"dummy_true_{s_id}_{m}"),
-                    peak_indicator
-                ])
-                model.Add(minute_of_day >= 240).OnlyEnforceIf(peak_indicator)
-                model.Add(minute_of_day <= 1199).OnlyEnforceIf(peak_indicator)
-                model.Add(minute_of_day < 240).OnlyEnforceIf(peak_indicator.Not())
-                model.Add(minute_of_day > 1199).OnlyEnforceIf(peak_indicator.Not())
-
-                s["peak_indicators"] = s.get("peak_indicators", {})
-                s["peak_indicators"][m] = peak_indicator
-
-            intervals[s_id][m] = model.NewOptionalIntervalVar(
-                st, duration, st + duration, assignment[s_id][m], f"interval_{s_id}_{m}"
-            )
-
-            if priority == 0:
-                aux[s_id][m] = model.NewIntVar(0, horizon, f"aux_{s_id}_{m}")
-                M = horizon
-                model.Add(aux[s_id][m] <= st)
-                model.Add(aux[s_id][m] <= M * assignment[s_id][m])
-                model.Add(aux[s_id][m] >= st - M * (1 - assignment[s_id][m]))
-
-        if assignment[s_id]:
-            model.Add(sum(assignment[s_id][m] for m in assignment[s_id]) == 1)
-
-    # --- Step 7: Ensure One Scan per Patient ---
-    patient_to_assignments = {}
-    for s in new_scans_data:
-        p_id, s_id = s["patient_id"], s["scan_id"]
-        patient_to_assignments.setdefault(p_id, [])
-        for m in assignment[s_id]:
-            patient_to_assignments[p_id].append(assignment[s_id][m])
-    for p_id, assigns in patient_to_assignments.items():
-        model.Add(sum(assigns) <= 1)
-
-    # --- Step 8: No-Overlap Constraints ---
-    locked_intervals_by_machine = {m: [] for m in sum(machines.values(), [])}
-    for ls in locked_schedule:
-        locked_start_dt = datetime.strptime(ls["start_time"], "%Y-%m-%d %H:%M")
-        locked_start = int((locked_start_dt - reference_datetime).total_seconds() // 60)
-        dur = int(ls["duration"])
-        iv = model.NewIntervalVar(locked_start, dur, locked_start + dur, f"locked_{ls['scan_id']}_{ls['machine']}")
-        locked_intervals_by_machine[ls["machine"]].append(iv)
-
-    for cat, m_list in machines.items():
-        for m in m_list:
-            machine_intervals = []
-            for s in new_scans_data:
-                s_id = s["scan_id"]
-                if m in intervals.get(s_id, {}):
-                    machine_intervals.append(intervals[s_id][m])
-            machine_intervals += locked_intervals_by_machine.get(m, [])
-            if machine_intervals:
-                model.AddNoOverlap(machine_intervals)
-
-    # --- Step 9: Objective Function ---
-    objective_terms = []
-    for s in new_scans_data:
-        s_id = s["scan_id"]
-        check_in_bias = s["check_in_mins"]
-        for m in assignment[s_id]:
-            st = start_vars[s_id][m]
-            if s["priority"] == 0:
-                objective_terms.append(100000 * assignment[s_id][m] - aux[s_id][m])
-            else:
-                weight = (6 - int(s["priority"])) * 10000
-                term = weight * assignment[s_id][m] - st
-                if int(s["priority"]) in [4, 5]:
-                    peak_indicator = s["peak_indicators"][m]
-                    term -= 100000 * peak_indicator
-                objective_terms.append(term)
-    model.Maximize(sum(objective_terms))
-
-    # --- Step 10: Solve Model ---
-    solver = cp_model.CpSolver()
-    status = solver.Solve(model)
-    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-        return None
-
-    # --- Step 11: Extract Solution ---
-    new_schedule = []
-    for s in new_scans_data:
-        s_id = s["scan_id"]
-        for m in assignment[s_id]:
-            if solver.Value(assignment[s_id][m]):
-                st = solver.Value(start_vars[s_id][m])
-                new_schedule.append({
-                    "scan_id": s_id,
-                    "patient_id": s["patient_id"],
-                    "scan_type": s["scan_type"],
-                    "machine": m,
-                    "start_time": minutes_to_datetime(st, reference_datetime),
-                    "end_time": minutes_to_datetime(st + int(s["duration"]), reference_datetime),
-                    "priority": s["priority"],
-                    "duration": s["duration"]
-                })
 
+def prepare_scans(scans_data):
+    """
+    Computes check-in offsets (in minutes) against the earliest check-in and sorts the scans.
+    """
+    # --- Step 2: Determine Reference and Offsets ---
+    if not scans_data:
+        return [], None
+    reference_datetime = min(s["check_in_datetime"] for s in scans_data)
+    for s in scans_data:
+        s["check_in_mins"] = int((s["check_in_datetime"] - reference_datetime).total_seconds() // 60)
+        s["priority"] = int(s["priority"])
+    scans_data.sort(key=lambda s: (s["priority"], s["check_in_mins"]))
+    return scans_data, reference_datetime
+
+
+def load_existing_schedule(schedule_csv_path, current_time, snapshot=None):
+    """
+    Loads the saved schedule (CSV or SQLite, see schedule_store) and splits out the entries
+    inside the 48-hour lock (Step 3). Timestamps are parsed once for the whole frame and the
+    lock is a boolean mask, so this stays cheap for large histories.
+    Returns the existing and locked entries as lists of dicts, and the locked scan ids.
+    Patient ids are returned as strings whatever the backend stored (the CSV column holds
+    "Maintenance" as well, SQLite keeps numbers), so they compare equal to the new scans'.
+    snapshot, if a dict, receives the repository version the entries were read at ("version"),
+    for save_schedule to check against.
+    """
+    repository = open_schedule_repository(schedule_csv_path)
+    if snapshot is not None:
+        snapshot["version"] = repository.version()
+    existing_df = repository.load_frame()
+    existing_df = existing_df[existing_df["scan_type"] != "maintenance"].copy()
+    existing_df["patient_id"] = existing_df["patient_id"].astype(str)
+    start_dt = pd.to_datetime(existing_df["start_time"], format="%Y-%m-%d %H:%M")
+    locked_df = existing_df[start_dt < (current_time + timedelta(hours=48))]
+    return existing_df.to_dict("records"), locked_df.to_dict("records"), set(locked_df["scan_id"])
+
+
+def locked_intervals(locked_schedule, reference_datetime):
+    """
+    Converts fixed schedule entries to machine -> (start minutes, durations) integer arrays
+    relative to reference_datetime.
+    """
+    if len(locked_schedule) == 0:
+        return {}
+    locked_df = pd.DataFrame(locked_schedule)
+    start_dt = pd.to_datetime(locked_df["start_time"], format="%Y-%m-%d %H:%M")
+    starts = ((start_dt - reference_datetime) // pd.Timedelta(minutes=1)).to_numpy(dtype="int64")
+    durations = locked_df["duration"].to_numpy(dtype="int64")
+    return {m: (starts[idx], durations[idx]) for m, idx in locked_df.groupby("machine").indices.items()}
+
+
+def patient_windows(locked_schedule, reference_datetime):
+    """
+    Maps str(patient_id) -> [(start, end), ...] minutes relative to reference_datetime of the
+    fixed schedule entries, which the patient's new scans must not overlap.
+    """
+    if len(locked_schedule) == 0:
+        return {}
+    locked_df = pd.DataFrame(locked_schedule)
+    start_dt = pd.to_datetime(locked_df["start_time"], format="%Y-%m-%d %H:%M")
+    starts = ((start_dt - reference_datetime) // pd.Timedelta(minutes=1)).to_numpy(dtype="int64")
+    ends = starts + locked_df["duration"].to_numpy(dtype="int64")
+    return {p_id: list(zip(starts[idx].tolist(), ends[idx].tolist()))
+            for p_id, idx in locked_df.groupby(locked_df["patient_id"].astype(str)).indices.items()}
+
+
+def new_model_builder(locked_schedule, reference_datetime):
+    """
+    A ScheduleModelBuilder holding the locked entries on their machines and as busy windows of their patients.
+    """
+    return ScheduleModelBuilder(reference_datetime, locked_intervals(locked_schedule, reference_datetime),
+                                patient_busy=patient_windows(locked_schedule, reference_datetime))
+
+
+def build_scan_model(new_scans_data, locked_schedule, reference_datetime, blocked=None):
+    """
+    Builds the CP-SAT model for the new scans around the locked entries (Steps 5-9, see
+    model_builder.ScheduleModelBuilder); a patient's new scans also avoid the patient's locked entries.
+    blocked optionally maps scan_id -> [(start, end), ...] minute windows the scan must not overlap.
+    Returns the model with its assignment and start variables, keyed by scan id and machine.
+    """
+    builder = new_model_builder(locked_schedule, reference_datetime)
+    builder.add_scan_records(new_scans_data, blocked)
+    return builder.build()
+
+
+def solve_scans(new_scans_data, locked_schedule, reference_datetime, profile=None, solve_info=None, hints=None,
+                blocked=None, stop_at_hints=False):
+    """
+    Default engine: solves all new scans in one model.
+    hints optionally maps scan_id -> (machine, start minutes) from an earlier solution; with
+    stop_at_hints the search ends once it is matched (see ScheduleModelBuilder.solve).
+    Returns the new schedule entries, or None if no solution was found. solve_info also
+    receives the model build time in seconds ("build_time").
+    """
+    start = time.perf_counter()
+    builder = new_model_builder(locked_schedule, reference_datetime)
+    builder.add_scan_records(new_scans_data, blocked)
+    build_time = time.perf_counter() - start
+    new_schedule = builder.solve(profile, solve_info, hints or {}, stop_at_hints)
+    if solve_info is not None:
+        solve_info["build_time"] = build_time
+    return new_schedule
+
+
+def select_engine(new_scans_data, name=None):
+    """
+    Returns the engine named by name, $OPTIMIZER_ENGINE or config.optimizer_engine["name"]:
+    "single" (solve_scans), "rolling", "modality", or "auto", which picks the rolling-horizon
+    engine once the backlog is too large for one model.
+    """
+    name = name or os.getenv("OPTIMIZER_ENGINE") or optimizer_engine["name"]
+    if name == "auto":
+        name = "rolling" if len(new_scans_data) >= rolling_horizon["min_scans"] else "single"
+    if name == "rolling":
+        from rolling_horizon import solve_rolling_horizon
+        return solve_rolling_horizon
+    if name == "modality":
+        from modality_engine import solve_by_modality
+        return solve_by_modality
+    if name == "single":
+        return solve_scans
+    raise ValueError(f"Unknown optimizer engine: {name}")
+
+
+def save_schedule(existing_schedule, new_schedule, schedule_csv_path, bump_report=None, expected_version=None):
+    """
+    Merges the new scans into the existing schedule, applies the post-processing passes and
+    writes the result back to the schedule CSV or database (Steps 12-13).
+    bump_report, if given, receives the delays introduced by the Priority 0 bump pass.
+    With expected_version (from load_existing_schedule) nothing is written and ScheduleConflict
+    is raised if the schedule changed since it was loaded.
+    """
     # --- Step 12: Merge new scans with existing ones ---
     existing_ids = set(row["scan_id"] for row in existing_schedule)
     all_scans = existing_schedule + [s for s in new_schedule if s["scan_id"] not in existing_ids]
-    all_scans = bump_priority_zero(all_scans)
-    all_scans = insert_maintenance_blocks(all_scans)
+    schedule = Schedule.from_records(all_scans)
+    if len(schedule):
+        # Maintenance entries for the windows the model reserved
+        booked = schedule.take(np.arange(len(existing_schedule)))
+        schedule = schedule.concat(maintenance_schedule(int(schedule.entries["start"].min()),
+                                                        int(schedule.entries["end"].max()), booked))
+    schedule = bump_priority_zero(schedule, priority_zero_bump["reassign"], bump_report)
+    all_scans = schedule.to_records()
 
     # --- Step 13: Clean and Save Final Schedule ---
     cleaned_schedule = []
@@ -202,7 +182,62 @@ def optimize_scan_scheduling(scans, schedule_csv_path):
             cleaned_entry[key] = str(value) if isinstance(value, dict) else value
         cleaned_schedule.append(cleaned_entry)
 
-    pd.DataFrame(cleaned_schedule).to_csv(schedule_csv_path, index=False)
-    print(type(cleaned_schedule))
-    print(cleaned_schedule)
+    open_schedule_repository(schedule_csv_path).sync(cleaned_schedule, expected_version)
+    return cleaned_schedule
+
+
+def optimize_scan_scheduling(scans, schedule_csv_path=None, engine=None, profile=None, solve_info=None):
+    """
+    Schedules the scans in the CSV string around the saved schedule and saves the result.
+    schedule_csv_path defaults to config.schedule_store (see schedule_store.open_schedule_repository).
+    engine is a callable (new_scans_data, locked_schedule, reference_datetime, profile, solve_info)
+    returning the new schedule; by default it is chosen by select_engine.
+    profile is a SolverProfile and solve_info an optional dict receiving the solve statistics,
+    with the seconds spent loading, in the engine and post-processing under "timings".
+    If another optimization saves the schedule while this one solves, the load and solve are
+    repeated on the new schedule (up to config.schedule_store["max_retries"] times, "retries" in
+    solve_info) so neither result is lost.
+    """
+    current_time = datetime.now()
+    started = time.perf_counter()
+    scans_data_all, reference_datetime = load_scan_requests(scans)
+
+    for attempt in range(schedule_store["max_retries"] + 1):
+        snapshot = {}
+        existing_schedule, _, _ = load_existing_schedule(schedule_csv_path, current_time, snapshot)
+        loaded = time.perf_counter()
+
+        # --- Step 4: Filter for New Scans ---
+        # Saved scans keep their slot (see save_schedule), so they are fixed in the model like the
+        # locked ones; only those still running at the earliest check-in can be in the way
+        existing_ids = set(row["scan_id"] for row in existing_schedule)
+        new_scans_data = [s for s in scans_data_all if s["scan_id"] not in existing_ids]
+        earliest = reference_datetime.strftime("%Y-%m-%d %H:%M") if reference_datetime is not None else ""
+        fixed_schedule = [row for row in existing_schedule if row["end_time"] > earliest]
+
+        if engine is None:
+            engine = select_engine(new_scans_data)
+        new_schedule = engine(new_scans_data, fixed_schedule, reference_datetime, profile, solve_info)
+        solved = time.perf_counter()
+        if new_schedule is None:
+            return None
+
+        bump_report = {}
+        try:
+            cleaned_schedule = save_schedule(existing_schedule, new_schedule, schedule_csv_path, bump_report,
+                                             snapshot["version"])
+            break
+        except ScheduleConflict:
+            if attempt == schedule_store["max_retries"]:
+                raise
+            print("The schedule changed while solving; solving again")
+
+    if solve_info is not None:
+        solve_info["retries"] = attempt
+        solve_info["bump"] = bump_report
+        check_ins = {s["scan_id"]: s["check_in_datetime"] for s in scans_data_all}
+        report = validate_schedule(cleaned_schedule, check_ins)
+        solve_info["validation"] = {"valid": report["valid"], "counts": report["counts"]}
+        solve_info["timings"] = {"load": loaded - started, "engine": solved - loaded,
+                                 "post_process": time.perf_counter() - solved}
     return cleaned_schedule
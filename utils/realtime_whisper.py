@@ -3,6 +3,8 @@ import io
 from dotenv import load_dotenv
 import os
 
+from audio_preprocess import preprocess_audio
+
 
 def audio_processing(file_buffer, filename="audio.webm"):
     """
@@ -10,6 +12,9 @@ def audio_processing(file_buffer, filename="audio.webm"):
     """
     # Reset the file buffer so we read from the beginning.
     file_buffer.seek(0)
+    # Mono 16 kHz with the silence trimmed: a fraction of the upload (see audio_preprocess.py)
+    audio, filename = preprocess_audio(file_buffer.read(), filename)
+    file_buffer = io.BytesIO(audio)
     
     load_dotenv()
     api_key = os.getenv("OPENAI_API_KEY")
@@ -21,6 +26,8 @@ def audio_processing(file_buffer, filename="audio.webm"):
         mime_type = "audio/ogg"
     elif filename.lower().endswith(".wav"):
         mime_type = "audio/wav"
+    elif filename.lower().endswith(".flac"):
+        mime_type = "audio/flac"
     else:
         mime_type = "audio/webm"
 
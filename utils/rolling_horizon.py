@@ -0,0 +1,56 @@
+from config import rolling_horizon
+from optimizer import solve_scans
+from solver_profile import SolverProfile, combine_solve_info
+from utils import datetime_to_minutes
+
+
+def _end_minutes(entry, reference_datetime):
+    return datetime_to_minutes(entry["start_time"], reference_datetime) + int(entry["duration"])
+
+
+def solve_rolling_horizon(new_scans_data, locked_schedule, reference_datetime, profile=None, solve_info=None,
+                          window_minutes=None, verify=False):
+    """
+    Rolling-horizon engine: solves the scans in consecutive check-in windows (a day by default).
+    Entries committed by earlier windows are carried forward as fixed intervals, and only the
+    ones still running when a window opens are passed on, so each model stays window-sized.
+    They also keep their patient's scans in later windows off the same time (see
+    optimizer.patient_windows).
+    If a window has no solution the whole backlog falls back to the full model, and with
+    verify=True the full model is re-solved with the rolling solution as a hint.
+    profile applies to every window; it defaults to config.rolling_horizon['window_time_limit'].
+    """
+    if window_minutes is None:
+        window_minutes = rolling_horizon["window_minutes"]
+    if profile is None:
+        profile = SolverProfile.from_config(time_limit=rolling_horizon.get("window_time_limit"))
+
+    windows = {}
+    for s in new_scans_data:
+        windows.setdefault(s["check_in_mins"] // window_minutes, []).append(s)
+
+    fixed = [(_end_minutes(ls, reference_datetime), ls) for ls in locked_schedule]
+    new_schedule, window_infos = [], []
+    for w in sorted(windows):
+        window_start = w * window_minutes
+        fixed = [(end, entry) for end, entry in fixed if end > window_start]
+        window_info = {}
+        window_schedule = solve_scans(windows[w], [entry for _, entry in fixed], reference_datetime,
+                                      profile, window_info)
+        if window_schedule is None:
+            print(f"Rolling horizon: window {w} has no solution, falling back to the full model")
+            return solve_scans(new_scans_data, locked_schedule, reference_datetime, profile, solve_info)
+        new_schedule += window_schedule
+        window_infos.append(window_info)
+        fixed += [(_end_minutes(entry, reference_datetime), entry) for entry in window_schedule]
+
+    if verify:
+        hints = {entry["scan_id"]: (entry["machine"], datetime_to_minutes(entry["start_time"], reference_datetime))
+                 for entry in new_schedule}
+        verified = solve_scans(new_scans_data, locked_schedule, reference_datetime, profile, solve_info, hints)
+        if verified is not None:
+            return verified
+        print("Rolling horizon: full-model verification found no solution")
+    if solve_info is not None:
+        solve_info.update(combine_solve_info(window_infos))
+    return new_schedule
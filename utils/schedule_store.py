@@ -0,0 +1,246 @@
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+from config import schedule_store
+
+SCHEDULE_COLUMNS = ["scan_id", "patient_id", "scan_type", "machine", "start_time", "end_time", "priority", "duration"]
+
+
+class ScheduleConflict(Exception):
+    """
+    The stored schedule changed between the read an optimization was based on and its write.
+    """
+
+
+def _plain(value):
+    # numpy/pandas scalars -> Python values that sqlite3 can bind
+    return value.item() if hasattr(value, "item") else value
+
+
+def _row(entry):
+    row = [_plain(entry[column]) for column in SCHEDULE_COLUMNS]
+    row[0] = str(row[0])
+    return tuple(row)
+
+
+# Serializes the read-modify-write of CsvScheduleRepository writes between threads of one process
+_csv_lock = threading.Lock()
+
+
+class CsvScheduleRepository:
+    """
+    The schedule as a CSV file. Every write rewrites the whole file (to a temporary file that
+    then replaces it, so readers never see half a file); kept for import/export and for the
+    single-process setup the optimizer started with.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def version(self):
+        """
+        Token that changes with every write: the file's inode, modification time and size.
+        """
+        if not os.path.exists(self.path):
+            return (0, 0, 0)
+        stat = os.stat(self.path)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _write(self, df):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".csv")
+        try:
+            with os.fdopen(fd, "w", newline="") as f:
+                df.to_csv(f, index=False)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load_frame(self):
+        if not os.path.exists(self.path):
+            return pd.DataFrame(columns=SCHEDULE_COLUMNS)
+        return pd.read_csv(self.path)
+
+    def sync(self, entries, expected_version=None):
+        """
+        Makes the stored schedule equal to entries. With expected_version (see version()) it raises
+        ScheduleConflict instead if the file was written since; the check only holds between
+        threads of one process, so concurrent worker processes need the SQLite backend.
+        """
+        with _csv_lock:
+            if expected_version is not None and self.version() != expected_version:
+                raise ScheduleConflict(f"{self.path} changed since it was read")
+            self._write(pd.DataFrame(entries) if len(entries) else pd.DataFrame(columns=SCHEDULE_COLUMNS))
+
+    def upsert(self, entries):
+        new_df = pd.DataFrame(entries)
+        with _csv_lock:
+            df = self.load_frame()
+            df = df[~df["scan_id"].astype(str).isin(new_df["scan_id"].astype(str))] if len(new_df) else df
+            self._write(pd.concat([df, new_df], ignore_index=True))
+
+    def insert_new(self, entries):
+        """
+        Adds the entries whose scan_id is not stored yet.
+        """
+        new_df = pd.DataFrame(entries)
+        with _csv_lock:
+            if os.path.exists(self.path):
+                existing_df = pd.read_csv(self.path)
+                existing_ids = set(existing_df['scan_id'].astype(str))
+                new_df = new_df[~new_df['scan_id'].astype(str).isin(existing_ids)]
+                final_df = pd.concat([existing_df, new_df], ignore_index=True)
+            else:
+                final_df = new_df
+            self._write(final_df)
+
+    def import_csv(self, csv_path):
+        self.sync(pd.read_csv(csv_path).to_dict("records"))
+
+    def export_csv(self, csv_path):
+        self.load_frame().to_csv(csv_path, index=False)
+
+
+# Database files whose schema (and WAL mode, which is persistent) this process has set up;
+# opening the repository again for the same file skips it
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+
+class SQLiteScheduleRepository:
+    """
+    The schedule in a SQLite database in WAL mode, indexed on (machine, start_time) and
+    start_time. Readers never block the writer, writes are transactions that only touch the
+    rows that changed, and concurrent writers queue on SQLite's own lock (busy timeout)
+    instead of a lock file. Every write bumps a version number, so a writer can check that
+    the rows it read are still current (sync with expected_version).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with _schema_lock:
+            if os.path.abspath(path) in _schema_ready:
+                return
+            self._create_schema()
+            _schema_ready.add(os.path.abspath(path))
+
+    def _create_schema(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS schedule ("
+                "scan_id TEXT PRIMARY KEY, patient_id, scan_type TEXT NOT NULL, machine TEXT NOT NULL, "
+                "start_time TEXT NOT NULL, end_time TEXT NOT NULL, priority INTEGER, duration INTEGER)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS schedule_machine_start ON schedule (machine, start_time)")
+            conn.execute("CREATE INDEX IF NOT EXISTS schedule_start ON schedule (start_time)")
+            conn.execute("CREATE TABLE IF NOT EXISTS schedule_version (version INTEGER NOT NULL)")
+            conn.execute("INSERT INTO schedule_version SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM schedule_version)")
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation; the with-block commits or rolls back.
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _query(self, where="", params=()):
+        with self._connect() as conn:
+            return pd.read_sql_query(f"SELECT {', '.join(SCHEDULE_COLUMNS)} FROM schedule {where}", conn,
+                                     params=params)
+
+    def version(self):
+        """
+        Number of writes made to the schedule so far.
+        """
+        with self._connect() as conn:
+            return conn.execute("SELECT version FROM schedule_version").fetchone()[0]
+
+    def _bump_version(self, conn):
+        conn.execute("UPDATE schedule_version SET version = version + 1")
+
+    def load_frame(self):
+        return self._query("ORDER BY machine, start_time")
+
+    def _upsert(self, conn, rows):
+        conn.executemany(
+            f"INSERT INTO schedule ({', '.join(SCHEDULE_COLUMNS)}) VALUES ({', '.join('?' * len(SCHEDULE_COLUMNS))}) "
+            "ON CONFLICT(scan_id) DO UPDATE SET " +
+            ", ".join(f"{column} = excluded.{column}" for column in SCHEDULE_COLUMNS[1:]),
+            rows,
+        )
+
+    def upsert(self, entries):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._upsert(conn, [_row(entry) for entry in entries])
+            self._bump_version(conn)
+
+    def insert_new(self, entries):
+        """
+        Adds the entries whose scan_id is not stored yet.
+        """
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO schedule ({', '.join(SCHEDULE_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(SCHEDULE_COLUMNS))})",
+                [_row(entry) for entry in entries],
+            )
+            self._bump_version(conn)
+
+    def delete(self, scan_ids):
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM schedule WHERE scan_id = ?", [(str(s_id),) for s_id in scan_ids])
+            self._bump_version(conn)
+
+    def sync(self, entries, expected_version=None):
+        """
+        Makes the stored schedule equal to entries, writing only inserted, changed and removed rows.
+        With expected_version (see version()) it raises ScheduleConflict instead if the schedule
+        was written since that version was read; the check and the write are one transaction.
+        """
+        rows = {str(row[0]): row for row in map(_row, entries)}
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            version = conn.execute("SELECT version FROM schedule_version").fetchone()[0]
+            if expected_version is not None and version != expected_version:
+                raise ScheduleConflict(f"{self.path} changed since it was read (version {expected_version} -> {version})")
+            stored = {row[0]: row for row in conn.execute(f"SELECT {', '.join(SCHEDULE_COLUMNS)} FROM schedule")}
+            removed = [(s_id,) for s_id in stored if s_id not in rows]
+            changed = [row for s_id, row in rows.items() if stored.get(s_id) != row]
+            conn.executemany("DELETE FROM schedule WHERE scan_id = ?", removed)
+            self._upsert(conn, changed)
+            self._bump_version(conn)
+
+    def import_csv(self, csv_path):
+        self.sync(pd.read_csv(csv_path).to_dict("records"))
+
+    def export_csv(self, csv_path):
+        self.load_frame().to_csv(csv_path, index=False)
+
+
+def default_schedule_path():
+    """
+    $SCHEDULE_STORE, or config.schedule_store["path"].
+    """
+    return os.getenv("SCHEDULE_STORE") or schedule_store["path"]
+
+
+def open_schedule_repository(path=None):
+    """
+    Opens the schedule at path (default: default_schedule_path()): SQLite for
+    .db/.sqlite/.sqlite3 files, CSV otherwise.
+    """
+    path = path or default_schedule_path()
+    if os.path.splitext(path)[1].lower() in (".db", ".sqlite", ".sqlite3"):
+        return SQLiteScheduleRepository(path)
+    return CsvScheduleRepository(path)
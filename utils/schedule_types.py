@@ -0,0 +1,150 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+EPOCH = datetime(1970, 1, 1)
+
+# One row per schedule entry. Times are minutes since 1970-01-01 00:00 (naive wall clock),
+# machine is an index into Schedule.machines.
+ENTRY_DTYPE = np.dtype([
+    ("start", np.int32),
+    ("end", np.int32),
+    ("machine", np.int16),
+    ("priority", np.int8),
+    ("duration", np.int32),
+])
+
+
+def parse_minutes(times):
+    """
+    "%Y-%m-%d %H:%M" strings (or datetimes) -> int32 minutes since the epoch.
+    """
+    times = list(times)
+    if times and not isinstance(times[0], str):
+        # NumPy converts datetime objects one by one; pandas does it in bulk
+        times = pd.DatetimeIndex(times).values
+    return np.asarray(times, dtype="datetime64[m]").astype(np.int32)
+
+
+def format_minutes(minutes):
+    """
+    Minutes since the epoch -> list of "%Y-%m-%d %H:%M" strings.
+    """
+    strings = np.datetime_as_string(np.asarray(minutes, dtype=np.int64).astype("datetime64[m]"))
+    return [s.replace("T", " ") for s in strings.tolist()]
+
+
+class Schedule:
+    """
+    A schedule held as a NumPy structured array of integer minutes (see ENTRY_DTYPE) plus the
+    text columns as lists. The post-processing passes, the overlap check, the plots and the
+    Excel export work on this; the "%Y-%m-%d %H:%M" strings only exist at the CSV/API boundary
+    (from_records / to_records).
+    """
+
+    __slots__ = ("entries", "machines", "scan_id", "patient_id", "scan_type")
+
+    def __init__(self, entries, machines, scan_id, patient_id, scan_type):
+        self.entries = entries
+        self.machines = machines
+        self.scan_id = scan_id
+        self.patient_id = patient_id
+        self.scan_type = scan_type
+
+    @classmethod
+    def from_records(cls, records):
+        records = list(records)
+        machines = sorted(set(r["machine"] for r in records))
+        machine_index = {m: i for i, m in enumerate(machines)}
+        entries = np.empty(len(records), dtype=ENTRY_DTYPE)
+        if records:
+            entries["start"] = parse_minutes([r["start_time"] for r in records])
+            entries["end"] = parse_minutes([r["end_time"] for r in records])
+            entries["machine"] = [machine_index[r["machine"]] for r in records]
+            entries["priority"] = [int(r["priority"]) for r in records]
+            entries["duration"] = [int(r["duration"]) for r in records]
+        return cls(entries, machines,
+                   [r["scan_id"] for r in records],
+                   [r["patient_id"] for r in records],
+                   [r["scan_type"] for r in records])
+
+    def to_records(self):
+        starts = format_minutes(self.entries["start"])
+        ends = format_minutes(self.entries["end"])
+        machine = self.entries["machine"].tolist()
+        priority = self.entries["priority"].tolist()
+        duration = self.entries["duration"].tolist()
+        return [{
+            "scan_id": self.scan_id[i],
+            "patient_id": self.patient_id[i],
+            "scan_type": self.scan_type[i],
+            "machine": self.machines[machine[i]],
+            "start_time": starts[i],
+            "end_time": ends[i],
+            "priority": priority[i],
+            "duration": duration[i],
+        } for i in range(len(self))]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def take(self, order):
+        """
+        Returns the entries at the given indices (an index array or boolean mask), in that order.
+        """
+        order = np.arange(len(self))[order]
+        return Schedule(self.entries[order], self.machines,
+                        [self.scan_id[i] for i in order],
+                        [self.patient_id[i] for i in order],
+                        [self.scan_type[i] for i in order])
+
+    def concat(self, other):
+        """
+        Appends other to this schedule.
+        """
+        if other.machines != self.machines:
+            names = self.machines + other.machines
+            return self.with_machines(names).concat(other.with_machines(names))
+        return Schedule(np.concatenate([self.entries, other.entries]), self.machines,
+                        self.scan_id + other.scan_id,
+                        self.patient_id + other.patient_id,
+                        self.scan_type + other.scan_type)
+
+    def sorted(self):
+        """
+        Sorted by machine, then start time; entries that tie keep their order.
+        """
+        return self.take(np.lexsort((self.entries["start"], self.entries["machine"])))
+
+    def with_machines(self, names):
+        """
+        Returns the schedule with names added to its machine list (which stays sorted).
+        """
+        machines = sorted(set(self.machines) | set(names))
+        remap = np.array([machines.index(m) for m in self.machines] or [0], dtype=np.int16)
+        entries = self.entries.copy()
+        entries["machine"] = remap[entries["machine"]]
+        return Schedule(entries, machines, self.scan_id, self.patient_id, self.scan_type)
+
+    def is_maintenance(self):
+        return np.array([t == "maintenance" for t in self.scan_type], dtype=bool)
+
+    def machine_runs(self):
+        """
+        For a schedule sorted by machine: yields (machine index, slice) for each machine.
+        """
+        machine = self.entries["machine"]
+        bounds = np.flatnonzero(np.diff(machine)) + 1
+        starts = np.concatenate([[0], bounds])
+        ends = np.concatenate([bounds, [len(machine)]])
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            if end > start:
+                yield int(machine[start]), slice(start, end)
+
+
+def as_schedule(schedule):
+    """
+    Accepts a Schedule or a list of entry dicts and returns a Schedule.
+    """
+    return schedule if isinstance(schedule, Schedule) else Schedule.from_records(schedule)
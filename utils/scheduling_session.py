@@ -0,0 +1,153 @@
+import threading
+from collections import defaultdict
+from datetime import datetime
+from functools import lru_cache
+
+from config import deadline_map, scheduling_session, schedule_store
+from optimizer import load_scan_requests, prepare_scans, load_existing_schedule, solve_scans, save_schedule
+from schedule_store import ScheduleConflict, default_schedule_path
+from solver_profile import SolverProfile
+from utils import datetime_to_minutes, minutes_to_datetime
+
+
+class SchedulingSession:
+    """
+    Keeps the pending scan backlog and its last solution between optimization requests.
+    A re-solve only frees the scans the new requests can reach: those of the same modality
+    whose last slot lies between a new scan's check-in and its latest end (widened by
+    config.scheduling_session["free_margin"] minutes). Every other scan keeps its slot as a
+    fixed interval, so the model only holds the free scans, hinted with their last machine and
+    start, and the search stops once the new scans fit in at least as well as the hints allow.
+    If the fixed slots leave no room, the whole backlog is re-solved with hints only.
+    """
+
+    def __init__(self, schedule_csv_path=None, fix_untouched=True, profile=None):
+        self.schedule_csv_path = schedule_csv_path
+        self.fix_untouched = fix_untouched
+        self.profile = profile
+        self.solve_info = {}
+        self.backlog = {}   # scan_id -> scan record
+        self.solution = {}  # scan_id -> (machine, start minutes, reference datetime)
+        self.lock = threading.Lock()
+
+    def add_scans(self, scans):
+        """
+        Adds the scans in the CSV string to the backlog and re-solves it.
+        Returns the solved backlog, or None if no solution was found.
+        """
+        new_scans, _ = load_scan_requests(scans)
+        with self.lock:
+            for s in new_scans:
+                self.backlog[s["scan_id"]] = s
+                self.solution.pop(s["scan_id"], None)
+            return self.solve()
+
+    def solve(self):
+        """
+        Re-solves the backlog around the saved schedule and saves it. If another writer saves the
+        schedule meanwhile, the solve is repeated on the new schedule (config.schedule_store["max_retries"]).
+        """
+        for attempt in range(schedule_store["max_retries"] + 1):
+            try:
+                return self._solve_and_save()
+            except ScheduleConflict:
+                if attempt == schedule_store["max_retries"]:
+                    raise
+
+    def _solve_and_save(self):
+        existing_schedule, locked_ids, snapshot = [], set(), {}
+        if self.schedule_csv_path:
+            existing_schedule, _, locked_ids = load_existing_schedule(self.schedule_csv_path, datetime.now(), snapshot)
+
+        # Scans that entered the 48-hour lock are no longer ours to move.
+        for s_id in locked_ids:
+            self.backlog.pop(s_id, None)
+            self.solution.pop(s_id, None)
+
+        scans_data, reference_datetime = prepare_scans(list(self.backlog.values()))
+        if not scans_data:
+            return []
+
+        # Saved scans outside the backlog keep their slot (see save_schedule)
+        others = [row for row in existing_schedule if row["scan_id"] not in self.backlog]
+        earliest = reference_datetime.strftime("%Y-%m-%d %H:%M")
+        fixed_schedule = [row for row in others if row["end_time"] > earliest]
+
+        previous = {}  # scan_id -> (machine, start minutes from reference_datetime)
+        for s_id, (machine, start, previous_reference) in self.solution.items():
+            previous[s_id] = (machine, start + int((previous_reference - reference_datetime).total_seconds() // 60))
+
+        kept = self._unreachable(scans_data, previous) if self.fix_untouched else set()
+        new_schedule = self._solve(scans_data, fixed_schedule, reference_datetime, previous, kept)
+        if new_schedule is None and kept:
+            # The kept slots leave the new scans no room; fall back to hints only.
+            new_schedule = self._solve(scans_data, fixed_schedule, reference_datetime, previous, set())
+        if new_schedule is None:
+            return None
+
+        if self.schedule_csv_path:
+            save_schedule(others, new_schedule, self.schedule_csv_path, expected_version=snapshot["version"])
+        for entry in new_schedule:
+            self.solution[entry["scan_id"]] = (
+                entry["machine"], datetime_to_minutes(entry["start_time"], reference_datetime), reference_datetime)
+        return new_schedule
+
+    def _unreachable(self, scans_data, previous):
+        """
+        Scan ids of the solved scans that no unsolved scan of their modality can reach.
+        """
+        horizon = max(s["check_in_mins"] for s in scans_data) + 1440
+        margin = scheduling_session["free_margin"]
+        reach = defaultdict(list)  # scan type -> [(lo, hi)] minutes the unsolved scans may occupy
+        for s in scans_data:
+            if s["scan_id"] not in previous:
+                latest_end = s["check_in_mins"] + deadline_map.get(s["priority"], horizon) + int(s["duration"])
+                reach[s["scan_type"]].append((s["check_in_mins"] - margin, latest_end + margin))
+
+        kept = set()
+        for s in scans_data:
+            if s["scan_id"] in previous:
+                _, start = previous[s["scan_id"]]
+                end = start + int(s["duration"])
+                if not any(lo < end and start < hi for lo, hi in reach[s["scan_type"]]):
+                    kept.add(s["scan_id"])
+        return kept
+
+    def _solve(self, scans_data, fixed_schedule, reference_datetime, previous, kept):
+        # Kept scans become fixed intervals; their patients' other scans must not overlap them
+        kept_entries = []
+        busy = defaultdict(list)
+        for s in scans_data:
+            if s["scan_id"] in kept:
+                machine, start = previous[s["scan_id"]]
+                end = start + int(s["duration"])
+                kept_entries.append({
+                    "scan_id": s["scan_id"],
+                    "patient_id": s["patient_id"],
+                    "scan_type": s["scan_type"],
+                    "machine": machine,
+                    "start_time": minutes_to_datetime(start, reference_datetime),
+                    "end_time": minutes_to_datetime(end, reference_datetime),
+                    "priority": s["priority"],
+                    "duration": s["duration"]
+                })
+                busy[s["patient_id"]].append((start, end))
+
+        free_scans = [s for s in scans_data if s["scan_id"] not in kept]
+        blocked = {s["scan_id"]: busy[s["patient_id"]] for s in free_scans if s["patient_id"] in busy}
+        hints = {s["scan_id"]: previous[s["scan_id"]] for s in free_scans if s["scan_id"] in previous}
+        self.solve_info = {"free_scans": len(free_scans)}
+        schedule = solve_scans(free_scans, fixed_schedule + kept_entries, reference_datetime, self.profile,
+                               self.solve_info, hints, blocked, stop_at_hints=bool(hints))
+        if schedule is None:
+            return None
+        by_id = {entry["scan_id"]: entry for entry in schedule + kept_entries}
+        return [by_id[s["scan_id"]] for s in scans_data]
+
+
+@lru_cache(maxsize=None)
+def get_scheduling_session():
+    """
+    The session of this process, saving to the configured schedule (schedule_store.default_schedule_path).
+    """
+    return SchedulingSession(default_schedule_path(), profile=SolverProfile.from_config("optimize"))
@@ -0,0 +1,105 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from config import session_store
+
+
+class MemorySessionStore:
+    """
+    In-process session store: an LRU of at most max_sessions entries that expire ttl_seconds
+    after their last update. Only shared by the requests of one worker process.
+    """
+
+    def __init__(self, ttl_seconds=3600, max_sessions=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()  # session_id -> (updated, values)
+        self.lock = threading.Lock()
+
+    def get(self, session_id):
+        """
+        Returns the values stored for the session, or an empty dict if unknown or expired.
+        """
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            if entry is None:
+                return {}
+            updated, values = entry
+            if time.time() - updated > self.ttl_seconds:
+                del self.sessions[session_id]
+                return {}
+            self.sessions.move_to_end(session_id)
+            return dict(values)
+
+    def update(self, session_id, **values):
+        with self.lock:
+            _, current = self.sessions.pop(session_id, (None, {}))
+            current.update(values)
+            self.sessions[session_id] = (time.time(), current)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+
+
+class SQLiteSessionStore:
+    """
+    Session store in a SQLite file, shared by every worker process on the host.
+    Each call opens its own connection, so it is safe across threads and processes.
+    """
+
+    def __init__(self, path, ttl_seconds=3600, max_sessions=10000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions "
+                         "(session_id TEXT PRIMARY KEY, updated REAL NOT NULL, data TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, session_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM sessions WHERE session_id = ? AND updated >= ?",
+                               (session_id, time.time() - self.ttl_seconds)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def update(self, session_id, **values):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT data FROM sessions WHERE session_id = ? AND updated >= ?",
+                               (session_id, now - self.ttl_seconds)).fetchone()
+            current = json.loads(row[0]) if row else {}
+            current.update(values)
+            conn.execute("INSERT OR REPLACE INTO sessions (session_id, updated, data) VALUES (?, ?, ?)",
+                         (session_id, now, json.dumps(current)))
+            conn.execute("DELETE FROM sessions WHERE updated < ?", (now - self.ttl_seconds,))
+            conn.execute("DELETE FROM sessions WHERE session_id NOT IN "
+                         "(SELECT session_id FROM sessions ORDER BY updated DESC LIMIT ?)", (self.max_sessions,))
+
+
+def open_session_store(url=None):
+    """
+    Opens the store named by url (default: $SESSION_STORE or config.session_store["url"]):
+    "memory" for the in-process LRU, or "sqlite:///path/to/sessions.db" for the shared backend.
+    """
+    url = url or os.getenv("SESSION_STORE") or session_store["url"]
+    options = {"ttl_seconds": session_store["ttl_seconds"], "max_sessions": session_store["max_sessions"]}
+    if url == "memory":
+        return MemorySessionStore(**options)
+    if url.startswith("sqlite:///"):
+        return SQLiteSessionStore(url[len("sqlite:///"):], **options)
+    raise ValueError(f"Unknown session store {url!r}")
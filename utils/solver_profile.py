@@ -0,0 +1,71 @@
+from config import solver_profiles
+
+
+class SolverProfile:
+    """
+    CP-SAT search settings for one solve: time limit (seconds), number of search workers,
+    relative gap at which to stop early, random seed and an optional log callback.
+    progress_callback, if set, receives every improving solution (see model_builder.SolutionProgress).
+    Unset values keep the CP-SAT defaults.
+    """
+
+    def __init__(self, time_limit=None, num_workers=None, relative_gap=None, random_seed=None,
+                 log_callback=None, progress_callback=None):
+        self.time_limit = time_limit
+        self.num_workers = num_workers
+        self.relative_gap = relative_gap
+        self.random_seed = random_seed
+        self.log_callback = log_callback
+        self.progress_callback = progress_callback
+
+    @classmethod
+    def from_config(cls, name="default", **overrides):
+        """
+        Builds the named profile from config.solver_profiles; overrides that are None are ignored.
+        """
+        settings = dict(solver_profiles.get(name, solver_profiles["default"]))
+        settings.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(**settings)
+
+    def replace(self, **changes):
+        settings = dict(vars(self))
+        settings.update(changes)
+        return SolverProfile(**settings)
+
+    def apply(self, solver):
+        if self.time_limit is not None:
+            solver.parameters.max_time_in_seconds = self.time_limit
+        if self.num_workers is not None:
+            solver.parameters.num_search_workers = self.num_workers
+        if self.relative_gap is not None:
+            solver.parameters.relative_gap_limit = self.relative_gap
+        if self.random_seed is not None:
+            solver.parameters.random_seed = self.random_seed
+        if self.log_callback is not None:
+            solver.parameters.log_search_progress = True
+            solver.parameters.log_to_stdout = False
+            solver.log_callback = self.log_callback
+        return solver
+
+
+def combine_solve_info(infos):
+    """
+    Merges the solve info of independently solved parts (windows, modalities) into one summary.
+    """
+    infos = [info for info in infos if info]
+    if not infos:
+        return {}
+    objective = sum(info["objective"] for info in infos)
+    bound = sum(info["bound"] for info in infos)
+    return {
+        "status": "OPTIMAL" if all(info["status"] == "OPTIMAL" for info in infos) else "FEASIBLE",
+        "objective": objective,
+        "bound": bound,
+        "gap": relative_gap(objective, bound),
+        "wall_time": sum(info["wall_time"] for info in infos),
+        "build_time": sum(info.get("build_time", 0) for info in infos),
+    }
+
+
+def relative_gap(objective, bound):
+    return abs(bound - objective) / max(1.0, abs(objective))
@@ -1,16 +1,17 @@
 #code partly developed from gpt 
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.chat_models import ChatOpenAI
-from langchain_pinecone import PineconeVectorStore
 import io
 import csv
+import functools
 import os
 import random
+import threading
 from dotenv import load_dotenv
 from langchain.chains import ConversationalRetrievalChain
+
+from config import rag, rag_cache, local_extraction
+from extraction_cache import ExtractionCache
+from local_extractor import get_local_extractor
 load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-pc_key  =  os.getenv("PINECONE_API_KEY")
 HARDCODED_SCAN_ID = 'S' + str(random.randint(0, 9))
 HARDCODED_DURATION = (random.randint(15, 60))
 HARDCODED_PATIENT_ID =random.randint(0, 9)
@@ -53,29 +54,111 @@ def convert_output_to_csv(old_output):
     print(output.getvalue())
     return output.getvalue()
 
-def search_with_rag(index_name, input_text):
-    
+# Answers the chat model of the local backend returns, in turn
+LOCAL_ANSWERS = ["Head,Acute stroke,P1,24,MRI"]
+
+_chains = {}
+_chains_lock = threading.Lock()
+_http_client = None
+extraction_cache = ExtractionCache(**rag_cache)
+
+
+def _build_openai_chain(index_name):
     """
-    stateful rag function
-    Inputs: string pinecone index name for target and string prompt text.
-    Output: Generated CSV string.
+    OpenAI chat model and embeddings over one pooled HTTP client, retrieving from Pinecone.
     """
-    load_dotenv()
+    global _http_client
+    import httpx
+    from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+    from langchain_pinecone import PineconeVectorStore
+
     api_key = os.getenv("OPENAI_API_KEY")
-    pc_key  =  os.getenv("PINECONE_API_KEY")
-    chat_history = []
-    embeddings = OpenAIEmbeddings(api_key=api_key)
+    pc_key = os.getenv("PINECONE_API_KEY")
+    if _http_client is None:
+        _http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=rag["max_connections"],
+                                max_keepalive_connections=rag["max_connections"]),
+            timeout=rag["timeout"],
+        )
+    embeddings = OpenAIEmbeddings(api_key=api_key, http_client=_http_client)
     vectorstore = PineconeVectorStore(
         index_name=index_name,
         embedding=embeddings,
         pinecone_api_key=pc_key
     )
+    chat = ChatOpenAI(verbose=True, temperature=0, model_name=rag["model"], api_key=api_key,
+                      http_client=_http_client)
+    return ConversationalRetrievalChain.from_llm(
+        llm=chat, chain_type="stuff", retriever=vectorstore.as_retriever()
+    )
+
 
-    chat = ChatOpenAI(verbose=True, temperature=0, model_name="gpt-4o-mini", api_key=api_key)
+def _build_local_chain(index_name):
+    """
+    The same chain over a fake chat model and an in-memory store, for tests and offline benchmarks.
+    """
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from langchain_core.language_models import FakeListChatModel
+    from langchain_core.vectorstores import InMemoryVectorStore
 
-    qa = ConversationalRetrievalChain.from_llm(
+    vectorstore = InMemoryVectorStore.from_texts(get_local_extractor().documents(),
+                                                 DeterministicFakeEmbedding(size=256))
+    chat = FakeListChatModel(responses=LOCAL_ANSWERS)
+    return ConversationalRetrievalChain.from_llm(
         llm=chat, chain_type="stuff", retriever=vectorstore.as_retriever()
     )
+
+
+def build_chain(index_name, backend=None):
+    """
+    Builds a new retrieval chain for index_name with the given backend ("openai" or "local",
+    default: $RAG_BACKEND or config.rag["backend"]).
+    """
+    backend = backend or os.getenv("RAG_BACKEND") or rag["backend"]
+    if backend == "local":
+        return _build_local_chain(index_name)
+    if backend == "openai":
+        return _build_openai_chain(index_name)
+    raise ValueError(f"Unknown RAG backend {backend!r}")
+
+
+def get_chain(index_name, backend=None):
+    """
+    Returns the retrieval chain for index_name, built on first use and then shared by every
+    request of this process. The chain keeps no state between calls (chat history is passed in).
+    """
+    key = (index_name, backend or os.getenv("RAG_BACKEND") or rag["backend"])
+    chain = _chains.get(key)
+    if chain is None:
+        with _chains_lock:
+            chain = _chains.get(key)
+            if chain is None:
+                chain = _chains[key] = build_chain(*key)
+    return chain
+
+
+def extract_scan_fields(index_name, input_text, backend=None):
+    """
+    Returns the raw "location,desc,index,time,mach" answer for the transcript, from the
+    extraction cache when the same (or, with near hits enabled, a very similar) dictation was
+    seen before, otherwise from the retrieval chain. Transcripts the local rules classify with
+    enough confidence never reach either.
+    """
+    if local_extraction["enabled"]:
+        answer, confidence = get_local_extractor().extract(input_text)
+        if answer is not None and confidence >= local_extraction["min_confidence"]:
+            return answer
+
+    chat_history = []
+    qa = get_chain(index_name, backend)
+    embed = None
+    if rag_cache["similarity_threshold"] is not None:
+        # Memoized so a miss embeds the transcript once for both get and put
+        embed = functools.lru_cache(maxsize=1)(qa.retriever.vectorstore.embeddings.embed_query)
+    cached = extraction_cache.get(index_name, input_text, embed)
+    if cached is not None:
+        return cached
+
     #prompt was improved using gpt to run faster and more reliably for the new whisper api
     prompt = (
     "Extract the following information from the provided text: \n"
@@ -93,9 +176,22 @@ def search_with_rag(index_name, input_text):
     )
     prompt += input_text
 
-    res = qa({"question": prompt, "chat_history": chat_history})
+    res = qa.invoke({"question": prompt, "chat_history": chat_history})
+    answer = res["answer"]
+    # Only well-formed answers are cached; anything else goes on to fail in convert_output_to_csv
+    if len(answer.split(",")) >= 5:
+        extraction_cache.put(index_name, input_text, answer, embed)
+    return answer
+
+
+def search_with_rag(index_name, input_text, backend=None):
     
-    old_output = res["answer"]
+    """
+    stateful rag function
+    Inputs: string pinecone index name for target and string prompt text.
+    Output: Generated CSV string.
+    """
+    old_output = extract_scan_fields(index_name, input_text, backend)
     
     csv_result = convert_output_to_csv(old_output)
     print("\nCSV Output:")
@@ -103,4 +199,3 @@ def search_with_rag(index_name, input_text):
     print("\nCSV Output complete:")
     
     return csv_result
-
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+UTILS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules in utils/ import each other by bare name, as when run from that directory
+sys.path.insert(0, UTILS_DIR)
+
+
+@pytest.fixture(autouse=True, scope="session")
+def utils_dir_first_on_path():
+    # pytest may put the rootdir back in front after collection; spawned worker processes
+    # (modality_engine) copy sys.path and must find utils/utils.py before the utils package
+    if sys.path[0] != UTILS_DIR:
+        sys.path.insert(0, UTILS_DIR)
+    yield
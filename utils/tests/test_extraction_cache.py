@@ -0,0 +1,75 @@
+import pytest
+
+import extraction_cache
+from extraction_cache import ExtractionCache, normalize_transcript
+
+ANSWER = "ward 3,chest pain,P1,09:00,CT"
+
+
+def embed(text):
+    # Counts a few words, so transcripts differing elsewhere get the same vector
+    return [text.count(word) for word in ("ct", "mri", "chest", "head")]
+
+
+def test_hit_and_miss():
+    cache = ExtractionCache()
+    assert cache.get("triage", "CT for chest pain") is None
+    cache.put("triage", "CT for chest pain", ANSWER)
+    assert cache.get("triage", "CT for chest pain") == ANSWER
+    assert cache.get("other_index", "CT for chest pain") is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "near_hits": 0, "misses": 2, "hit_rate": 1 / 3}
+
+
+def test_key_ignores_case_and_punctuation():
+    assert normalize_transcript("  CT, for chest-pain!\n") == "ct for chest pain"
+    cache = ExtractionCache()
+    cache.put("triage", "CT for chest pain.", ANSWER)
+    assert cache.get("triage", "ct  for chest, pain") == ANSWER
+
+
+def test_entry_expires_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(extraction_cache.time, "time", lambda: now[0])
+    cache = ExtractionCache(ttl_seconds=60)
+    cache.put("triage", "CT for chest pain", ANSWER)
+    now[0] += 60
+    assert cache.get("triage", "CT for chest pain") == ANSWER
+    now[0] += 1
+    assert cache.get("triage", "CT for chest pain") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ExtractionCache(max_entries=2)
+    cache.put("triage", "a", "A")
+    cache.put("triage", "b", "B")
+    cache.get("triage", "a")
+    cache.put("triage", "c", "C")
+    assert cache.get("triage", "b") is None
+    assert cache.get("triage", "a") == "A"
+    assert cache.get("triage", "c") == "C"
+
+
+def test_near_hit():
+    cache = ExtractionCache(similarity_threshold=0.95)
+    cache.put("triage", "CT for chest pain", ANSWER, embed)
+    assert cache.get("triage", "urgent CT, chest pain please", embed) == ANSWER
+    assert cache.get("triage", "MRI of the head", embed) is None
+    # Without the embedding function only exact hits count
+    assert cache.get("triage", "urgent CT, chest pain please") is None
+    assert cache.stats()["near_hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_near_hits_are_off_without_a_threshold():
+    cache = ExtractionCache()
+    cache.put("triage", "CT for chest pain", ANSWER, embed)
+    assert cache.get("triage", "urgent CT, chest pain please", embed) is None
+
+
+def test_clear():
+    cache = ExtractionCache()
+    cache.put("triage", "CT for chest pain", ANSWER)
+    cache.clear()
+    assert cache.get("triage", "CT for chest pain") is None
+    assert cache.stats()["hit_rate"] == pytest.approx(0.0)
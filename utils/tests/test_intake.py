@@ -0,0 +1,23 @@
+import io
+
+import pandas as pd
+
+from intake import read_scan_batch, validate_scan_batch
+
+HEADER = "scan_id,scan_type,duration,priority,patient_id,check_in_date,check_in_time\n"
+
+
+def test_rejects_non_numeric_patient_id():
+    batch = read_scan_batch(HEADER + "S1,CT,30,2,P7,2025-03-26,09:00\nS2,CT,30,2,8,2025-03-26,09:00\n")
+    scans_csv, report = validate_scan_batch(batch)
+
+    assert report["accepted"] == 1
+    assert report["rejected"] == [{"row": 1, "scan_id": "S1", "errors": ["patient_id must be a whole number"]}]
+    assert pd.read_csv(io.StringIO(scans_csv))["patient_id"].tolist() == [8]
+
+
+def test_rejects_missing_patient_id():
+    _, report = validate_scan_batch(read_scan_batch(HEADER + "S1,CT,30,2,,2025-03-26,09:00\n"))
+
+    assert report["accepted"] == 0
+    assert report["rejected"][0]["errors"] == ["patient_id must be a whole number"]
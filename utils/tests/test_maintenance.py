@@ -0,0 +1,31 @@
+from maintenance import bump_priority_zero
+
+
+def entry(scan_id, machine, start, end, priority, patient_id, scan_type="CT"):
+    return {"scan_id": scan_id, "patient_id": patient_id, "scan_type": scan_type, "machine": machine,
+            "start_time": f"2025-03-26 {start}", "end_time": f"2025-03-26 {end}", "priority": priority,
+            "duration": (int(end[:2]) - int(start[:2])) * 60 + int(end[3:]) - int(start[3:])}
+
+
+def test_reassigns_past_earlier_maintenance_on_the_idle_machine():
+    schedule = [
+        entry("maintenance_CT-2", "CT-2", "03:00", "04:00", 0, "Maintenance", "maintenance"),
+        entry("P0", "CT-1", "10:00", "10:30", 0, 1),
+        entry("S1", "CT-1", "10:15", "10:45", 3, 2),
+    ]
+    report = {}
+    result = {r["scan_id"]: r for r in bump_priority_zero(schedule, reassign=True, report=report)}
+
+    assert (result["S1"]["machine"], result["S1"]["start_time"]) == ("CT-2", "2025-03-26 10:15")
+    assert (report["reassigned"], report["bumped"]) == (1, 0)
+
+
+def test_bumps_past_maintenance_without_reassign():
+    schedule = [
+        entry("P0", "CT-1", "02:00", "02:50", 0, 1),
+        entry("S1", "CT-1", "02:30", "03:00", 3, 2),
+        entry("maintenance_CT-1", "CT-1", "03:00", "04:00", 0, "Maintenance", "maintenance"),
+    ]
+    result = {r["scan_id"]: r for r in bump_priority_zero(schedule)}
+
+    assert (result["S1"]["machine"], result["S1"]["start_time"]) == ("CT-1", "2025-03-26 04:00")
@@ -0,0 +1,36 @@
+import contextlib
+import io
+
+from modality_engine import solve_by_modality
+from optimizer import load_scan_requests
+from solver_profile import SolverProfile
+from utils import datetime_to_minutes
+
+HEADER = "scan_id,scan_type,duration,priority,patient_id,check_in_date,check_in_time\n"
+PROFILE = SolverProfile(time_limit=10, num_workers=1, random_seed=1)
+
+
+def intervals(schedule, reference_datetime):
+    return sorted((datetime_to_minutes(e["start_time"], reference_datetime),
+                   datetime_to_minutes(e["end_time"], reference_datetime)) for e in schedule)
+
+
+def test_remaining_patient_conflicts_fall_back_to_the_full_model():
+    scans_data, reference = load_scan_requests(
+        HEADER + "B1,CT,30,1,11,2025-03-26,09:00\nC1,MRI,30,1,11,2025-03-26,09:00\n")
+    solve_info = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        schedule = solve_by_modality(scans_data, [], reference, PROFILE, solve_info, max_repair_rounds=0)
+
+    (start1, end1), (start2, end2) = intervals(schedule, reference)
+    assert end1 <= start2
+    assert solve_info["status"] == "OPTIMAL"
+
+
+def test_locked_entry_on_another_modality_blocks_its_patient():
+    scans_data, reference = load_scan_requests(HEADER + "C1,MRI,30,1,11,2025-03-26,09:00\n")
+    locked = [{"scan_id": "B1", "patient_id": "11", "scan_type": "CT", "machine": "CT-1",
+               "start_time": "2025-03-26 09:00", "end_time": "2025-03-26 09:30", "priority": 1, "duration": 30}]
+    schedule = solve_by_modality(scans_data, locked, reference, PROFILE)
+
+    assert schedule[0]["start_time"] == "2025-03-26 09:30"
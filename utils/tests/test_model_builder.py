@@ -0,0 +1,44 @@
+from datetime import datetime
+
+import numpy as np
+
+from model_builder import SCAN_DTYPE, ScheduleModelBuilder
+from solver_profile import SolverProfile
+
+REFERENCE = datetime(2025, 3, 26, 8, 0)
+PROFILE = SolverProfile(time_limit=10, num_workers=1, random_seed=1)
+
+
+def add(builder, scans):
+    builder.add_scans([s[0] for s in scans], [s[1] for s in scans], [s[2] for s in scans],
+                      np.array([s[3:] for s in scans], dtype=SCAN_DTYPE))
+
+
+def test_priority_zero_scan_past_the_first_horizon_in_a_later_batch():
+    first = [("S1", 1, "CT", 30, 2, 0)]
+    later = [("S2", 2, "CT", 30, 0, 3000)]  # checks in after the first batch's horizon (1440)
+
+    builder = ScheduleModelBuilder(REFERENCE)
+    add(builder, first)
+    assert builder.solve(PROFILE) is not None
+    add(builder, later)
+    incremental = builder.solve(PROFILE)
+
+    single = ScheduleModelBuilder(REFERENCE)
+    add(single, first + later)
+    expected = single.solve(PROFILE)
+
+    assert incremental is not None
+    starts = {e["scan_id"]: e["start_time"] for e in incremental}
+    assert starts == {e["scan_id"]: e["start_time"] for e in expected}
+    assert starts["S2"] == "2025-03-28 10:00"
+
+
+def test_scan_starts_after_its_blocked_window():
+    builder = ScheduleModelBuilder(REFERENCE)
+    scans = [("S1", 1, "CT", 30, 2, 0)]
+    builder.add_scans(["S1"], [1], ["CT"], np.array([s[3:] for s in scans], dtype=SCAN_DTYPE),
+                      {"S1": [(0, 60)]})
+    schedule = builder.solve(PROFILE)
+
+    assert schedule[0]["start_time"] == "2025-03-26 09:00"
@@ -0,0 +1,29 @@
+import contextlib
+import io
+
+import pytest
+
+from optimizer import optimize_scan_scheduling, select_engine
+from solver_profile import SolverProfile
+
+HEADER = "scan_id,scan_type,duration,priority,patient_id,check_in_date,check_in_time\n"
+PROFILE = SolverProfile(time_limit=10, num_workers=1, random_seed=1)
+
+
+@pytest.mark.parametrize("store", ["schedule.csv", "schedule.db"])
+@pytest.mark.parametrize("engine", ["single", "rolling"])
+def test_same_patient_in_two_requests_is_not_double_booked(tmp_path, engine, store):
+    path = str(tmp_path / store)
+    # D1 runs past a maintenance window, so the saved file also holds maintenance rows
+    first = HEADER + "B1,CT,30,1,11,2025-03-26,09:00\nD1,X-Ray,30,1,12,2025-03-27,09:00\n"
+    second = HEADER + "C1,MRI,30,1,11,2025-03-26,09:00\n"
+
+    solve_info = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        optimize_scan_scheduling(first, path, select_engine([], engine), PROFILE)
+        schedule = optimize_scan_scheduling(second, path, select_engine([], engine), PROFILE, solve_info)
+
+    booked = {e["scan_id"]: e for e in schedule}
+    assert booked["B1"]["start_time"] == "2025-03-26 09:00"
+    assert booked["C1"]["start_time"] >= booked["B1"]["end_time"]
+    assert solve_info["validation"]["counts"]["patient_overlap"] == 0
@@ -0,0 +1,46 @@
+import threading
+
+import pytest
+
+from schedule_store import ScheduleConflict, SQLiteScheduleRepository, open_schedule_repository
+
+
+def entry(scan_id, start="2025-03-26 09:00", end="2025-03-26 09:30"):
+    return {"scan_id": scan_id, "patient_id": 1, "scan_type": "CT", "machine": "CT-1",
+            "start_time": start, "end_time": end, "priority": 2, "duration": 30}
+
+
+@pytest.mark.parametrize("store", ["schedule.csv", "schedule.db"])
+def test_concurrent_upserts_keep_every_row(tmp_path, store):
+    repository = open_schedule_repository(str(tmp_path / store))
+    threads = [threading.Thread(target=repository.upsert, args=([entry(f"S{i}")],)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(repository.load_frame()["scan_id"]) == sorted(f"S{i}" for i in range(20))
+
+
+@pytest.mark.parametrize("store", ["schedule.csv", "schedule.db"])
+def test_sync_rejects_a_stale_version(tmp_path, store):
+    repository = open_schedule_repository(str(tmp_path / store))
+    version = repository.version()
+    repository.upsert([entry("S1")])
+
+    with pytest.raises(ScheduleConflict):
+        repository.sync([entry("S2")], expected_version=version)
+    assert list(repository.load_frame()["scan_id"]) == ["S1"]
+
+
+def test_sqlite_schema_is_created_once_per_file(tmp_path, monkeypatch):
+    created = []
+    original = SQLiteScheduleRepository._create_schema
+    monkeypatch.setattr(SQLiteScheduleRepository, "_create_schema",
+                        lambda self: created.append(self.path) or original(self))
+    path = str(tmp_path / "schedule.db")
+    for _ in range(3):
+        open_schedule_repository(path).upsert([entry("S1")])
+
+    assert created == [path]
+    assert open_schedule_repository(path).version() == 3
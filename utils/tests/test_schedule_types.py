@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import numpy as np
+
+from schedule_types import Schedule, format_minutes, parse_minutes
+
+RECORDS = [
+    {"scan_id": "S2", "patient_id": "12", "scan_type": "MRI", "machine": "MRI1",
+     "start_time": "2025-03-26 10:15", "end_time": "2025-03-26 11:00", "priority": 1, "duration": 45},
+    {"scan_id": "maint_CT1", "patient_id": "", "scan_type": "maintenance", "machine": "CT1",
+     "start_time": "2025-03-27 03:00", "end_time": "2025-03-27 04:00", "priority": 0, "duration": 60},
+    {"scan_id": "S1", "patient_id": "11", "scan_type": "CT", "machine": "CT1",
+     "start_time": "2025-03-26 09:00", "end_time": "2025-03-26 09:30", "priority": 2, "duration": 30},
+]
+
+
+def test_records_round_trip():
+    schedule = Schedule.from_records(RECORDS)
+    assert schedule.machines == ["CT1", "MRI1"]
+    assert schedule.to_records() == RECORDS
+
+
+def test_round_trip_normalises_csv_strings():
+    # Rows read back from the CSV store carry priority and duration as strings
+    row = dict(RECORDS[0], priority="1", duration="45")
+    assert Schedule.from_records([row]).to_records() == [RECORDS[0]]
+
+
+def test_empty_schedule_round_trip():
+    schedule = Schedule.from_records([])
+    assert len(schedule) == 0
+    assert schedule.to_records() == []
+
+
+def test_minutes_conversion():
+    minutes = parse_minutes(["1970-01-01 00:00", "2025-03-26 09:00"])
+    assert minutes.dtype == np.int32
+    assert minutes[0] == 0
+    assert (parse_minutes([datetime(2025, 3, 26, 9, 0)]) == minutes[1:]).all()
+    assert format_minutes(minutes) == ["1970-01-01 00:00", "2025-03-26 09:00"]
+
+
+def test_sorted_keeps_records_with_their_entries():
+    schedule = Schedule.from_records(RECORDS).sorted()
+    assert [r["scan_id"] for r in schedule.to_records()] == ["S1", "maint_CT1", "S2"]
+    assert sorted(schedule.to_records(), key=RECORDS.index) == RECORDS
@@ -0,0 +1,90 @@
+import pytest
+
+import session_store
+from session_store import MemorySessionStore, SQLiteSessionStore, open_session_store
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store.time, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(ttl_seconds=60, max_sessions=10):
+        if request.param == "memory":
+            return MemorySessionStore(ttl_seconds, max_sessions)
+        return SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl_seconds, max_sessions)
+    return make
+
+
+def test_update_merges_values(make_store, clock):
+    store = make_store()
+    assert store.get("a") == {}
+    store.update("a", transcription="first")
+    store.update("a", schedule=[1])
+    assert store.get("a") == {"transcription": "first", "schedule": [1]}
+
+
+def test_session_expires_after_ttl(make_store, clock):
+    store = make_store(ttl_seconds=60)
+    store.update("a", transcription="first")
+    clock.now += 60
+    assert store.get("a") == {"transcription": "first"}
+    clock.now += 1
+    assert store.get("a") == {}
+    # An expired session starts over rather than merging into the stale values
+    store.update("a", schedule=[1])
+    assert store.get("a") == {"schedule": [1]}
+
+
+def test_update_refreshes_ttl(make_store, clock):
+    store = make_store(ttl_seconds=60)
+    store.update("a", transcription="first")
+    clock.now += 50
+    store.update("a", schedule=[1])
+    clock.now += 50
+    assert store.get("a") == {"transcription": "first", "schedule": [1]}
+
+
+def test_least_recently_updated_session_is_evicted(make_store, clock):
+    store = make_store(max_sessions=2)
+    for session_id in ["a", "b"]:
+        store.update(session_id, transcription=session_id)
+        clock.now += 1
+    store.update("a", schedule=[1])
+    clock.now += 1
+    store.update("c", transcription="c")
+    assert store.get("b") == {}
+    assert store.get("a") == {"transcription": "a", "schedule": [1]}
+    assert store.get("c") == {"transcription": "c"}
+
+
+def test_memory_get_counts_as_use():
+    store = MemorySessionStore(ttl_seconds=60, max_sessions=2)
+    store.update("a", transcription="a")
+    store.update("b", transcription="b")
+    store.get("a")
+    store.update("c", transcription="c")
+    assert store.get("b") == {}
+    assert store.get("a") == {"transcription": "a"}
+
+
+def test_open_session_store(tmp_path, monkeypatch):
+    monkeypatch.delenv("SESSION_STORE", raising=False)
+    assert isinstance(open_session_store("memory"), MemorySessionStore)
+    assert isinstance(open_session_store(f"sqlite:///{tmp_path / 'sessions.db'}"), SQLiteSessionStore)
+    monkeypatch.setenv("SESSION_STORE", f"sqlite:///{tmp_path / 'env.db'}")
+    assert isinstance(open_session_store(), SQLiteSessionStore)
+    with pytest.raises(ValueError):
+        open_session_store("redis://localhost")
@@ -0,0 +1,124 @@
+from validation import validate_schedule
+
+
+def entry(scan_id, patient_id, machine, start_time, end_time, scan_type="CT", priority=2):
+    return {
+        "scan_id": scan_id,
+        "patient_id": patient_id,
+        "scan_type": scan_type,
+        "machine": machine,
+        "start_time": start_time,
+        "end_time": end_time,
+        "priority": priority,
+        "duration": 30,
+    }
+
+
+def maintenance(machine, start_time, end_time):
+    return entry(f"maint_{machine}", "", machine, start_time, end_time, scan_type="maintenance", priority=0)
+
+
+def test_clean_schedule_is_valid():
+    report = validate_schedule([
+        entry("S1", 1, "CT1", "2025-03-26 09:00", "2025-03-26 09:30"),
+        entry("S2", 1, "CT1", "2025-03-26 09:30", "2025-03-26 10:00"),
+        entry("S3", 2, "CT2", "2025-03-26 09:00", "2025-03-26 09:30"),
+    ])
+    assert report["valid"]
+    assert report["conflicts"] == []
+    assert set(report["counts"].values()) == {0}
+
+
+def test_machine_overlap():
+    report = validate_schedule([
+        entry("S1", 1, "CT1", "2025-03-26 09:00", "2025-03-26 09:30"),
+        entry("S2", 2, "CT1", "2025-03-26 09:20", "2025-03-26 09:50"),
+        entry("S3", 3, "CT2", "2025-03-26 09:20", "2025-03-26 09:50"),
+    ])
+    assert not report["valid"]
+    assert report["counts"]["machine_overlap"] == 1
+    assert report["conflicts"] == [{
+        "type": "machine_overlap",
+        "machine": "CT1",
+        "scan_id": "S1",
+        "other_scan_id": "S2",
+        "start_time": "2025-03-26 09:20",
+        "overlap_minutes": 10,
+    }]
+
+
+def test_maintenance_overlap_counts_as_machine_overlap():
+    report = validate_schedule([
+        maintenance("CT1", "2025-03-26 03:00", "2025-03-26 04:00"),
+        entry("S1", 1, "CT1", "2025-03-26 03:30", "2025-03-26 04:00"),
+    ])
+    assert report["counts"]["machine_overlap"] == 1
+    assert report["counts"]["patient_overlap"] == 0
+
+
+def test_patient_overlap_across_machines():
+    report = validate_schedule([
+        entry("S1", 7, "CT1", "2025-03-26 09:00", "2025-03-26 09:30"),
+        entry("S2", "7", "MRI1", "2025-03-26 09:15", "2025-03-26 09:45", scan_type="MRI"),
+    ])
+    assert report["counts"] == {"machine_overlap": 0, "patient_overlap": 1, "deadline": 0, "maintenance_gap": 0}
+    conflict, = report["conflicts"]
+    assert conflict["patient_id"] == "7"
+    assert (conflict["scan_id"], conflict["other_scan_id"]) == ("S1", "S2")
+    assert conflict["overlap_minutes"] == 15
+
+
+def test_missed_deadline():
+    schedule = [
+        entry("S1", 1, "CT1", "2025-03-27 10:00", "2025-03-27 10:30", priority=1),
+        entry("S2", 2, "CT2", "2025-03-27 08:00", "2025-03-27 08:30", priority=1),
+        entry("S3", 3, "CT1", "2025-04-01 09:00", "2025-04-01 09:30", priority=0),
+    ]
+    check_ins = {"S1": "2025-03-26 09:00", "S2": "2025-03-26 09:00", "S3": "2025-03-26 09:00"}
+    report = validate_schedule(schedule, check_ins)
+    # Priority 1 must start within 1440 minutes; Priority 0 has no deadline
+    assert report["counts"]["deadline"] == 1
+    deadline = [c for c in report["conflicts"] if c["type"] == "deadline"]
+    assert deadline == [{
+        "type": "deadline",
+        "scan_id": "S1",
+        "priority": 1,
+        "start_time": "2025-03-27 10:00",
+        "late_minutes": 60,
+    }]
+
+
+def test_deadline_is_skipped_without_check_ins():
+    report = validate_schedule([entry("S1", 1, "CT1", "2025-04-30 10:00", "2025-04-30 10:30", priority=1)])
+    assert report["counts"]["deadline"] == 0
+
+
+def test_maintenance_gap():
+    report = validate_schedule([
+        maintenance("CT1", "2025-03-26 03:00", "2025-03-26 04:00"),
+        entry("S1", 1, "CT1", "2025-03-26 09:00", "2025-03-26 09:30"),
+        entry("S2", 2, "CT1", "2025-03-27 03:30", "2025-03-27 04:30"),
+        maintenance("CT2", "2025-03-26 03:00", "2025-03-26 04:00"),
+        maintenance("CT2", "2025-03-27 03:00", "2025-03-27 04:00"),
+        entry("S3", 3, "CT2", "2025-03-27 09:00", "2025-03-27 09:30"),
+    ])
+    assert report["counts"]["maintenance_gap"] == 1
+    gap = [c for c in report["conflicts"] if c["type"] == "maintenance_gap"]
+    assert gap == [{
+        "type": "maintenance_gap",
+        "machine": "CT1",
+        "scan_id": "S2",
+        "start_time": "2025-03-27 03:30",
+        "minutes_since_maintenance": 1470,
+    }]
+
+
+def test_maintenance_gap_without_maintenance_counts_from_the_first_entry():
+    report = validate_schedule([
+        entry("S1", 1, "CT1", "2025-03-26 09:00", "2025-03-26 09:30"),
+        entry("S2", 2, "CT1", "2025-03-27 08:30", "2025-03-27 09:00"),
+        entry("S3", 3, "CT1", "2025-03-27 09:00", "2025-03-27 09:30"),
+    ])
+    # S2 ends exactly max_interval (1440) minutes after S1 started, which is still allowed
+    assert [c["scan_id"] for c in report["conflicts"]] == ["S3"]
+    assert report["conflicts"][0]["minutes_since_maintenance"] == 1470
@@ -0,0 +1,31 @@
+import threading
+
+import visualizer
+from schedule_types import Schedule
+
+
+def schedule(scan_id):
+    return Schedule.from_records([{"scan_id": scan_id, "patient_id": 1, "scan_type": "CT", "machine": "CT-1",
+                                   "start_time": "2025-03-26 09:00", "end_time": "2025-03-26 09:30",
+                                   "priority": 2, "duration": 30}])
+
+
+def test_queued_renders_are_coalesced_to_the_newest_schedule(monkeypatch):
+    started, release, drawn = threading.Event(), threading.Event(), []
+
+    def plot(sched, force=False):
+        started.set()
+        release.wait(5)
+        drawn.append(list(sched.scan_id))
+        return []
+
+    monkeypatch.setattr(visualizer, "plot_schedule_by_day", plot)
+    running = visualizer.plot_schedule_in_background(schedule("S1"))
+    started.wait(5)
+    queued = [visualizer.plot_schedule_in_background(schedule(s_id)) for s_id in ("S2", "S3", "S4")]
+    release.set()
+    running.result(5)
+    queued[0].result(5)
+
+    assert queued[0] is queued[1] is queued[2]
+    assert drawn == [["S1"], ["S4"]]
@@ -0,0 +1,124 @@
+import asyncio
+import os
+from functools import lru_cache
+
+from audio_preprocess import preprocess_audio
+from config import transcription
+
+MIME_TYPES = {".ogg": "audio/ogg", ".wav": "audio/wav", ".flac": "audio/flac", ".mp3": "audio/mpeg"}
+
+
+def mime_type(filename):
+    """
+    MIME type sent with the upload, from the file extension (browsers record webm by default).
+    """
+    return MIME_TYPES.get(os.path.splitext(filename.lower())[1], "audio/webm")
+
+
+class OpenAITranscriber:
+    """
+    whisper-1 through one AsyncOpenAI client, so concurrent uploads share its connection pool.
+    """
+
+    def __init__(self, model, timeout, max_retries):
+        from dotenv import load_dotenv
+        from openai import AsyncOpenAI
+
+        load_dotenv()
+        self.model = model
+        self.max_retries = max_retries
+        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=timeout, max_retries=max_retries)
+
+    async def transcribe(self, audio, filename):
+        """
+        audio is bytes or a file object; a file object is read in chunks while it is sent.
+        """
+        if isinstance(audio, bytes):
+            return await self._create(self.client, audio, filename)
+
+        import openai
+
+        # The client's own retries would resend the file from where the last attempt stopped
+        client = self.client.with_options(max_retries=0)
+        for attempt in range(self.max_retries + 1):
+            audio.seek(0)
+            try:
+                return await self._create(client, audio, filename)
+            except (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError):
+                if attempt == self.max_retries:
+                    raise
+
+    async def _create(self, client, audio, filename):
+        transcript = await client.audio.transcriptions.create(
+            model=self.model, file=(filename, audio, mime_type(filename))
+        )
+        return transcript.text
+
+    async def aclose(self):
+        await self.client.close()
+
+
+class LocalTranscriber:
+    """
+    Stand-in for the API: waits latency seconds (without blocking the event loop) and returns text.
+    """
+
+    def __init__(self, text, latency=0.0):
+        self.text = text
+        self.latency = latency
+
+    async def transcribe(self, audio, filename):
+        await asyncio.sleep(self.latency)
+        return self.text
+
+    async def aclose(self):
+        pass
+
+
+class TranscriptionService:
+    """
+    Transcribes uploads on the event loop: at most max_concurrent at once (the rest wait their
+    turn instead of opening more connections), each cut off after timeout seconds.
+    """
+
+    def __init__(self, backend, max_concurrent, timeout):
+        self.backend = backend
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def transcribe(self, audio, filename="audio.webm"):
+        """
+        Returns the text of audio, bytes or a file object. Bytes are preprocessed in a worker thread
+        (audio_preprocess.preprocess_audio) first; file objects (spooled streaming uploads) are
+        sent to the backend from the file as they are, so a long recording is never held in
+        memory. Raises asyncio.TimeoutError when the backend takes longer than the timeout.
+        """
+        if isinstance(audio, (bytes, bytearray)):
+            audio, filename = await asyncio.to_thread(preprocess_audio, bytes(audio), filename)
+        else:
+            audio.seek(0)
+        async with self.semaphore:
+            return await asyncio.wait_for(self.backend.transcribe(audio, filename), self.timeout)
+
+    async def aclose(self):
+        await self.backend.aclose()
+
+
+def build_transcriber(backend=None):
+    """
+    The backend named by backend, $TRANSCRIPTION_BACKEND or config.transcription["backend"].
+    """
+    backend = backend or os.getenv("TRANSCRIPTION_BACKEND") or transcription["backend"]
+    if backend == "local":
+        return LocalTranscriber(transcription["local_text"], transcription["local_latency"])
+    if backend == "openai":
+        return OpenAITranscriber(transcription["model"], transcription["timeout"], transcription["max_retries"])
+    raise ValueError(f"Unknown transcription backend {backend!r}")
+
+
+@lru_cache(maxsize=None)
+def get_transcription_service(backend=None):
+    """
+    The service for backend, built once per process.
+    """
+    return TranscriptionService(build_transcriber(backend), transcription["max_concurrent"], transcription["timeout"])
@@ -1,6 +1,5 @@
 from datetime import datetime, timedelta
-import pandas as pd
-import os
+from functools import lru_cache
 
 def time_to_minutes(t_str):
     h, m = map(int, t_str.split(":"))
@@ -10,6 +9,10 @@ def minutes_to_datetime(m, reference):
     dt = reference + timedelta(minutes=m)
     return dt.strftime("%Y-%m-%d %H:%M")
 
+def datetime_to_minutes(dt_str, reference):
+    dt = datetime.strptime(dt_str, "%Y-%m-%d %H:%M")
+    return int((dt - reference).total_seconds() // 60)
+
 def is_non_peak(minute_of_day):
     return minute_of_day <= 239 or minute_of_day >= 1200  # 4am–8pm
 
@@ -24,36 +27,55 @@ def print_schedule(schedule):
               f"(Priority {int(entry['priority'])})")
 
 def append_new_scans_to_schedule(cleaned_schedule, schedule_csv_path):
-    if os.path.exists(schedule_csv_path):
-        existing_df = pd.read_csv(schedule_csv_path)
-        existing_ids = set(existing_df['scan_id'].astype(str))
-        new_df = pd.DataFrame(cleaned_schedule)
-        new_df = new_df[~new_df['scan_id'].astype(str).isin(existing_ids)]
-        final_df = pd.concat([existing_df, new_df], ignore_index=True)
-    else:
-        final_df = pd.DataFrame(cleaned_schedule)
+    from schedule_store import open_schedule_repository
 
-    final_df.to_csv(schedule_csv_path, index=False)
+    open_schedule_repository(schedule_csv_path).insert_new(cleaned_schedule)
 
 def check_for_overlaps(schedule):
-    from collections import defaultdict
+    """
+    Prints the machine overlaps found by validation.validate_schedule and returns its report.
+    """
+    from validation import validate_schedule
 
-    machine_sched = defaultdict(list)
-    for entry in schedule:
-        start = datetime.strptime(entry['start_time'], "%Y-%m-%d %H:%M")
-        end = datetime.strptime(entry['end_time'], "%Y-%m-%d %H:%M")
-        machine_sched[entry["machine"]].append((start, end, entry['patient_id'], entry['scan_id']))
-
-    for machine, times in machine_sched.items():
-        times.sort()
-        for i in range(len(times) - 1):
-            _, end1, _, id1 = times[i]
-            start2, _, _, id2 = times[i + 1]
-            if start2 < end1:
-                print(f"Problem: Overlap on {machine}: Scan {id1} overlaps with {id2}")
+    report = validate_schedule(schedule)
+    for conflict in report["conflicts"]:
+        if conflict["type"] == "machine_overlap":
+            print(f"Problem: Overlap on {conflict['machine']}: "
+                  f"Scan {conflict['scan_id']} overlaps with {conflict['other_scan_id']}")
+    return report
 
 def is_non_peak(minute_of_day):
     """
     Returns True if the given minute (from midnight) falls in non-peak hours (8pm–4am).
     """
     return minute_of_day <= 239 or minute_of_day >= 1200
+
+@lru_cache(maxsize=None)
+def peak_windows():
+    """
+    Returns the (first, last) minute-of-day runs that are not non-peak, compiled from is_non_peak.
+    """
+    windows = []
+    for minute in range(1440):
+        if is_non_peak(minute):
+            continue
+        if windows and windows[-1][1] == minute - 1:
+            windows[-1][1] = minute
+        else:
+            windows.append([minute, minute])
+    return [tuple(w) for w in windows]
+
+def peak_intervals(lo, hi, reference):
+    """
+    Returns the [start, end] minute offsets from reference, clipped to [lo, hi], that fall in
+    peak hours of the wall clock. Used as the start domain of low-priority scans.
+    """
+    offset = reference.hour * 60 + reference.minute
+    intervals = []
+    for day in range((lo + offset) // 1440, (hi + offset) // 1440 + 1):
+        for first, last in peak_windows():
+            start = max(lo, day * 1440 + first - offset)
+            end = min(hi, day * 1440 + last - offset)
+            if start <= end:
+                intervals.append([start, end])
+    return intervals
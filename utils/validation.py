@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+from config import deadline_map, maintenance
+from schedule_types import as_schedule, format_minutes, parse_minutes
+
+
+def _running_overlaps(group, start, end):
+    """
+    For entries sorted by (group, start): returns the positions that start before an earlier
+    entry of the same group has ended, and for each the position of that (latest-ending) entry.
+    """
+    n = len(start)
+    if n < 2:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    # One int64 key per entry so a single running maximum covers every group in turn
+    key = (group.astype(np.int64) << 32) | (end.astype(np.int64) - np.iinfo(np.int32).min)
+    reach = np.maximum.accumulate(key)
+    holder = np.maximum.accumulate(np.where(key == reach, np.arange(n), 0))
+    previous_reach, previous_holder = reach[:-1], holder[:-1]
+    same_group = (previous_reach >> 32) == group[1:]
+    previous_end = (previous_reach & 0xFFFFFFFF) + np.iinfo(np.int32).min
+    later = np.flatnonzero(same_group & (start[1:] < previous_end)) + 1
+    return later, previous_holder[later - 1]
+
+
+def _overlap_conflicts(kind, label, names, sched, order, group, later, earlier):
+    starts, ends = sched.entries["start"][order], sched.entries["end"][order]
+    overlap = np.minimum(ends[later], ends[earlier]) - starts[later]
+    start_times = format_minutes(starts[later])
+    return [{
+        "type": kind,
+        label: names[group[i]],
+        "scan_id": sched.scan_id[order[j]],
+        "other_scan_id": sched.scan_id[order[i]],
+        "start_time": start_time,
+        "overlap_minutes": int(minutes),
+    } for i, j, start_time, minutes in zip(later.tolist(), earlier.tolist(), start_times, overlap.tolist())]
+
+
+def validate_schedule(schedule, check_ins=None):
+    """
+    Checks a schedule (Schedule or list of entries) in one pass over sorted integer arrays for:
+    - machine_overlap: two entries (scans or maintenance) on one machine at the same time
+    - patient_overlap: two scans of one patient at the same time
+    - deadline: a scan starting later than deadline_map allows after its check-in
+      (check_ins maps scan_id -> check-in datetime or "%Y-%m-%d %H:%M"; scans without one are skipped)
+    - maintenance_gap: a scan ending more than maintenance["max_interval"] minutes after the end of
+      the previous maintenance on its machine (or after the machine's first entry, if none)
+    Returns {"valid": bool, "counts": {type: n}, "conflicts": [dict, ...]}.
+    """
+    sched = as_schedule(schedule)
+    entries = sched.entries
+    starts, ends, machine = entries["start"], entries["end"], entries["machine"]
+    is_maintenance = sched.is_maintenance()
+    conflicts = {"machine_overlap": [], "patient_overlap": [], "deadline": [], "maintenance_gap": []}
+
+    # --- Machine overlaps ---
+    order = np.lexsort((ends, starts, machine))
+    later, earlier = _running_overlaps(machine[order], starts[order], ends[order])
+    conflicts["machine_overlap"] = _overlap_conflicts("machine_overlap", "machine", sched.machines, sched, order,
+                                                      machine[order], later, earlier)
+
+    # --- Patient double-booking ---
+    scans = np.flatnonzero(~is_maintenance)
+    patient, patients = pd.factorize(np.array([str(sched.patient_id[i]) for i in scans], dtype=object))
+    patient = patient.astype(np.int64)
+    by_patient = np.lexsort((ends[scans], starts[scans], patient))
+    order = scans[by_patient]
+    later, earlier = _running_overlaps(patient[by_patient], starts[order], ends[order])
+    conflicts["patient_overlap"] = _overlap_conflicts("patient_overlap", "patient_id", patients, sched, order,
+                                                      patient[by_patient], later, earlier)
+
+    # --- Deadlines ---
+    if check_ins:
+        known = [i for i in scans.tolist() if sched.scan_id[i] in check_ins]
+        if known:
+            known = np.array(known)
+            check_in = parse_minutes([check_ins[sched.scan_id[i]] for i in known])
+            deadline = np.array([deadline_map.get(p, -1) for p in entries["priority"][known].tolist()])
+            late = starts[known] - check_in - deadline
+            missed = (deadline >= 0) & (late > 0)
+            conflicts["deadline"] = [{
+                "type": "deadline",
+                "scan_id": sched.scan_id[i],
+                "priority": priority,
+                "start_time": start_time,
+                "late_minutes": minutes,
+            } for i, priority, start_time, minutes in zip(known[missed].tolist(),
+                                                          entries["priority"][known[missed]].tolist(),
+                                                          format_minutes(starts[known[missed]]),
+                                                          late[missed].tolist())]
+
+    # --- Maintenance cadence ---
+    if len(scans):
+        # Per machine, the last maintenance (or the first entry) at or before each scan's start
+        order = np.lexsort((~is_maintenance, starts, machine))
+        sorted_machine = machine[order]
+        first_entry = np.r_[True, sorted_machine[1:] != sorted_machine[:-1]]
+        last_mark = np.maximum.accumulate(np.where(is_maintenance[order] | first_entry, np.arange(len(order)), 0))
+        since = np.where(is_maintenance[order][last_mark], ends[order][last_mark], starts[order][last_mark])
+        gap = ends[order] - since
+        overdue = np.flatnonzero(~is_maintenance[order] & (gap > maintenance["max_interval"]))
+        conflicts["maintenance_gap"] = [{
+            "type": "maintenance_gap",
+            "machine": sched.machines[m],
+            "scan_id": sched.scan_id[i],
+            "start_time": start_time,
+            "minutes_since_maintenance": minutes,
+        } for i, m, start_time, minutes in zip(order[overdue].tolist(), machine[order[overdue]].tolist(),
+                                               format_minutes(starts[order[overdue]]), gap[overdue].tolist())]
+
+    counts = {kind: len(found) for kind, found in conflicts.items()}
+    return {
+        "valid": not any(counts.values()),
+        "counts": counts,
+        "conflicts": [conflict for found in conflicts.values() for conflict in found],
+    }
@@ -1,59 +1,132 @@
-import matplotlib.pyplot as plt
-from datetime import datetime, timedelta
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from schedule_types import as_schedule, format_minutes
 import sys
 sys.dont_write_bytecode = True
 
-def plot_schedule_by_day(schedule):
+# Rendering state shared by every call: the digest of the entries last drawn per day, the one
+# figure reused for every day, the single worker that renders off the request path and the
+# render queued on it that has not started yet ([schedule, future]).
+_rendered = {}
+_figure = None
+_render_lock = threading.RLock()
+_render_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="visualizer")
+_pending = None
+_pending_lock = threading.Lock()
+
+
+def day_digest(day_schedule):
+    """
+    Content hash of a day's entries (times, machines, priorities, ids and scan types).
+    """
+    digest = hashlib.blake2b(day_schedule.entries.tobytes(), digest_size=16)
+    for values in (day_schedule.machines, day_schedule.scan_id, day_schedule.patient_id, day_schedule.scan_type):
+        digest.update("\x1f".join(map(str, values)).encode())
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+def plot_schedule_by_day(schedule, force=False):
     """
     Groups the schedule by day (based on the date in 'start_time')
     and generates a separate visual agenda for each day, saving each as "visual_schedule_<day>.png".
+    Days whose entries are unchanged since they were last drawn (and whose image still exists)
+    are skipped unless force is set. Returns the days drawn.
     """
-    schedule_by_day = {}
-    for entry in schedule:
-        day = entry["start_time"].split()[0]
-        schedule_by_day.setdefault(day, []).append(entry)
-
-    for day, day_schedule in schedule_by_day.items():
-        plot_day_schedule(day_schedule, day)
+    sched = as_schedule(schedule).sorted()
+    days = sched.entries["start"] // 1440
+    drawn = []
+    with _render_lock:
+        for day in np.unique(days):
+            day_schedule = sched.take(days == day)
+            label = format_minutes([day * 1440])[0].split()[0]
+            digest = day_digest(day_schedule)
+            if not force and _rendered.get(label) == digest and os.path.exists(f"visual_schedule_{label}.png"):
+                continue
+            plot_day_schedule(day_schedule, label)
+            _rendered[label] = digest
+            drawn.append(label)
+    return drawn
+
+
+def plot_schedule_in_background(schedule):
+    """
+    Queues plot_schedule_by_day on the rendering worker and returns its Future, so requests do
+    not wait for matplotlib. At most one render waits behind the running one: if a render is
+    still queued, this newer schedule replaces its schedule and its Future is returned, so a
+    burst of optimizations does not draw schedules that are already stale.
+    """
+    global _pending
+    schedule = as_schedule(schedule)
+    with _pending_lock:
+        if _pending is not None:
+            _pending[0] = schedule
+            return _pending[1]
+        pending = [schedule, None]
+        pending[1] = _render_pool.submit(_render_pending, pending)
+        _pending = pending
+        return pending[1]
+
+
+def _render_pending(pending):
+    global _pending
+    with _pending_lock:
+        if _pending is pending:
+            _pending = None
+        schedule = pending[0]
+    return plot_schedule_by_day(schedule)
+
+
+def _day_figure():
+    global _figure
+    if _figure is None:
+        _figure = Figure(figsize=(12, 16))
+        FigureCanvasAgg(_figure)
+    _figure.clear()
+    return _figure
 
 
 def plot_day_schedule(day_schedule, day):
     """
     Plots the schedule for a single day in an agenda view.
     """
-    if not day_schedule:
+    day_schedule = as_schedule(day_schedule)
+    if not len(day_schedule):
         return
+    with _render_lock:
+        _draw_day(_day_figure(), day_schedule, day)
 
-    # --- Determine the time axis bounds ---
-    booked_times = []
-    for entry in day_schedule:
-        st = datetime.strptime(entry["start_time"], "%Y-%m-%d %H:%M")
-        et = datetime.strptime(entry["end_time"], "%Y-%m-%d %H:%M")
-        booked_times.extend([st, et])
-    min_booking = min(booked_times)
-    max_booking = max(booked_times)
 
-    min_booking = min_booking.replace(minute=(min_booking.minute // 5) * 5, second=0, microsecond=0)
-    total_max = max_booking.hour * 60 + max_booking.minute
-    rounded_max = ((total_max + 4) // 5) * 5
-    max_booking = max_booking.replace(hour=rounded_max // 60, minute=rounded_max % 60, second=0, microsecond=0)
+def _draw_day(fig, day_schedule, day):
+    entries = day_schedule.entries
 
-    total_intervals = ((max_booking - min_booking).seconds // (5 * 60)) + 1
-    time_intervals = [min_booking + timedelta(minutes=5 * i) for i in range(total_intervals)]
-    time_labels = [t.strftime("%H:%M") for t in time_intervals]
+    # --- Determine the time axis bounds (5-minute rows) ---
+    min_booking = int(entries["start"].min()) // 5 * 5
+    max_booking = (int(entries["end"].max()) + 4) // 5 * 5
+    total_intervals = (max_booking - min_booking) // 5 + 1
+    time_labels = [f"{(t // 60) % 24:02}:{t % 60:02}" for t in range(min_booking, max_booking + 1, 5)]
 
     # --- Machine axis ---
-    machines_order = sorted(set(entry["machine"] for entry in day_schedule))
+    used = np.unique(entries["machine"])
+    machines_order = [day_schedule.machines[i] for i in used]
+    machine_index = np.searchsorted(used, entries["machine"])
 
-    fig, ax = plt.subplots(figsize=(12, 16))
-    ax.set_yticks(range(len(time_intervals)))
+    ax = fig.add_subplot()
+    ax.set_yticks(range(total_intervals))
     ax.set_yticklabels(time_labels, fontsize=9)
     ax.set_xticks(range(len(machines_order)))
     ax.set_xticklabels(machines_order, fontsize=12)
-    ax.set_ylim(-1, len(time_intervals))
+    ax.set_ylim(-1, total_intervals)
 
-    for y in range(len(time_intervals)):
-        ax.axhline(y, color="gray", linestyle="--", linewidth=0.5, alpha=0.7)
+    ax.hlines(range(total_intervals), 0, 1, transform=ax.get_yaxis_transform(),
+              color="gray", linestyle="--", linewidth=0.5, alpha=0.7)
 
     # --- Priority color mapping ---
     priority_colors = {
@@ -65,26 +138,20 @@ def plot_day_schedule(day_schedule, day):
         5: "blue"  # Priority 5
     }
 
-    for entry in day_schedule:
-        machine = entry["machine"]
-        machine_index = machines_order.index(machine)
-        st = datetime.strptime(entry["start_time"], "%Y-%m-%d %H:%M")
-        et = datetime.strptime(entry["end_time"], "%Y-%m-%d %H:%M")
-        start_idx = int((st - min_booking).total_seconds() // (5 * 60))
-        duration_blocks = int((et - st).total_seconds() // (5 * 60))
-
-        if entry["scan_type"] == "maintenance":
-            color = "black"
-        else:
-            color = priority_colors.get(int(entry["priority"]), "gray")
+    start_idx = (entries["start"] - min_booking) // 5
+    duration_blocks = (entries["end"] - entries["start"]) // 5
+    priorities = entries["priority"].tolist()
+    colors = ["black" if scan_type == "maintenance" else priority_colors.get(priority, "gray")
+              for scan_type, priority in zip(day_schedule.scan_type, priorities)]
 
-        ax.barh(start_idx, width=0.8, height=duration_blocks, left=machine_index - 0.4,
-                color=color, edgecolor="black", alpha=0.75)
+    ax.barh(start_idx, width=0.8, height=duration_blocks, left=machine_index - 0.4,
+            color=colors, edgecolor="black", alpha=0.75)
 
-        label_text = f"{entry['patient_id']}\n{entry['scan_type']}\nP{int(entry['priority'])}"
+    for i, color in enumerate(colors):
+        label_text = f"{day_schedule.patient_id[i]}\n{day_schedule.scan_type[i]}\nP{priorities[i]}"
         text_color = "white" if color in ["black", "purple"] else "black"
 
-        ax.text(machine_index, start_idx + duration_blocks / 2,
+        ax.text(machine_index[i], start_idx[i] + duration_blocks[i] / 2,
                 label_text, ha="center", va="center", fontsize=9,
                 color=text_color, weight="bold")
 
@@ -94,4 +161,3 @@ def plot_day_schedule(day_schedule, day):
     ax.set_title(f"Scheduled Scans for {day}")
     fig.tight_layout()
     fig.savefig(f"visual_schedule_{day}.png")
-    plt.close(fig)
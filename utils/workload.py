@@ -0,0 +1,91 @@
+import csv
+import io
+import random
+from datetime import datetime, timedelta
+
+from config import machines
+from intake import SCAN_REQUEST_COLUMNS
+from maintenance import maintenance_windows
+
+
+def generate_scan_requests(n, start="2025-03-25 00:00", span_days=14, seed=0, id_prefix="S", first_id=0,
+                           priority_mix=None, modality_mix=None, hourly_rates=None, durations=None,
+                           repeat_patients=0.0):
+    """
+    Generates n synthetic scan requests spread over span_days, as a CSV string
+    in the same format the optimizer receives from the RAG step.
+    By default priorities 1-5 are weighted 10/20/30/20/20%, modalities, check-in times and
+    15-60 minute durations are uniform and every scan gets its own patient. Otherwise
+    priority_mix and modality_mix map priority / scan type to a weight, hourly_rates gives a
+    relative check-in rate for each hour of the day, durations maps scan type to a (min, max)
+    range in minutes and repeat_patients is the share of scans for an earlier patient.
+    """
+    rng = random.Random(seed)
+    start_dt = datetime.strptime(start, "%Y-%m-%d %H:%M")
+    scan_types = list(modality_mix or machines.keys())
+    scan_type_weights = list(modality_mix.values()) if modality_mix else None
+    priorities = list(priority_mix or [1, 2, 3, 4, 5])
+    priority_weights = list(priority_mix.values()) if priority_mix else [0.1, 0.2, 0.3, 0.2, 0.2]
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(SCAN_REQUEST_COLUMNS)
+    for i in range(first_id, first_id + n):
+        if hourly_rates:
+            hour = rng.choices(range(24), hourly_rates)[0]
+            offset = rng.randrange(span_days) * 1440 + hour * 60 + rng.randrange(60)
+        else:
+            offset = rng.randrange(span_days * 1440)
+        check_in = start_dt + timedelta(minutes=offset)
+        scan_type = rng.choices(scan_types, scan_type_weights)[0] if scan_type_weights else rng.choice(scan_types)
+        duration = rng.randint(*durations[scan_type]) if durations else rng.randint(15, 60)
+        priority = rng.choices(priorities, priority_weights)[0]
+        patient = i
+        if repeat_patients and i > first_id and rng.random() < repeat_patients:
+            patient = rng.randrange(first_id, i)
+        writer.writerow([
+            f"{id_prefix}{i}",
+            scan_type,
+            duration,
+            priority,
+            patient,
+            check_in.strftime("%Y-%m-%d"),
+            check_in.strftime("%H:%M"),
+        ])
+    return output.getvalue()
+
+
+def generate_existing_schedule(n, start="2025-03-25 00:00", seed=0, id_prefix="E", utilization=0.5,
+                               durations=None):
+    """
+    Generates n booked scans as schedule entries (the rows of the schedule CSV), filling every
+    machine from start with appointments separated by idle gaps so that the machines are busy
+    about utilization of the time. Entries never overlap each other or the maintenance windows
+    of their machine, and every entry has its own patient.
+    """
+    rng = random.Random(seed)
+    start_dt = datetime.strptime(start, "%Y-%m-%d %H:%M")
+    cursor = {m: 0 for m_list in machines.values() for m in m_list}  # minutes from start
+    modality = {m: scan_type for scan_type, m_list in machines.items() for m in m_list}
+    entries = []
+    for i in range(n):
+        m = min(cursor, key=cursor.get)
+        scan_type = modality[m]
+        duration = rng.randint(*durations[scan_type]) if durations else rng.randint(15, 60)
+        begin = cursor[m] + round(rng.expovariate(utilization / ((1 - utilization) * duration)))
+        windows = maintenance_windows(m, begin, begin + duration, start_dt)
+        while windows:
+            begin = windows[-1][1]
+            windows = maintenance_windows(m, begin, begin + duration, start_dt)
+        entries.append({
+            "scan_id": f"{id_prefix}{i}",
+            "patient_id": f"{id_prefix}{i}",
+            "scan_type": scan_type,
+            "machine": m,
+            "start_time": (start_dt + timedelta(minutes=begin)).strftime("%Y-%m-%d %H:%M"),
+            "end_time": (start_dt + timedelta(minutes=begin + duration)).strftime("%Y-%m-%d %H:%M"),
+            "priority": rng.choices([1, 2, 3, 4, 5], [0.1, 0.2, 0.3, 0.2, 0.2])[0],
+            "duration": duration,
+        })
+        cursor[m] = begin + duration
+    return entries